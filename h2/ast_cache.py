@@ -0,0 +1,221 @@
+#
+# ast_cache.py
+#
+# Content addressed on-disk cache of parse results, so unchanged scripts aren't lexed and parsed
+# again on every start.
+#
+#     cache = ASTCache('~/.cache/h2')
+#     tree, errors = cache.parse(text, parse)       # parse(text) -> (tree, errors) on a miss
+#     print(cache.hits, cache.misses)
+#
+# The key is the SHA-256 of the grammar version and the source text. The grammar version hashes
+# the lexer and parser sources, so editing the grammar invalidates every entry. One file per
+# entry, <key>.ast, holding the tree in post order (value, number of children) and the errors
+# reported while parsing, as JSON: loading an entry never runs code, whoever else can write to
+# the directory. JSON has no tuples, the (kind, payload) values and the (line, column, message)
+# errors come back from lists. Symbol ids are stored as their text in names (a
+# symbols.SymbolTable, SYMBOLS by default) and trees are rebuilt with node (SimpleNode by default)
+# without recursion, the text interned in names again as the lexer would have.
+#
+# Writes go to a temporary file in the cache directory that is renamed over the entry, so bots
+# sharing a directory only ever see whole entries. A hit touches the entry's mtime; when the
+# directory grows past max_bytes the least recently used entries are removed down to 90% of it.
+# Temporary files count towards max_bytes, and those older than TEMP_AGE (left by a process
+# that died mid write) are removed then. Entries that can't be read are counted in errors,
+# removed and treated as misses.
+#
+
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+from simple_node import SimpleNode
+from symbols import SYMBOL_KINDS, SYMBOLS
+
+SUFFIX = '.ast'
+TEMP_SUFFIX = '.tmp'
+
+# seconds after which a temporary file is taken to be left over, not a write in progress
+TEMP_AGE = 600
+
+# bumped when the entry layout changes
+FORMAT = 2
+
+# default grammar version, the sources that decide what tree a text parses to
+GRAMMAR_MODULES = ('test_lexer.py', 'test_parser.py', 'simple_node.py', 'symbols.py', 'strings.py')
+
+def grammar_version(modules=GRAMMAR_MODULES):
+    digest = hashlib.sha256(str(FORMAT).encode())
+    here = os.path.dirname(os.path.abspath(__file__))
+    for name in modules:
+        with open(os.path.join(here, name), 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+# tree -> [value, children, value, children ...] in post order, with the text of symbol ids in
+# names if given
+def flatten(tree, names=None):
+    result = []
+    if tree is None:
+        return result
+    stack = [(tree, False)]
+    while stack:
+        node, visited = stack.pop()
+        if visited:
+            result.append(node.value if names is None else names.value_text(node.value))
+            result.append(len(node.children))
+        else:
+            stack.append((node, True))
+            stack.extend((child, False) for child in reversed(node.children))
+    return result
+
+def unflatten(flat, node=SimpleNode, names=None):
+    stack = []
+    for n in range(0, len(flat), 2):
+        value, count = flat[n], flat[n + 1]
+        if names is not None and isinstance(value, tuple) and value[0] in SYMBOL_KINDS:
+            value = (value[0], names.intern(value[1]))
+        if count:
+            children = stack[len(stack) - count:]
+            del stack[len(stack) - count:]
+            stack.append(node(value, children))
+        else:
+            stack.append(node(value))
+    return stack[0] if stack else None
+
+class ASTCache(object):
+
+    # directory: created if missing
+    # max_bytes: total size of the entries before the least recently used are evicted
+    # version: grammar version mixed into every key, grammar_version() by default
+    # node: node factory for loaded trees
+    # names: SymbolTable of the trees' symbol ids
+    def __init__(self, directory, max_bytes=64 * 1024 * 1024, version=None, node=SimpleNode, names=None):
+        self.directory = os.path.expanduser(directory)
+        self.max_bytes = max_bytes
+        self.version = grammar_version() if version is None else version
+        self.node = node
+        self.names = SYMBOLS if names is None else names
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.evictions = 0
+        self.size = None              # bytes in the directory, estimated, None until scanned
+        os.makedirs(self.directory, exist_ok=True)
+
+    def key(self, text):
+        digest = hashlib.sha256(self.version.encode())
+        digest.update(text.encode('utf-8', 'surrogatepass'))
+        return digest.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + SUFFIX)
+
+    # (tree, errors) or None
+    def get(self, text):
+        path = self.path(self.key(text))
+        try:
+            with open(path, 'rb') as f:
+                flat, errors = json.loads(f.read())
+            # values are a kind or a (kind, payload) pair, see simple_node.split_value()
+            flat[0::2] = [tuple(value) if type(value) is list else value for value in flat[0::2]]
+            tree = unflatten(flat, self.node, self.names)
+            errors = [tuple(error) for error in errors]
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except Exception:
+            # truncated by a full disk, written by another version of the layout ...
+            self.errors += 1
+            self.misses += 1
+            self.remove(path)
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits += 1
+        return tree, errors
+
+    def put(self, text, tree, errors):
+        data = json.dumps([flatten(tree, self.names), list(errors)], separators=(',', ':')).encode('ascii')
+        fd, temp = tempfile.mkstemp(suffix=TEMP_SUFFIX, dir=self.directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(temp, self.path(self.key(text)))
+        except BaseException:
+            self.remove(temp)
+            raise
+
+        if self.size is None:
+            self.size = sum(size for path, size, mtime in self.entries(TEMP_SUFFIX)) + sum(
+                size for path, size, mtime in self.entries())
+        else:
+            self.size += len(data)
+        if self.size > self.max_bytes:
+            self.evict()
+
+    # cached parse: parse(text) -> (tree, errors) runs on a miss and its result is stored
+    def parse(self, text, parse):
+        entry = self.get(text)
+        if entry is not None:
+            return entry
+        tree, errors = parse(text)
+        self.put(text, tree, errors)
+        return tree, errors
+
+    # (path, size, mtime) of every entry, or of every temporary file with suffix TEMP_SUFFIX
+    def entries(self, suffix=SUFFIX):
+        result = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(suffix):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                result.append((entry.path, stat.st_size, stat.st_mtime))
+        return result
+
+    # remove least recently used entries down to 90% of max_bytes, after the left over
+    # temporary files
+    def evict(self):
+        entries = sorted(self.entries(), key=lambda entry: entry[2])
+        size = self.sweep() + sum(size for path, size, mtime in entries)
+        limit = self.max_bytes * 9 // 10
+        for path, entry_size, mtime in entries:
+            if size <= limit:
+                break
+            if self.remove(path):
+                self.evictions += 1
+            size -= entry_size
+        self.size = size
+
+    def clear(self):
+        for path, size, mtime in self.entries():
+            self.remove(path)
+        self.size = self.sweep()
+
+    # remove temporary files older than TEMP_AGE, returns the bytes in the others (writes in
+    # progress)
+    def sweep(self):
+        now = time.time()
+        size = 0
+        for path, temp_size, mtime in self.entries(TEMP_SUFFIX):
+            if now - mtime < TEMP_AGE:
+                size += temp_size
+            else:
+                self.remove(path)
+        return size
+
+    # False if it was already gone, e.g. evicted by another process
+    def remove(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            return False
+        return True
+
+# end file
@@ -0,0 +1,5 @@
+#
+# bench
+#
+# Benchmarks for the H2 lexer/parser. Run from the h2 directory, e.g. 'python -m bench.startup'.
+#
@@ -0,0 +1,138 @@
+#
+# bench/ast_cache.py
+#
+# h2.py's check over a directory of generated mission files with a cold and a warm ASTCache.
+# Cached trees and errors must be the same as parsed ones. Also checks eviction, left over
+# temporary files, a corrupted or pickled entry and several processes filling one cache directory
+# at once.
+#
+#     python -m bench.ast_cache [-f files] [-n statements per file]
+#
+
+import os
+import pickle
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import ast_cache
+import h2
+from ast_cache import ASTCache, flatten
+from bench.corpus import generate
+
+def check(workdir, texts):
+    cache = ASTCache(os.path.join(workdir, 'check'))
+    for text in texts[:5]:
+        expected = h2.parse_text(text)
+        cache.put(text, *expected)
+        tree, errors = ASTCache(cache.directory).get(text)
+        assert (flatten(tree), errors) == (flatten(expected[0]), expected[1])
+
+    # room for two of three entries: older ones go first, a hit makes an entry recent again
+    size = sum(os.path.getsize(cache.path(cache.key(text))) for text in texts[:3])
+    cache = ASTCache(os.path.join(workdir, 'evict'), max_bytes=size - 1)
+    cache.put(texts[0], *h2.parse_text(texts[0]))
+    time.sleep(0.01)
+    cache.put(texts[1], *h2.parse_text(texts[1]))
+    time.sleep(0.01)
+    assert cache.get(texts[0]) is not None
+    time.sleep(0.01)
+    cache.put(texts[2], *h2.parse_text(texts[2]))
+    assert cache.evictions == 1
+    assert cache.get(texts[1]) is None and cache.get(texts[0]) is not None
+
+    cache = ASTCache(os.path.join(workdir, 'corrupt'))
+    cache.put(texts[0], *h2.parse_text(texts[0]))
+    with open(cache.path(cache.key(texts[0])), 'r+b') as f:
+        f.truncate(10)
+    assert cache.get(texts[0]) is None and cache.errors == 1 and not cache.entries()
+
+    # entries are JSON: a pickle where an entry should be is never loaded
+    tree, errors = h2.parse_text(texts[0])
+    with open(cache.path(cache.key(texts[0])), 'wb') as f:
+        pickle.dump((flatten(tree), errors), f)
+    assert cache.get(texts[0]) is None and cache.errors == 2 and not cache.entries()
+
+    # temporary files count towards max_bytes, left over ones go when entries are evicted
+    check = ASTCache(os.path.join(workdir, 'check'))
+    first, second = (os.path.getsize(check.path(check.key(text))) for text in texts[1:3])
+    temp_size = min(first, second) // 2
+    cache = ASTCache(os.path.join(workdir, 'temps'), max_bytes=first + second + temp_size)
+    for name, age in (('old.tmp', ast_cache.TEMP_AGE + 60), ('new.tmp', 0)):
+        path = os.path.join(cache.directory, name)
+        with open(path, 'wb') as f:
+            f.write(b'x' * temp_size)
+        os.utime(path, (time.time() - age, time.time() - age))
+    cache.put(texts[1], *h2.parse_text(texts[1]))
+    time.sleep(0.01)
+    cache.put(texts[2], *h2.parse_text(texts[2]))
+    assert sorted(name for name in os.listdir(cache.directory) if name.endswith('.tmp')) == ['new.tmp']
+    assert cache.evictions == 1 and cache.get(texts[1]) is None and cache.get(texts[2]) is not None
+    os.remove(os.path.join(cache.directory, 'new.tmp'))
+
+    # concurrent writers of the same entries, readers never see a partial one
+    directory = os.path.join(workdir, 'shared')
+    with ProcessPoolExecutor(max_workers=4) as executor:
+        list(executor.map(fill, [directory] * 8, [texts[:20]] * 8))
+    cache = ASTCache(directory)
+    for text in texts[:20]:
+        assert cache.get(text) is not None
+    assert cache.errors == 0
+    assert not [name for name in os.listdir(directory) if name.endswith('.tmp')]
+
+def fill(directory, texts):
+    cache = ASTCache(directory)
+    for text in texts:
+        cache.parse(text, h2.parse_text)
+    return cache.errors
+
+def run(paths, directory):
+    start = time.perf_counter()
+    results = list(h2.check_files(paths, 1, directory))
+    return results, time.perf_counter() - start
+
+def main():
+    import getopt
+
+    files = 100
+    statements = 1000
+    opts, args = getopt.getopt(sys.argv[1:], "f:n:")
+    for o, a in opts:
+        if o == '-f':
+            files = int(a)
+        elif o == '-n':
+            statements = int(a)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        texts = [generate(statements, missions=0.05, comments=0.1, errors=0.01, seed=n) for n in range(files)]
+        check(workdir, texts)
+        print("check ok")
+
+        paths = []
+        for n, text in enumerate(texts):
+            path = os.path.join(workdir, 'mission{:04d}.h2'.format(n))
+            with open(path, 'w') as f:
+                f.write(text)
+            paths.append(path)
+
+        h2.warm_up()
+        directory = os.path.join(workdir, 'cache')
+        plain, plain_time = run(paths, None)
+        cold, cold_time = run(paths, directory)
+        warm, warm_time = run(paths, directory)
+        for a, b, c in zip(plain, cold, warm):
+            assert a.statements == b.statements == c.statements and a.errors == b.errors == c.errors
+        assert not any(result.cached for result in cold) and all(result.cached for result in warm)
+
+        size = sum(size for path, size, mtime in ASTCache(directory).entries())
+        print("{} files x {} statements, cache {:.1f} kB".format(files, statements, size / 1024))
+        print("{:10} {:>9} {:>9}".format('', 'seconds', 'speedup'))
+        for label, elapsed in (('no cache', plain_time), ('cold', cold_time), ('warm', warm_time)):
+            print("{:10} {:9.3f} {:9.2f}".format(label, elapsed, plain_time / elapsed))
+
+
+if __name__ == '__main__':
+    main()
+
+# end file
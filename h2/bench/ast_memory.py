@@ -0,0 +1,63 @@
+#
+# bench/ast_memory.py
+#
+# Memory retained by a parse tree built with SimpleNode, compact_node.Node and compact_node.Arena.
+#
+#     python -m bench.ast_memory [-n statements]
+#
+
+import gc
+import sys
+import tracemalloc
+
+from compact_node import Arena, Node
+from simple_node import SimpleNode
+from test_left_recursive import Lexer, Parser
+
+def script(statements):
+    lines = []
+    for n in range(statements):
+        lines.append('v{} = (v{} + {}) * -{}'.format(n % 97, n % 89, n, n % 7))
+    return '\n'.join(lines)
+
+# bytes still allocated after parsing, i.e. held by the result
+def retained(text, make_parser):
+    tokens = list(Lexer().tokenize(text))
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    parser, holder = make_parser()
+    result = parser.parse(iter(tokens))
+    # sly keeps position maps on the parser, only count the tree
+    del parser
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return after - before, result, holder
+
+def main():
+    import getopt
+
+    statements = 20000
+    opts, args = getopt.getopt(sys.argv[1:], "n:")
+    for o, a in opts:
+        if o == '-n':
+            statements = int(a)
+    text = script(statements)
+
+    def arena_parser():
+        arena = Arena()
+        return Parser(node_factory=arena.node), arena
+
+    print("{} statements".format(statements))
+    for label, make_parser in (('SimpleNode', lambda: (Parser(node_factory=SimpleNode), None)),
+                               ('Node', lambda: (Parser(node_factory=Node), None)),
+                               ('Arena', arena_parser)):
+        size, result, holder = retained(text, make_parser)
+        print("{:12} {:10.1f} KiB {:8.1f} bytes/statement".format(label, size / 1024, size / statements))
+
+
+if __name__ == '__main__':
+    main()
+
+# end file
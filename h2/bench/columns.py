@@ -0,0 +1,56 @@
+#
+# bench/columns.py
+#
+# Error heavy input: long lines full of characters the left recursive lexer rejects. Each error
+# reports (line, column); the old find_column() did a rfind back to the previous newline per
+# error, quadratic in the line length, the LineIndex is a bisect.
+#
+#     python -m bench.columns
+#
+
+import time
+
+from test_left_recursive import Lexer
+
+class RfindLexer(Lexer):
+    tokens = Lexer.tokens
+
+    # column the way find_column() used to compute it
+    def error(self, token):
+        last_cr = self.text.rfind('\n', 0, token.index)
+        if last_cr < 0:
+            last_cr = 0
+        self.column = token.index - last_cr
+        self.index += 1
+
+class IndexedLexer(Lexer):
+    tokens = Lexer.tokens
+
+    def error(self, token):
+        self.line, self.column = self.lines.position(token.index)
+        self.index += 1
+
+def timed(lexer_class, text):
+    start = time.perf_counter()
+    for tok in lexer_class().tokenize(text):
+        pass
+    return time.perf_counter() - start
+
+def main():
+    print("{:>10} {:>8} {:>12} {:>12} {:>14} {:>14}".format(
+        'line len', 'errors', 'rfind ms', 'index ms', 'rfind us/err', 'index us/err'))
+    for width in (1000, 8000, 64000, 256000):
+        # 4 lines of 'x = 1 > > > ...'
+        line = 'x = 1 ' + '> ' * (width // 2)
+        text = '\n'.join([line] * 4)
+        errors = text.count('>')
+        rfind = timed(RfindLexer, text)
+        index = timed(IndexedLexer, text)
+        print("{:10d} {:8d} {:12.2f} {:12.2f} {:14.2f} {:14.2f}".format(
+            width, errors, rfind * 1000, index * 1000, rfind * 1e6 / errors, index * 1e6 / errors))
+
+
+if __name__ == '__main__':
+    main()
+
+# end file
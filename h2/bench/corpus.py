@@ -0,0 +1,166 @@
+#
+# bench/corpus.py
+#
+# Synthetic H2 scripts of a given size and shape for the benchmarks.
+#
+#     text = generate(statements=10000, depth=4, strings=0.3, missions=0.05, seed=1)
+#
+#     python -m bench.corpus [options] > big.h2
+#
+# Shape parameters
+#
+#     statements  number of statements (Mission headers and statements in their bodies count)
+#     depth       maximum nesting of the expressions
+#     strings     fraction of expression leaves that are strings
+#     comments    fraction of lines that are comments, half of them trailing a statement
+#     missions    fraction of statements that open a Mission block (TestParser only)
+#     nesting     how deep Mission blocks can nest
+#     errors      fraction of statements with a syntax error
+#     left        only use what the left recursive grammar accepts: no Mission blocks or
+#                 comparisons
+#     seed        random seed, the same parameters and seed give the same text
+#
+
+import random
+import sys
+
+OPERATORS = ('+', '-', '*', '/')
+COMPARISONS = ('==', '>', '<', '>=', '<=')
+NAMES = ['x', 'y', 'cargo', 'halite', 'cost'] + ['v{}'.format(n) for n in range(20)]
+
+# statements the parsers reject, each on its own line
+BROKEN = (
+    'x = = 1',
+    'Print(1 +)',
+    'y = (2 * 3',
+    '= 4',
+    'Print 5',
+)
+
+class Generator(object):
+
+    def __init__(self, depth=3, strings=0.1, comments=0.1, missions=0.0, nesting=1, errors=0.0,
+                 left=False, seed=0):
+        self.depth = depth
+        self.strings = strings
+        self.comments = comments
+        self.missions = 0.0 if left else missions
+        self.nesting = nesting
+        self.errors = errors
+        self.left = left
+        self.rng = random.Random(seed)
+        self.serial = 0
+
+    def leaf(self):
+        rng = self.rng
+        if rng.random() < self.strings:
+            self.serial += 1
+            return '"text {}"'.format(self.serial)
+        choice = rng.random()
+        if choice < 0.45:
+            return str(rng.randrange(1000))
+        elif choice < 0.9:
+            return rng.choice(NAMES)
+        else:
+            return rng.choice(('True', 'False'))
+
+    # iterative, pieces are expanded left to right
+    def expression(self, depth):
+        rng = self.rng
+        out = []
+        stack = [depth]
+        while stack:
+            item = stack.pop()
+            if isinstance(item, str):
+                out.append(item)
+                continue
+            if item <= 0 or rng.random() < 0.25:
+                out.append(self.leaf())
+                continue
+            choice = rng.random()
+            if choice < 0.1:
+                out.append('-')
+                stack.append(item - 1)
+            elif choice < 0.3:
+                stack.extend((')', item - 1, '('))
+            else:
+                stack.extend((item - 1, ' {} '.format(rng.choice(OPERATORS)), item - 1))
+        return ''.join(out)
+
+    def statement(self):
+        rng = self.rng
+        if self.errors and rng.random() < self.errors:
+            return rng.choice(BROKEN)
+        value = self.expression(self.depth)
+        if not self.left and rng.random() < 0.1:
+            value = '{} {} {}'.format(value, rng.choice(COMPARISONS), self.expression(1))
+        if rng.random() < 0.2:
+            return 'Print({})'.format(value)
+        return '{} = {}'.format(rng.choice(NAMES), value)
+
+    # lines for count statements at block level, returns (lines, statements used)
+    def block(self, count, level):
+        rng = self.rng
+        indent = '    ' * level
+        lines = []
+        used = 0
+        while used < count:
+            if self.comments and rng.random() < self.comments:
+                if rng.random() < 0.5:
+                    lines.append('{}# comment {}'.format(indent, rng.randrange(1000)))
+                    continue
+                trailing = '  # note'
+            else:
+                trailing = ''
+            if level < self.nesting and count - used > 2 and rng.random() < self.missions:
+                self.serial += 1
+                body = min(count - used - 1, rng.randrange(2, 12))
+                lines.append('{}Mission("m{}") Do{}'.format(indent, self.serial, trailing))
+                inner, n = self.block(body, level + 1)
+                lines.extend(inner)
+                lines.append(indent + 'Done')
+                used += 1 + n
+            else:
+                lines.append(indent + self.statement() + trailing)
+                used += 1
+        return lines, used
+
+    def generate(self, statements):
+        lines, _ = self.block(statements, 0)
+        return '\n'.join(lines) + '\n'
+
+def generate(statements=1000, **shape):
+    return Generator(**shape).generate(statements)
+
+def main():
+    import getopt
+
+    shape = {}
+    statements = 1000
+    opts, args = getopt.getopt(sys.argv[1:], "n:d:s:c:m:N:e:lS:")
+    for o, a in opts:
+        if o == '-n':
+            statements = int(a)
+        elif o == '-d':
+            shape['depth'] = int(a)
+        elif o == '-s':
+            shape['strings'] = float(a)
+        elif o == '-c':
+            shape['comments'] = float(a)
+        elif o == '-m':
+            shape['missions'] = float(a)
+        elif o == '-N':
+            shape['nesting'] = int(a)
+        elif o == '-e':
+            shape['errors'] = float(a)
+        elif o == '-l':
+            shape['left'] = True
+        elif o == '-S':
+            shape['seed'] = int(a)
+    sys.stdout.write(generate(statements, **shape))
+
+
+if __name__ == '__main__':
+    main()
+
+# end file
@@ -0,0 +1,147 @@
+#
+# bench/dataflow.py
+#
+# Checks Dataflow against Interpreter.run() over random turns: inputs changed, removed and set to
+# the wrong type between turns, a variable carried from turn to turn. Output, env and errors must
+# be the same. Then one turn per ship over many turns where only some ships' halite changes,
+# Interpreter against Dataflow with the recomputed/reused counters.
+#
+#     python -m bench.dataflow [-s ships] [-t turns] [-c changed_percent] [file]
+#
+
+import random
+import sys
+import time
+
+from bench.optimizer import SCRIPT
+from dataflow import Dataflow
+from interpreter import H2RuntimeError, Interpreter
+from test_lexer import TestLexer
+from test_parser import TestParser
+
+CHECK_SCRIPT = SCRIPT + '''
+count = count + 1
+note = "${count} turns, ${cargo} cargo"
+Mission("check") Do
+    Print(note)
+    Print(Not (count > 3))
+Done
+ratio = cargo / (halite - 500)
+Print(ratio * 2 > 1)
+'''
+
+def parse(text):
+    return TestParser().parse(TestLexer().tokenize(text))
+
+def run(runner, out):
+    try:
+        runner()
+        return None
+    except H2RuntimeError as e:
+        out.append(('error', str(e)))
+        return str(e)
+
+def check(turns):
+    tree = parse(CHECK_SCRIPT)
+    rng = random.Random(42)
+    env = {'halite': 700, 'cost': 30, 'count': 0}
+    expected = []
+    interpreter = Interpreter(dict(env), expected.append)
+    output = []
+    flow = Dataflow(tree, dict(env), output.append)
+    for turn in range(turns):
+        changed = set()
+        for name in ('halite', 'cost'):
+            roll = rng.random()
+            if roll < 0.3:
+                value = rng.choice([500, 600, 700, rng.randint(0, 1000)])
+            elif roll < 0.33:
+                value = None
+            elif roll < 0.35:
+                value = 'many'
+            else:
+                continue
+            for target in (interpreter.env, flow.env):
+                if value is None:
+                    target.pop(name, None)
+                else:
+                    target[name] = value
+            changed.add(name)
+        a = run(lambda: interpreter.run(tree), expected)
+        b = run(lambda: flow.turn(changed if rng.random() < 0.8 else None), output)
+        assert (a, output) == (b, expected), (turn, a, b)
+        assert interpreter.env == flow.env, turn
+
+    # nothing changed: nothing recomputed, a changed input only its readers
+    flow = Dataflow(tree, {'halite': 700, 'cost': 30, 'count': 0}, lambda value: None)
+    flow.turn()
+    assert flow.last.reused == 0
+    flow.turn(set())
+    assert flow.last.changed == 1       # count carries over
+    count_only = flow.last.recomputed
+    flow.env['cost'] = 31
+    flow.turn({'cost'})
+    assert 0 < count_only < flow.last.recomputed < len(flow.cells) - len(flow.inputs), flow.last
+
+def main():
+    import getopt
+
+    ships = 300
+    turns = 20
+    percent = 10
+    opts, args = getopt.getopt(sys.argv[1:], "s:t:c:")
+    for o, a in opts:
+        if o == '-s':
+            ships = int(a)
+        elif o == '-t':
+            turns = int(a)
+        elif o == '-c':
+            percent = float(a)
+    text = open(args[0]).read() if args else SCRIPT
+
+    check(500)
+    print("check ok")
+
+    tree = parse(text)
+    rng = random.Random(42)
+    states = [{'halite': rng.randint(0, 1000), 'cost': rng.randint(1, 100)} for n in range(ships)]
+    out = lambda value: None
+    interpreters = [Interpreter(dict(state), out) for state in states]
+    flows = [Dataflow(tree, dict(state), out) for state in states]
+    for flow in flows:
+        flow.turn()
+    recomputed = reused = 0
+
+    # the same ships change halite for both
+    plain = incremental = 0.0
+    for turn in range(turns):
+        changes = [(n, rng.randint(0, 1000)) for n in range(ships) if rng.random() * 100 < percent]
+        for n, halite in changes:
+            interpreters[n].env['halite'] = halite
+            flows[n].env['halite'] = halite
+        changed = dict.fromkeys(range(ships), ())
+        changed.update((n, ('halite',)) for n, halite in changes)
+
+        start = time.perf_counter()
+        for interpreter in interpreters:
+            interpreter.run(tree)
+        plain += time.perf_counter() - start
+
+        start = time.perf_counter()
+        for n, flow in enumerate(flows):
+            report = flow.turn(changed[n])
+            recomputed += report.recomputed
+            reused += report.reused
+        incremental += time.perf_counter() - start
+
+    assert [interpreter.env for interpreter in interpreters] == [flow.env for flow in flows]
+    print("{} ships, {:.0f}% changed per turn, {} cells".format(ships, percent, len(flows[0].cells)))
+    print("interpreter  {:7.3f} ms/turn".format(plain * 1000 / turns))
+    print("dataflow     {:7.3f} ms/turn  {} recomputed, {} reused".format(incremental * 1000 / turns,
+                                                                       recomputed, reused))
+
+
+if __name__ == '__main__':
+    main()
+
+# end file
@@ -0,0 +1,109 @@
+#
+# bench/fast_lexer.py
+#
+# Differential check of FastLexer against the lexer classes it is built from: the same
+# (type, value, lineno, index) tokens and the same error messages on generated corpora and edge
+# cases. Then tokens/s of both engines on a large corpus.
+#
+#     python -m bench.fast_lexer [-n statements]
+#
+
+import io
+import sys
+import time
+from contextlib import redirect_stdout
+
+from bench.corpus import generate
+from fast_lexer import FastLexer
+from test_lexer import TestLexer
+from test_left_recursive import Lexer
+
+EDGE_CASES = [
+    '',
+    '\n\n\n',
+    'Done Doner Do Dot Print Prints Mission Missions True True_ False1 Not Nothing',
+    'x=1\ny==2>=3<=4<5>6\n',
+    '12abc 007 0 123456789012345678901234567890',
+    'a = "unterminated\nb = 2\n',
+    'a = "two\nline" + "x"\nb = 3',
+    'a = "esc \\" quote \\n" + "\\q"',
+    '@ $ % ^ & ~ ` ? ; : \' !',
+    '# comment only',
+    'x = 1 # trailing\n\t  y = 2\t#\n',
+    'Mission("m") Do\n  Print(-x)\nDone\n',
+    '[1, 2] , .',
+    '\r\n\x00\x7fé中',
+]
+
+# tokens, printed messages and the exception raised, if any (the left recursive Lexer's NUMBER
+# callback fails on '007')
+def tokens(tokenize, text):
+    out = io.StringIO()
+    result = []
+    error = None
+    with redirect_stdout(out):
+        try:
+            for tok in tokenize(text):
+                result.append((tok.type, tok.value, tok.lineno, tok.index))
+        except Exception as e:
+            error = '{}: {}'.format(e.__class__.__name__, e)
+    return result, out.getvalue(), error
+
+# lexer factory, FastLexer values, corpus options
+ENGINES = [
+    ('TestLexer', TestLexer, {'NUMBER': int}, {}),
+    ('Lexer', Lexer, {}, {'left': True}),
+]
+
+def check():
+    texts = list(EDGE_CASES)
+    for seed in range(20):
+        texts.append(generate(200, depth=4, strings=0.3, comments=0.2, missions=0.1, nesting=2,
+                              errors=0.05, seed=seed))
+        # random corruption: drop a quote, add stray characters
+        text = texts[-1]
+        texts.append(text.replace('"', '', 1).replace('+', '@', 3))
+
+    count = 0
+    for name, factory, values, shape in ENGINES:
+        fast = FastLexer(factory(), values)
+        for text in texts:
+            expected = tokens(factory().tokenize, text)
+            got = tokens(fast.tokenize, text)
+            assert got == expected, (name, text[:200])
+            count += 1
+    return count
+
+def throughput(tokenize, text, repeats=3):
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        count = sum(1 for _ in tokenize(text))
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return count, best
+
+def main():
+    import getopt
+
+    statements = 100000
+    opts, args = getopt.getopt(sys.argv[1:], "n:")
+    for o, a in opts:
+        if o == '-n':
+            statements = int(a)
+
+    print("differential check ok, {} texts".format(check()))
+
+    print("{:10} {:>9} {:>14} {:>14} {:>8}".format('', 'tokens', 'sly tok/s', 'fast tok/s', 'speedup'))
+    for name, factory, values, shape in ENGINES:
+        text = generate(statements, strings=0.2, comments=0.2, missions=0.05, seed=1, **shape)
+        count, slow = throughput(factory().tokenize, text)
+        fast_count, fast = throughput(FastLexer(factory(), values).tokenize, text)
+        assert count == fast_count
+        print("{:10} {:9d} {:14.0f} {:14.0f} {:8.2f}".format(name, count, count / slow, count / fast, slow / fast))
+
+
+if __name__ == '__main__':
+    main()
+
+# end file
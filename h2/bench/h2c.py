@@ -0,0 +1,128 @@
+#
+# bench/h2c.py
+#
+# A mission set of generated scripts compiled to one .h2c file. Opening it and walking one
+# script should cost about that script's nodes, not the whole set. Compares with parsing the
+# sources and with loading every tree from a warm ASTCache. Also checks the trees, their line
+# tables, running a loaded script and damaged files.
+#
+#     python -m bench.h2c [-f files] [-n statements per file]
+#
+
+import os
+import sys
+import tempfile
+import time
+
+import h2
+from ast_cache import ASTCache, flatten
+from bench.corpus import generate
+from bench.vm import SCRIPT
+from h2c import H2CError, H2CFile, Writer, parser_lines
+from interpreter import Interpreter
+
+def check(workdir, texts, path):
+    with H2CFile(path) as h2c:
+        for n, text in enumerate(texts):
+            tree, errors, context, index = h2.parse_in_context(text)
+            assert flatten(h2c.tree(str(n))) == flatten(tree)
+            # statements start on the line the parser saw them on
+            lines = parser_lines(context, index)
+            loaded = h2c.root(str(n))
+            for node, original in zip(loaded.children if loaded else [], tree.children if tree else []):
+                assert node.line == lines(original)
+
+    # a loaded script runs like the parsed one
+    tree, errors, context, index = h2.parse_in_context(SCRIPT)
+    writer = Writer()
+    writer.add('script', tree, parser_lines(context, index))
+    script = os.path.join(workdir, 'script.h2c')
+    writer.write(script)
+    results = []
+    for state in ({'halite': 10, 'cost': 3}, {'halite': 900, 'cost': 70}):
+        for tree in (tree, H2CFile(script).root('script')):
+            env = dict(state)
+            output = []
+            Interpreter(env, output.append).run(tree)
+            results.append((env, output))
+    assert results[0] == results[1] and results[2] == results[3]
+
+    data = open(path, 'rb').read()
+    for damaged in (b'', data[:40], b'XXXX' + data[4:], data[:len(data) // 2]):
+        with open(script, 'wb') as f:
+            f.write(damaged)
+        try:
+            H2CFile(script)
+        except H2CError:
+            pass
+        else:
+            assert False, 'damaged file loaded'
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+def one_script(path, name):
+    with H2CFile(path) as h2c:
+        return h2.count_statements(h2c.root(name))
+
+def every_tree(path):
+    with H2CFile(path) as h2c:
+        return [h2c.tree(name) for name in h2c.names()]
+
+def parse_all(texts):
+    return [h2.parse_text(text)[0] for text in texts]
+
+def cache_all(cache, texts):
+    return [cache.get(text)[0] for text in texts]
+
+def main():
+    import getopt
+
+    files = 100
+    statements = 1000
+    opts, args = getopt.getopt(sys.argv[1:], "f:n:")
+    for o, a in opts:
+        if o == '-f':
+            files = int(a)
+        elif o == '-n':
+            statements = int(a)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        texts = [generate(statements, missions=0.05, comments=0.1, errors=0.01, seed=n) for n in range(files)]
+        path = os.path.join(workdir, 'missions.h2c')
+        h2.warm_up()
+        cache = ASTCache(os.path.join(workdir, 'cache'))
+
+        start = time.perf_counter()
+        writer = Writer()
+        for n, text in enumerate(texts):
+            tree, errors, context, index = h2.parse_in_context(text)
+            writer.add(str(n), tree, parser_lines(context, index))
+            cache.put(text, tree, errors)
+        writer.write(path)
+        compile_time = time.perf_counter() - start
+
+        check(workdir, texts, path)
+        print("check ok")
+
+        print("{} files x {} statements, {:.1f} kB, parsed and written in {:.2f} s".format(
+            files, statements, os.path.getsize(path) / 1024, compile_time))
+        cases = [
+            ('parse sources', parse_all, texts),
+            ('ast cache, all', cache_all, cache, texts),
+            ('h2c, all trees', every_tree, path),
+            ('h2c, one script', one_script, path, str(files // 2)),
+            ('h2c, open only', H2CFile, path),
+        ]
+        print("{:16} {:>10}".format('', 'ms'))
+        for label, function, *arguments in cases:
+            result, elapsed = timed(function, *arguments)
+            print("{:16} {:10.2f}".format(label, elapsed * 1000))
+
+
+if __name__ == '__main__':
+    main()
+
+# end file
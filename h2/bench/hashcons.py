@@ -0,0 +1,159 @@
+#
+# bench/hashcons.py
+#
+# Parse trees built with SimpleNode against DAGs from HashConser: distinct nodes, memory held
+# and parse time, on a random corpus and on generated missions stamped from a few templates.
+# Checks that the DAG flattens to the same tree, that equal subtrees are one object and that the
+# weak table lets go of a DAG nobody uses. Then a Dataflow turn over ships with a cell per
+# occurrence of an expression against one per shared expression.
+#
+#     python -m bench.hashcons [-n statements] [-s ships]
+#
+
+import gc
+import random
+import sys
+import time
+import tracemalloc
+
+from ast_cache import flatten
+from bench.corpus import generate
+from dataflow import Dataflow
+from hashcons import HashConser, HashNode, node_key, sharing
+from interpreter import H2RuntimeError, Interpreter
+from simple_node import SimpleNode
+from test_lexer import TestLexer
+from test_parser import TestParser
+
+MISSION = '''Mission("m{n}") Do
+    gain = (halite - cost) / 4
+    Print(gain * 3 + cargo >= 100)
+    Print(halite > {limit})
+    left = 1000 - cargo
+    Print(-left < 0)
+    Print("ship " + "status")
+Done
+'''
+
+# generated mission files: the same body with a few parameters
+def missions(statements):
+    rng = random.Random(1)
+    parts = ['cargo = halite * 2 - cost\n']
+    for n in range(statements // 6):
+        parts.append(MISSION.format(n=n, limit=rng.choice((100, 200, 500))))
+    return ''.join(parts)
+
+def parse(text, factory):
+    parser = TestParser(node_factory=factory)
+    lexer = TestLexer(names=parser.names)
+    return parser.parse(lexer.tokenize(text))
+
+# bytes allocated by make() that are still held by its result, with time taken
+def retained(make):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    result = make()
+    seconds = time.perf_counter() - start
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return after - before, seconds, result
+
+def check(text):
+    tree = parse(text, SimpleNode)
+    table = HashConser()
+    dag = parse(text, table.node)
+    assert flatten(dag) == flatten(tree)
+
+    # hash-consed: equal keys, same object
+    canonical = {}
+    stack = [dag]
+    while stack:
+        node = stack.pop()
+        assert canonical.setdefault(node_key(node.value, node.children), node) is node
+        stack.extend(node.children)
+
+    # structural equality of nodes built apart, payload types kept apart
+    assert HashNode('+', [HashNode(('number', 1))]) == HashNode('+', [HashNode(('number', 1))])
+    assert hash(HashNode(('id', 'x'))) == hash(HashNode(('id', 'x')))
+    assert len(set([HashNode(('number', 1)), HashNode(('number', 1.0)), HashNode(('bool', True)),
+                    HashNode(('number', True)), HashNode(('number', -0.0)), HashNode(('number', 0.0))])) == 6
+
+    # the table holds nodes weakly
+    assert len(table)
+    del dag, node, stack, canonical
+    gc.collect()
+    assert len(table) == 0, len(table)
+
+def run(make_runner, states, tree):
+    output = []
+    envs = []
+    for state in states:
+        env = dict(state)
+        try:
+            make_runner(env, output.append).run(tree)
+        except H2RuntimeError as e:
+            output.append(('error', str(e)))
+        envs.append(env)
+    return envs, output
+
+def main():
+    import getopt
+
+    statements = 20000
+    ships = 100
+    opts, args = getopt.getopt(sys.argv[1:], "n:s:")
+    for o, a in opts:
+        if o == '-n':
+            statements = int(a)
+        elif o == '-s':
+            ships = int(a)
+
+    corpora = [
+        ('random', generate(statements, depth=3, strings=0.0, comments=0.0, missions=0.05, seed=1)),
+        ('missions', missions(statements)),
+    ]
+
+    for name, text in corpora:
+        check(text)
+    print("check ok")
+
+    print("{:10} {:>9} {:>9} {:>9} {:>9} {:>9} {:>9}".format('', 'nodes', 'dag', 'tree KB', 'dag KB',
+                                                               'tree s', 'dag s'))
+    for name, text in corpora:
+        tree_bytes, tree_seconds, tree = retained(lambda: parse(text, SimpleNode))
+        # the table goes with the parser, it is only needed while parsing
+        dag_bytes, dag_seconds, dag = retained(lambda: parse(text, HashConser().node))
+        nodes = len(flatten(tree)) // 2
+        distinct, shared = sharing(dag)
+        print("{:10} {:9d} {:9d} {:9.0f} {:9.0f} {:9.3f} {:9.3f}".format(name, nodes, distinct, tree_bytes / 1024,
+                                                                        dag_bytes / 1024, tree_seconds,
+                                                                        dag_seconds))
+
+    # a turn of Dataflow per ship with a new halite, cells per repeated expression or shared.
+    # Not the random corpus: it has a division by zero a few statements in.
+    tree = parse(corpora[1][1], HashConser().node)
+    rng = random.Random(42)
+    states = [{'halite': rng.randint(0, 1000), 'cost': rng.randint(1, 100)} for n in range(ships)]
+    expected = run(Interpreter, states, tree)
+    for share in (False, True):
+        output = []
+        flows = [Dataflow(tree, {'halite': 0, 'cost': state['cost']}, output.append, share) for state in states]
+        for flow in flows:
+            flow.turn()
+        del output[:]
+        start = time.perf_counter()
+        for flow, state in zip(flows, states):
+            flow.env['halite'] = state['halite']
+            flow.turn({'halite'})
+        seconds = time.perf_counter() - start
+        assert ([flow.env for flow in flows], output) == expected
+        print("dataflow {:6} {:6d} cells, {:7.2f} ms/turn".format('shared' if share else 'copies',
+                                                                 len(flows[0].cells), seconds * 1000))
+
+if __name__ == '__main__':
+    main()
+
+# end file
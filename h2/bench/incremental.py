@@ -0,0 +1,147 @@
+#
+# bench/incremental.py
+#
+# Single line edits to a large script: IncrementalParser.edit() vs a full TestParser parse of
+# the edited text. Every edit is first checked against IncrementalParser.parse() of the same
+# text, and the initial tree against the statements of a full parse.
+#
+#     python -m bench.incremental [-n lines] [-e edits]
+#
+
+import random
+import sys
+import time
+
+from incremental import IncrementalParser, top_statements
+from simple_node import split_value
+from test_lexer import TestLexer
+from test_parser import TestParser
+
+def script(lines):
+    out = []
+    n = 0
+    while n < lines:
+        if n % 50 == 10:
+            out.append('Mission("m{}") Do\n'.format(n))
+            out.append('    a{} = b * {} + 1\n'.format(n, n))
+            out.append('    Print(a{} > 3)\n'.format(n))
+            out.append('Done\n')
+            n += 4
+        elif n % 7 == 3:
+            out.append('# note {}\n'.format(n))
+            n += 1
+        else:
+            out.append('v{} = (x + {}) * y - "s{}"\n'.format(n % 97, n, n))
+            n += 1
+    return ''.join(out)
+
+# structural equality, iterative. Error messages in segments the edit didn't touch keep their
+# old line numbers, so only the kind of error nodes is compared.
+def same(a, b):
+    stack = [(a, b)]
+    while stack:
+        a, b = stack.pop()
+        if len(a.children) != len(b.children):
+            return False
+        if a.value != b.value and not (split_value(a.value)[0] == split_value(b.value)[0] == 'error'):
+            return False
+        stack.extend(zip(a.children, b.children))
+    return True
+
+# a random single line edit: (offset, deleted, inserted). blocks=False leaves Mission/Done lines
+# alone, unbalancing a block turns the rest of the file into one segment.
+def random_edit(text, rng, blocks=True):
+    while True:
+        start = text.rfind('\n', 0, rng.randrange(len(text))) + 1
+        end = text.find('\n', start)
+        if end < 0:
+            end = len(text)
+        line = text[start:end]
+        if blocks or not line.startswith(('Mission', 'Done')):
+            break
+    choice = rng.random()
+    if choice < 0.6:
+        # retype a number or name in place
+        at = start + rng.randrange(len(line) + 1)
+        return at, 0, str(rng.randrange(10))
+    elif choice < 0.8:
+        # replace the whole line
+        return start, end - start, 'w = {} + z'.format(rng.randrange(1000))
+    elif choice < 0.9:
+        # insert a line
+        return start, 0, 'Print("new {}")\n'.format(rng.randrange(1000))
+    else:
+        # delete a line
+        return start, min(end + 1, len(text)) - start, ''
+
+def check(text, rng, edits):
+    doc = IncrementalParser()
+    full = top_statements(TestParser().parse(TestLexer().tokenize(text)))
+    tree = doc.parse(text)
+    assert len(full) == len(tree.children) and all(same(a, b) for a, b in zip(full, tree.children))
+
+    # structural edits too: open a block, an unterminated string, then close them again
+    fixed = [(text.find('Done'), 4, ''), (text.find('Done') - 1, 0, 'Done'),
+             (text.find('"'), 0, '"'), (text.find('"'), 1, '')]
+    for n in range(len(fixed) + edits):
+        offset, deleted, inserted = fixed[n] if n < len(fixed) else random_edit(doc.text, rng)
+        tree = doc.edit(offset, deleted, inserted)
+        fresh = IncrementalParser().parse(doc.text)
+        assert len(fresh.children) == len(tree.children), (offset, deleted, inserted)
+        assert all(same(a, b) for a, b in zip(fresh.children, tree.children)), (offset, deleted, inserted)
+
+def main():
+    import contextlib
+    import getopt
+    import io
+
+    lines = 50000
+    edits = 50
+    opts, args = getopt.getopt(sys.argv[1:], "n:e:")
+    for o, a in opts:
+        if o == '-n':
+            lines = int(a)
+        elif o == '-e':
+            edits = int(a)
+
+    rng = random.Random(1)
+    # syntax errors from the structural edits are expected
+    with contextlib.redirect_stdout(io.StringIO()):
+        check(script(300), rng, 200)
+    print("check ok")
+
+    text = script(lines)
+    doc = IncrementalParser()
+    start = time.perf_counter()
+    doc.parse(text)
+    initial = time.perf_counter() - start
+
+    incremental = 0.0
+    full = 0.0
+    fulls = 0
+    relexed = 0
+    # edits may introduce syntax errors, keep their messages out of the report
+    with contextlib.redirect_stdout(io.StringIO()):
+        for n in range(edits):
+            offset, deleted, inserted = random_edit(doc.text, rng, False)
+
+            start = time.perf_counter()
+            doc.edit(offset, deleted, inserted)
+            incremental += time.perf_counter() - start
+            relexed += doc.relexed
+
+            # full parses are slow, a few are enough
+            if n < 3:
+                start = time.perf_counter()
+                TestParser().parse(TestLexer().tokenize(doc.text))
+                full += time.perf_counter() - start
+                fulls += 1
+
+    print("{} lines, {} statements, initial parse {:.2f} s".format(lines, len(doc.tree.children), initial))
+    print("{} edits: incremental {:.2f} ms/edit ({:.1f} segments), full reparse {:.1f} ms/edit".format(
+        edits, incremental * 1000 / edits, relexed / edits, full * 1000 / fulls))
+
+if __name__ == '__main__':
+    main()
+
+# end file
@@ -0,0 +1,208 @@
+#
+# bench/mmap_lexer.py
+#
+# Checks MmapLexer against the lexers' own tokenize() on generated scripts and on edge cases
+# (non-ASCII strings, comments and bad characters, string errors, no final newline, an empty
+# file): tokens, their (line, column), reported errors and parse trees must be the same. Then
+# time and peak RSS, each in a new process, of lexing a large file read as text against mapped,
+# and of 'h2.py file' on a smaller one with and without the mmap path.
+#
+#     python -m bench.mmap_lexer [-m lex MB] [-s h2.py MB]
+#
+
+import contextlib
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from ast_cache import flatten
+from bench.corpus import generate
+from mmap_lexer import _UNREAD, MmapLexer, mapped
+
+EDGE_CASES = [
+    '',
+    'x = 1',
+    'Print("héllo wörld ✓")\n# ça va\ny = 2 # ünïcode\n',
+    'x = 1 é + 2\nPrint(x) ✓ ✓\n',
+    'name = "two\nlines ${x}" + "€"\nPrint(name)\n',
+    's = "bad \\q escape"\nt = "ok"\n',
+    'x = 1 $ 2\n\t y = "é" @\n',
+    'Mission("m") Do\n    x = "é" + 1\n    Print(-x >= 2)\nDone\n',
+    'x = "unterminated\ny = 1\n',
+    'x = 1\n' + 'y = "ä€😀" + z ' * 200 + '\nPrint(y)\n',
+]
+
+def text_tokens(lexer, text):
+    tokens = lexer.tokenize(text)
+    return [(tok.type, tok.value, tok.lineno) + tokens.lines.position(tok.index) for tok in tokens]
+
+def mapped_tokens(source, buffer):
+    tokens = source.tokenize(buffer)
+    return [(tok.type, tok.value, tok.lineno) + tokens.lines.position(tok.index) for tok in list(tokens)]
+
+# (result, errors) of make(report), errors reported or printed
+def collect(make):
+    errors = []
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        result = make(lambda line, column, message: errors.append((line, column, message)))
+    return result, errors + out.getvalue().splitlines()
+
+def check_text(path, text, grammars):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    with mapped(path) as buffer:
+        for Lexer, Parser in grammars:
+            def lexer(report):
+                if Parser is None:
+                    return Lexer()
+                return Lexer(report=report)
+
+            expected = collect(lambda report: text_tokens(lexer(report), text))
+            found = collect(lambda report: mapped_tokens(MmapLexer(lexer(report)), buffer))
+            assert found == expected, (text, found, expected)
+
+            if Parser is not None:
+                def text_parse(report):
+                    parser = Parser(report=report)
+                    lexer = Lexer(report=report, names=parser.names)
+                    return flatten(parser.parse(lexer.tokenize(text)))
+
+                def mapped_parse(report):
+                    parser = Parser(report=report)
+                    source = MmapLexer(Lexer(report=report, names=parser.names))
+                    return flatten(parser.parse(source.tokenize(buffer)))
+
+                assert collect(mapped_parse) == collect(text_parse), text
+
+def check():
+    import parser_compiler
+
+    # the *_tab.py modules aren't in git, (re)build them for the current grammar
+    for spec in parser_compiler.DEFAULT_SPECS:
+        parser_compiler.build(spec)
+
+    import test_left_recursive
+    import test_lexer
+    import test_lexer_tab
+    import test_parser
+    import test_parser_tab
+
+    grammars = [(test_lexer.TestLexer, test_parser.TestParser), (test_lexer_tab.TestLexer, test_parser_tab.TestParser),
+                (test_left_recursive.Lexer, None)]
+    texts = EDGE_CASES + [generate(300, depth=3, missions=0.1, errors=0.1, seed=n) for n in range(5)]
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, 'check.h2')
+    try:
+        for text in texts:
+            check_text(path, text, grammars)
+
+        # punctuation is never decoded, callback tokens are
+        with open(path, 'w') as f:
+            f.write('x = (1 + y) * 2\n')
+        with mapped(path) as buffer:
+            tokens = list(MmapLexer(test_lexer.TestLexer()).tokenize(buffer))
+            unread = set(tok.type for tok in tokens if tok._value is _UNREAD)
+            assert unread == {'ASSIGN', 'LPAREN', 'PLUS', 'RPAREN', 'TIMES'}, unread
+
+        # bad UTF-8 fails as reading the text does
+        for data in (b'x = "\xff"\n', b'x = 1 \xc3\n'):
+            with open(path, 'wb') as f:
+                f.write(data)
+            with mapped(path) as buffer:
+                try:
+                    list(tok.value for tok in MmapLexer(test_lexer.TestLexer()).tokenize(buffer))
+                    assert False, data
+                except UnicodeDecodeError:
+                    pass
+    finally:
+        os.unlink(path)
+        os.rmdir(directory)
+
+# a file of about size bytes: a generated script repeated
+def write_script(path, size):
+    chunk = generate(20000, depth=3, missions=0.05, nesting=2, seed=3)
+    with open(path, 'w') as f:
+        for n in range(max(1, size // len(chunk))):
+            f.write(chunk)
+
+# what a child process runs, prints its result line
+def child(mode, path):
+    start = time.perf_counter()
+    if mode in ('read', 'mmap'):
+        from test_lexer import TestLexer
+        lexer = TestLexer(report=lambda *error: None)
+        if mode == 'read':
+            with open(path) as f:
+                text = f.read()
+            count = sum(1 for tok in lexer.tokenize(text))
+        else:
+            with mapped(path) as buffer:
+                count = sum(1 for tok in MmapLexer(lexer).tokenize(buffer))
+        print("{} tokens".format(count))
+    else:
+        import h2
+        if mode == 'h2-read':
+            h2.mmap_threshold = None
+        else:
+            h2.mmap_threshold = 0
+        sys.argv = ['h2.py', path]
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            try:
+                h2.main()
+            except SystemExit:
+                pass
+        print(out.getvalue().splitlines()[-1].split(':', 1)[1].split(',')[0].strip())
+    print("{:.2f} s".format(time.perf_counter() - start))
+
+# (output, peak RSS in MB) of a child
+def run_child(mode, path):
+    process = subprocess.Popen([sys.executable, '-m', 'bench.mmap_lexer', '--child', mode, path],
+                               stdout=subprocess.PIPE, universal_newlines=True)
+    output = process.stdout.read()
+    pid, status, usage = os.wait4(process.pid, 0)
+    assert status == 0, output
+    return output.split('\n')[:2], usage.ru_maxrss / 1024
+
+def main():
+    import getopt
+
+    lex_size = 100
+    h2_size = 10
+    opts, args = getopt.getopt(sys.argv[1:], "m:s:", ["child="])
+    for o, a in opts:
+        if o == '-m':
+            lex_size = int(a)
+        elif o == '-s':
+            h2_size = int(a)
+        elif o == '--child':
+            child(a, args[0])
+            return
+
+    check()
+    print("check ok")
+
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, 'big.h2')
+    try:
+        for size, modes in ((lex_size, ('read', 'mmap')), (h2_size, ('h2-read', 'h2-mmap'))):
+            write_script(path, size * 2 ** 20)
+            print("{:.0f} MiB".format(os.path.getsize(path) / 2 ** 20))
+            results = []
+            for mode in modes:
+                (count, seconds), peak = run_child(mode, path)
+                results.append(count)
+                print("{:8} {:>20} {:>9}, peak RSS {:7.1f} MB".format(mode, count, seconds, peak))
+            assert results[0] == results[1], results
+    finally:
+        if os.path.exists(path):
+            os.unlink(path)
+        os.rmdir(directory)
+
+if __name__ == '__main__':
+    main()
+
+# end file
@@ -0,0 +1,102 @@
+#
+# bench/optimizer.py
+#
+# One turn over many ships with and without the optimizer, on the tree walking Interpreter and
+# the bytecode VM. Output and final variables must be the same either way.
+#
+#     python -m bench.optimizer [-s ships] [-t turns] [file]
+#
+
+import random
+import sys
+import time
+
+from bench.vm import run_turn
+from bytecode import VM, compile_tree
+from interpreter import Interpreter
+from optimizer import Optimizer
+from test_lexer import TestLexer
+from test_parser import TestParser
+
+# constants the way scripts are written: tuning values, derived limits, unit conversions.
+# 'halite' and 'cost' are per ship inputs.
+SCRIPT = '''
+turns = 400
+cap = 1000
+margin = cap / 10
+reserve = (cap - margin) * 2 / 3
+threshold = reserve + margin * 2
+bonus = -3
+strict = 1 == 1
+label = "ship" + " " + "report"
+cargo = halite * 2 - cost
+full = cargo > threshold
+Mission("collect") Do
+    rate = 25 * 4
+    gain = (halite - cost) / (rate / 25)
+    score = gain * (1 + 2) + cargo + bonus
+    Print(score >= 100 * 1)
+Done
+Mission("return") Do
+    left = cap - cargo
+    urgent = -left < 0
+    Print(label)
+    Print(urgent == strict)
+Done
+total = cargo + halite * (2 + 3) - (cost + 3) * 2 + turns / 4
+Print(total <= 4000 + margin)
+'''
+
+def main():
+    import getopt
+
+    ships = 300
+    turns = 20
+    opts, args = getopt.getopt(sys.argv[1:], "s:t:")
+    for o, a in opts:
+        if o == '-s':
+            ships = int(a)
+        elif o == '-t':
+            turns = int(a)
+    text = open(args[0]).read() if args else SCRIPT
+
+    tree = TestParser().parse(TestLexer().tokenize(text))
+    optimizer = Optimizer()
+    start = time.perf_counter()
+    optimized = optimizer.optimize(tree)
+    optimize_time = time.perf_counter() - start
+    for message in optimizer.errors:
+        print(message)
+
+    rng = random.Random(42)
+    states = [{'halite': rng.randint(0, 1000), 'cost': rng.randint(1, 100)} for n in range(ships)]
+
+    cases = [
+        ('tree walk', Interpreter, tree),
+        ('tree walk -O', Interpreter, optimized),
+        ('bytecode vm', VM, compile_tree(tree)),
+        ('bytecode vm -O', VM, compile_tree(optimized)),
+    ]
+
+    # same output and variables with and without the optimizer
+    expected = run_turn(Interpreter, states, tree)
+    for label, runner, code in cases:
+        assert run_turn(runner, states, code) == expected, label
+
+    print("optimized in {:.3f} ms: {} folded, {} propagated, {} removed; {} -> {} instructions".format(
+        optimize_time * 1000, optimizer.folded, optimizer.propagated, optimizer.removed,
+        len(cases[2][2].code) // 2, len(cases[3][2].code) // 2))
+    for label, runner, code in cases:
+        best = None
+        for turn in range(turns):
+            start = time.perf_counter()
+            run_turn(runner, states, code)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        print("{:16} {:8.3f} ms/turn {:8.2f} us/ship".format(label, best * 1000, best * 1e6 / ships))
+
+
+if __name__ == '__main__':
+    main()
+
+# end file
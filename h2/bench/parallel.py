@@ -0,0 +1,60 @@
+#
+# bench/parallel.py
+#
+# h2.py's multi-file check with 1, 2, 4 ... worker processes up to the CPU count, over a
+# directory of generated mission files. Speedup should be close to the number of workers until
+# the machine runs out of cores.
+#
+#     python -m bench.parallel [-f files] [-n statements per file] [-j max workers]
+#
+
+import os
+import sys
+import tempfile
+import time
+
+import h2
+from bench.corpus import generate
+
+def main():
+    import getopt
+
+    files = 200
+    statements = 500
+    largest = os.cpu_count() or 1
+    opts, args = getopt.getopt(sys.argv[1:], "f:n:j:")
+    for o, a in opts:
+        if o == '-f':
+            files = int(a)
+        elif o == '-n':
+            statements = int(a)
+        elif o == '-j':
+            largest = int(a)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        paths = []
+        for n in range(files):
+            path = os.path.join(workdir, 'mission{:04d}.h2'.format(n))
+            with open(path, 'w') as f:
+                f.write(generate(statements, missions=0.05, comments=0.1, seed=n))
+            paths.append(path)
+
+        print("{} files x {} statements, {} CPUs".format(files, statements, os.cpu_count()))
+        print("{:>4} {:>10} {:>9}".format('jobs', 'seconds', 'speedup'))
+        jobs = 1
+        base = None
+        while jobs <= largest:
+            start = time.perf_counter()
+            results = list(h2.check_files(paths, jobs))
+            elapsed = time.perf_counter() - start
+            assert [result.path for result in results] == paths
+            assert all(not result.errors for result in results)
+            base = elapsed if base is None else base
+            print("{:4d} {:10.2f} {:9.2f}".format(jobs, elapsed, base / elapsed))
+            jobs *= 2
+
+
+if __name__ == '__main__':
+    main()
+
+# end file
@@ -0,0 +1,167 @@
+#
+# bench/parse_context.py
+#
+# Parses a generated corpus (with syntax and string errors) from several threads at once on one
+# shared lexer/parser, through a ParserPool and by calling the shared pair directly, and checks
+# every tree, error list and token list against parsing the same text serially on a new pair.
+# The thread switch interval is made tiny so parses interleave within productions. Then the
+# time of the serial, shared and new-pair-per-parse ways, for the sly and the generated parser.
+#
+#     python -m bench.parse_context [-n texts] [-t threads] [-p pool size]
+#
+
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from ast_cache import flatten
+from bench.corpus import generate
+from parse_context import ParserPool
+from symbols import SYMBOL_KINDS
+
+def corpus(count):
+    return [generate(20 + n % 7 * 30, depth=3, missions=0.1, errors=0.1, seed=n) for n in range(count)]
+
+# (flat tree, errors) per text, each on a new pair
+def serial(texts, Lexer, Parser):
+    results = []
+    for text in texts:
+        errors = []
+
+        def report(line, column, message):
+            errors.append((line, column, message))
+
+        parser = Parser(report=report)
+        lexer = Lexer(report=report, names=parser.names)
+        results.append((flatten(parser.parse(lexer.tokenize(text))), errors))
+    return results
+
+def tokens(texts, Lexer):
+    return [[(token.type, token.value, token.index) for token in Lexer(report=lambda *error: None).tokenize(text)]
+            for text in texts]
+
+# symbol payloads are the table's ids
+def check_names(tree, names):
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        if node is None:
+            continue
+        if isinstance(node.value, tuple) and node.value[0] in SYMBOL_KINDS:
+            assert names[names.symbols[node.value[1]]] is node.value[1]
+        stack.extend(node.children)
+
+def check(texts, threads, size, Lexer, Parser):
+    expected = serial(texts, Lexer, Parser)
+    expected_tokens = tokens(texts, Lexer)
+
+    parser = Parser()
+    pool = ParserPool(size, Lexer(names=parser.names), parser)
+    busy = [0, 0]                     # contexts out now, most out at once
+    lock = threading.Lock()
+
+    def pooled(text):
+        with pool.context() as context:
+            with lock:
+                busy[0] += 1
+                busy[1] = max(busy)
+            tree, errors = context.parse(text)
+            check_names(tree, pool.parser.names)
+            token_list, token_errors = context.tokenize(text)
+            with lock:
+                busy[0] -= 1
+            return flatten(tree), errors, [(token.type, token.value, token.index) for token in token_list]
+
+    # the shared pair called directly: the lexer's index comes from a context of it
+    def shared(text):
+        lexer = pool.lexer.context(report=lambda *error: None)
+        return flatten(pool.parser.context(report=lambda *error: None).parse(lexer.tokenize(text)))
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        with ThreadPoolExecutor(threads) as executor:
+            results = list(executor.map(pooled, texts))
+            trees = list(executor.map(shared, texts))
+    finally:
+        sys.setswitchinterval(interval)
+
+    for (tree, errors, token_list), shared_tree, (flat, serial_errors), serial_tokens in zip(
+            results, trees, expected, expected_tokens):
+        assert tree == flat == shared_tree
+        assert errors == serial_errors
+        assert token_list == serial_tokens
+    assert 1 <= busy[1] <= size, busy
+    assert pool.free.qsize() == size
+    assert sum(len(errors) for tree, errors in expected), "corpus without errors"
+    # the shared instances hold no parse state
+    assert pool.parser.lines is None and pool.parser.line_start == 0 and pool.parser.char_adj == 0
+    assert not hasattr(pool.parser, 'statestack') and '_index_positions' not in vars(pool.parser)
+    assert not hasattr(pool.lexer, 'text') and pool.lexer.lines is None
+
+def timed(texts, threads, parse):
+    start = time.perf_counter()
+    if threads:
+        with ThreadPoolExecutor(threads) as executor:
+            list(executor.map(parse, texts))
+    else:
+        for text in texts:
+            parse(text)
+    return time.perf_counter() - start
+
+def main():
+    import getopt
+
+    import parser_compiler
+
+    # the *_tab.py modules aren't in git, (re)build them for the current grammar
+    for spec in parser_compiler.DEFAULT_SPECS:
+        parser_compiler.build(spec)
+
+    import test_lexer
+    import test_lexer_tab
+    import test_parser
+    import test_parser_tab
+
+    count = 200
+    threads = 8
+    size = 4
+    opts, args = getopt.getopt(sys.argv[1:], "n:t:p:")
+    for o, a in opts:
+        if o == '-n':
+            count = int(a)
+        elif o == '-t':
+            threads = int(a)
+        elif o == '-p':
+            size = int(a)
+
+    texts = corpus(count)
+    grammars = (('sly', test_lexer.TestLexer, test_parser.TestParser),
+                ('tab', test_lexer_tab.TestLexer, test_parser_tab.TestParser))
+    for name, Lexer, Parser in grammars:
+        check(texts, threads, size, Lexer, Parser)
+        print("check ok, {}: {} texts, {} threads, pool of {}".format(name, count, threads, size))
+
+    for name, Lexer, Parser in grammars:
+        parser = Parser(report=lambda *error: None)
+        lexer = Lexer(report=lambda *error: None, names=parser.names)
+        pool = ParserPool(size, lexer, parser)
+
+        def new_pair(text):
+            parser = Parser(report=lambda *error: None)
+            lexer = Lexer(report=lambda *error: None, names=parser.names)
+            return parser.parse(lexer.tokenize(text))
+
+        def same_pair(text):
+            return parser.parse(lexer.tokenize(text))
+
+        for label, threaded, parse in (('one pair, serial', 0, same_pair), ('new pair per parse', threads, new_pair),
+                                       ('pool', threads, pool.parse)):
+            seconds = timed(texts, threaded, parse)
+            print("{} {:20} {:7.3f} s, {:6.3f} ms/text".format(name, label, seconds, seconds * 1000 / count))
+
+if __name__ == '__main__':
+    main()
+
+# end file
@@ -0,0 +1,99 @@
+#
+# bench/profiler.py
+#
+# Checks that Profile.install() counts every reduction and token and puts the sly and the
+# generated (*_tab.py) classes back as they were, then times parsing before, with and after a
+# profile: after must cost the same as before.
+#
+#     python -m bench.profiler [-n repeat] [file]
+#
+
+import sys
+import timeit
+
+from bench.optimizer import SCRIPT
+from profiler import Profile
+
+# a syntax error and a bad character for the error recovery events
+BAD_SCRIPT = SCRIPT + '''
+x = = 3
+y = 4 $ 2
+'''
+
+def classes(tab):
+    if tab:
+        import parser_compiler
+
+        # the *_tab.py modules aren't in git, (re)build them for the current grammar
+        for spec in parser_compiler.DEFAULT_SPECS:
+            parser_compiler.build(spec)
+        import test_lexer_tab
+        import test_parser_tab
+        return test_parser_tab.TestParser, test_lexer_tab.TestLexer
+    import test_lexer
+    import test_parser
+    return test_parser.TestParser, test_lexer.TestLexer
+
+def state(parser_class, lexer_class):
+    grammar = getattr(parser_class, '_grammar', None)
+    productions = ([production.func for production in grammar.Productions] if grammar is not None
+                   else list(parser_class._productions))
+    return (productions, dict(lexer_class._token_funcs), vars(parser_class).get('error'),
+            vars(lexer_class).get('tokenize'), vars(lexer_class).get('error'))
+
+def check(tab):
+    parser_class, lexer_class = classes(tab)
+    parser = parser_class()
+    lexer = lexer_class(names=parser.names)
+    lexer.report = parser.report = lambda line, column, message: None
+    counter = lexer_class(names=parser.names)
+    counter.report = lexer.report
+    tokens = list(counter.tokenize(BAD_SCRIPT))
+
+    before = state(parser_class, lexer_class)
+    profile = Profile()
+    with profile.install(parser_class, lexer_class):
+        parser.parse(lexer.tokenize(BAD_SCRIPT))
+    assert state(parser_class, lexer_class) == before
+
+    assert sum(stat.calls for stat in profile.tokens.values()) == len(tokens)
+    assert profile.callbacks['NUMBER'].calls == profile.tokens['NUMBER'].calls
+    assert profile.productions['code -> statements'].calls == 1
+    assert [(event['kind'], event['type']) for event in profile.events] == [
+        ('syntax error', 'ASSIGN'), ('lexer error', 'ERROR'), ('syntax error', 'NUMBER')], profile.events
+
+def main():
+    import getopt
+
+    repeat = 20
+    opts, args = getopt.getopt(sys.argv[1:], "n:")
+    for o, a in opts:
+        if o == '-n':
+            repeat = int(a)
+    text = open(args[0]).read() if args else SCRIPT * 10
+
+    for tab in (False, True):
+        check(tab)
+    print("check ok")
+
+    for tab in (False, True):
+        parser_class, lexer_class = classes(tab)
+        parser = parser_class()
+        lexer = lexer_class(names=parser.names)
+
+        def parse():
+            parser.parse(lexer.tokenize(text))
+
+        before = min(timeit.repeat(parse, number=1, repeat=repeat))
+        profile = Profile()
+        with profile.install(parser_class, lexer_class):
+            profiled = min(timeit.repeat(parse, number=1, repeat=repeat))
+        after = min(timeit.repeat(parse, number=1, repeat=repeat))
+        print("{:5} before {:7.2f} ms, profiled {:7.2f} ms, after {:7.2f} ms".format(
+            'tab' if tab else 'sly', before * 1000, profiled * 1000, after * 1000))
+
+
+if __name__ == '__main__':
+    main()
+
+# end file
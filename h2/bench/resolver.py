@@ -0,0 +1,150 @@
+#
+# bench/resolver.py
+#
+# Variable access by name (env dict) against by slot (frame list): a micro benchmark of the two
+# lookups, then one turn over many ships on the bytecode VM with LOAD_NAME/STORE_NAME and with
+# the resolver's LOAD_SLOT/STORE_SLOT. Output and top level variables must be the same either
+# way; mission variables are local to their mission with slots.
+#
+# A slot saves one subscript and a dict lookup per access, against filling the frame from env
+# and storing it back once per run, so short per ship scripts come out about even and longer
+# ones gain a few percent. Most of the VM's time goes to dispatch, not variables.
+#
+#     python -m bench.resolver [-s ships] [-t turns] [file]
+#
+
+import random
+import sys
+import timeit
+
+from bench.optimizer import SCRIPT
+from bench.vm import run_turn
+from bytecode import VM, compile_tree
+from interpreter import H2RuntimeError
+from optimizer import Optimizer
+from resolver import Resolver
+from test_lexer import TestLexer
+from test_parser import TestParser
+
+INPUTS = ('halite', 'cost')
+
+# reads before assignment and a mission reading another mission's variable
+BAD_SCRIPT = '''
+a = b + 1
+Mission("one") Do
+    local = a * 2
+    a = local
+Done
+Mission("two") Do
+    Print(local)
+Done
+Print(halite + c)
+'''
+
+def parse(text):
+    return TestParser().parse(TestLexer().tokenize(text))
+
+def check():
+    resolver = Resolver(INPUTS)
+    tree = resolver.resolve(parse(BAD_SCRIPT))
+    assert resolver.errors == [
+        "Use of 'b' before assignment in top level",
+        "Use of 'local' before assignment in Mission 'two'",
+        "Use of 'c' before assignment in top level",
+    ], resolver.errors
+    # 'local' isn't visible to the host, the top level 'a' is updated by mission one
+    env = {'halite': 1, 'b': 2, 'c': 3, 'local': 'kept from the last turn'}
+    output = []
+    VM(env, output.append).run(compile_tree(tree, resolver.layout()))
+    assert env['a'] == 6 and env['local'] == 'kept from the last turn'
+    assert output == ['kept from the last turn', 4]
+
+    # missing from env: the checked code runs and raises, what ran before is kept
+    layout = resolver.layout()
+    assert [layout.names[slot] for slot in layout.required] == ['halite', 'b', 'local', 'c']
+    program = compile_tree(tree, layout)
+    env = {'halite': 1, 'b': 2, 'local': 0}
+    output = []
+    try:
+        VM(env, output.append).run(program)
+    except H2RuntimeError as e:
+        assert str(e) == "Undefined variable 'c'", e
+    else:
+        assert False, "no error for 'c'"
+    assert env['a'] == 6 and output == [0]
+
+    # mission one run on its own reads the top level 'a' from env
+    env = {'a': 5}
+    VM(env).run(program, 'one')
+    assert env == {'a': 10}
+
+def micro(count=1000000):
+    names = ['halite', 'cost', 'cargo', 'gain', 'score']
+    env = dict((name, n) for n, name in enumerate(names))
+    frame = list(range(len(names)))
+    setup = 'names = {!r}; env = {!r}; frame = {!r}'.format(names, env, frame)
+    by_name = min(timeit.repeat('env[names[3]]', setup, number=count, repeat=3))
+    by_slot = min(timeit.repeat('frame[3]', setup, number=count, repeat=3))
+    return by_name * 1e9 / count, by_slot * 1e9 / count
+
+# best turn of each program, the programs take turns so they see the same machine noise
+def best_turns(turns, states, programs):
+    best = [None] * len(programs)
+    for turn in range(turns):
+        for n, program in enumerate(programs):
+            start = timeit.default_timer()
+            run_turn(VM, states, program)
+            elapsed = timeit.default_timer() - start
+            best[n] = elapsed if best[n] is None else min(best[n], elapsed)
+    return best
+
+def main():
+    import getopt
+
+    ships = 300
+    turns = 20
+    opts, args = getopt.getopt(sys.argv[1:], "s:t:")
+    for o, a in opts:
+        if o == '-s':
+            ships = int(a)
+        elif o == '-t':
+            turns = int(a)
+    text = open(args[0]).read() if args else SCRIPT
+
+    check()
+    print("check ok")
+    by_name, by_slot = micro()
+    print("lookup: env[names[n]] {:.1f} ns, frame[n] {:.1f} ns".format(by_name, by_slot))
+
+    tree = parse(text)
+    rng = random.Random(42)
+    states = [{'halite': rng.randint(0, 1000), 'cost': rng.randint(1, 100)} for n in range(ships)]
+
+    cases = []
+    for label, optimized in (('', tree), (' -O', Optimizer().optimize(tree))):
+        resolver = Resolver(INPUTS)
+        resolved = resolver.resolve(optimized)
+        for message in resolver.errors:
+            print(message)
+        layout = resolver.layout()
+        by_names = compile_tree(optimized)
+        by_slots = compile_tree(resolved, layout)
+
+        # same output, same top level variables
+        top = set(layout.names[slot] for slot in layout.top)
+        envs, output = run_turn(VM, states, by_names)
+        slot_envs, slot_output = run_turn(VM, states, by_slots)
+        assert slot_output == output
+        assert slot_envs == [dict((name, value) for name, value in env.items() if name in top) for env in envs]
+
+        cases.append(('names' + label, by_names))
+        cases.append(('slots' + label, by_slots))
+
+    for (label, program), best in zip(cases, best_turns(turns, states, [program for label, program in cases])):
+        print("{:10} {:8.3f} ms/turn {:8.2f} us/ship".format(label, best * 1000, best * 1e6 / ships))
+
+
+if __name__ == '__main__':
+    main()
+
+# end file
@@ -0,0 +1,54 @@
+#
+# bench/scaling.py
+#
+# Parse time per statement from 1k to 1M statements for TestParser and the left recursive
+# Parser. Building the statement list is amortized O(1) per statement, so the per statement time
+# should stay flat as the script grows.
+#
+#     python -m bench.scaling [-m max statements]
+#
+
+import gc
+import sys
+import time
+
+from test_lexer import TestLexer
+from test_parser import TestParser
+from test_left_recursive import Lexer, Parser
+
+def timed(lexer, parser, text):
+    tokens = list(lexer.tokenize(text))
+    gc.collect()
+    start = time.perf_counter()
+    result = parser.parse(iter(tokens))
+    return time.perf_counter() - start, result
+
+def main():
+    import getopt
+
+    largest = 1000000
+    opts, args = getopt.getopt(sys.argv[1:], "m:")
+    for o, a in opts:
+        if o == '-m':
+            largest = int(a)
+
+    print("{:>10} {:>14} {:>14}".format('statements', 'TestParser us', 'Parser us'))
+    count = 1000
+    while count <= largest:
+        text = ''.join('v{} = {} + x\n'.format(n % 50, n) for n in range(count))
+
+        test_time, tree = timed(TestLexer(), TestParser(), text)
+        assert len(tree.children) == count
+        del tree
+        left_time, statements = timed(Lexer(), Parser(), text)
+        assert len(statements) == count
+        del statements
+
+        print("{:10d} {:14.2f} {:14.2f}".format(count, test_time * 1e6 / count, left_time * 1e6 / count))
+        count *= 10
+
+
+if __name__ == '__main__':
+    main()
+
+# end file
@@ -0,0 +1,137 @@
+#
+# bench/scheduler.py
+#
+# Checks the Scheduler against a FakeClock (every statement takes one second): priorities,
+# interleaving, quotas, the deadline, resuming next turn and errors. Then, on the real clock,
+# the cost of running a script through the scheduler against Interpreter.run() and how far
+# turns with a small budget go over it.
+#
+#     python -m bench.scheduler [-t turns] [-b budget_ms] [file]
+#
+
+import sys
+import timeit
+
+from bench.optimizer import SCRIPT
+from interpreter import Interpreter
+from scheduler import DEADLINE, DONE, ERROR, QUOTA, TOP, WAITING, FakeClock, Scheduler
+from test_lexer import TestLexer
+from test_parser import TestParser
+
+CHECK_SCRIPT = '''
+a = 1
+Mission("slow") Do
+    s1 = 1
+    s2 = 2
+    s3 = 3
+    Print("slow done")
+Done
+Mission("fast") Do
+    Print("fast")
+Done
+Mission("bad") Do
+    Print(nothing)
+Done
+'''
+
+PAIR_SCRIPT = '''
+Mission("a") Do
+    Print("a1")
+    Print("a2")
+Done
+Mission("b") Do
+    Print("b1")
+    Print("b2")
+Done
+'''
+
+def parse(text):
+    return TestParser().parse(TestLexer().tokenize(text))
+
+def states(report):
+    return dict((name, mission.state) for name, mission in report.missions.items())
+
+def check():
+    output = []
+    scheduler = Scheduler({}, output.append, budget=4, clock=FakeClock(step=1.0))
+    scheduler.load(parse(CHECK_SCRIPT), priorities={'fast': 1})
+
+    # TOP first, then fast, then slow and bad in script order; slow is suspended after s1
+    report = scheduler.turn()
+    assert list(report.missions) == [TOP, 'fast', 'slow', 'bad']
+    assert states(report) == {'fast': DONE, TOP: DONE, 'slow': DEADLINE, 'bad': ERROR}, states(report)
+    assert report.missions['bad'].error == "Undefined variable 'nothing'"
+    assert report.missions['slow'].used == 1.0 and report.used == 4.0 and report.overrun() == 0.0
+    assert report.suspended() == ['slow'] and output == ['fast']
+
+    # slow resumes a statement a turn, finishes on the fourth and starts over on the fifth
+    report = scheduler.turn()
+    assert scheduler.env == {'a': 1, 's1': 1, 's2': 2}
+    scheduler.turn()
+    report = scheduler.turn()
+    assert states(report)['slow'] == DONE and output == ['fast'] * 4 + ['slow done']
+    scheduler.env.clear()
+    scheduler.turn()
+    assert scheduler.env == {'a': 1, 's1': 1}
+
+    # a quota of 1.5 s lets slow run two statements a turn; a deadline before anything ran
+    scheduler = Scheduler({}, output.append, budget=100, clock=FakeClock(step=1.0))
+    scheduler.load(parse(CHECK_SCRIPT), quotas={'slow': 1.5})
+    report = scheduler.turn()
+    assert states(report)['slow'] == QUOTA and report.missions['slow'].statements == 2
+    scheduler.budget = 0
+    assert set(states(scheduler.turn()).values()) == {WAITING}
+
+    # missions of equal priority take turns
+    output = []
+    scheduler = Scheduler({}, output.append, budget=100, clock=FakeClock(step=1.0))
+    scheduler.load(parse(PAIR_SCRIPT))
+    scheduler.turn()
+    assert output == ['a1', 'b1', 'a2', 'b2'], output
+
+def main():
+    import getopt
+
+    turns = 200
+    budget = 0.00005
+    opts, args = getopt.getopt(sys.argv[1:], "t:b:")
+    for o, a in opts:
+        if o == '-t':
+            turns = int(a)
+        elif o == '-b':
+            budget = float(a) / 1000
+    text = open(args[0]).read() if args else SCRIPT
+
+    check()
+    print("check ok")
+
+    tree = parse(text)
+    env = {'halite': 700, 'cost': 30}
+    out = lambda value: None
+
+    # whole script each turn
+    scheduler = Scheduler(dict(env), out, budget=3600)
+    scheduler.load(tree)
+    statements = sum(mission.statements for mission in scheduler.turn().missions.values())
+    plain = min(timeit.repeat(lambda: Interpreter(dict(env), out).run(tree), number=turns, repeat=5)) / turns
+    scheduled = min(timeit.repeat(scheduler.turn, number=turns, repeat=5)) / turns
+    print("{} statements: interpreter {:.2f} us/turn, scheduler {:.2f} us/turn, {:.2f} us/statement overhead".format(
+        statements, plain * 1e6, scheduled * 1e6, (scheduled - plain) * 1e6 / statements))
+
+    # small budget: statements per turn and overrun
+    scheduler = Scheduler(dict(env), out, budget=budget)
+    scheduler.load(tree)
+    ran = []
+    overruns = []
+    for turn in range(turns):
+        report = scheduler.turn()
+        ran.append(sum(mission.statements for mission in report.missions.values()))
+        overruns.append(report.overrun())
+    print("budget {:.3f} ms: {:.1f} statements/turn, overrun max {:.2f} us, mean {:.2f} us".format(
+        budget * 1000, sum(ran) / turns, max(overruns) * 1e6, sum(overruns) * 1e6 / turns))
+
+
+if __name__ == '__main__':
+    main()
+
+# end file
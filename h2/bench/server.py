@@ -0,0 +1,160 @@
+#
+# bench/server.py
+#
+# Starts 'h2.py --socket PATH' and checks its answers against the lexer/parser run here, with
+# several asyncio clients sending requests at once. Then round trip times of small scripts over
+# the socket and over 'h2.py --serve' pipes, against running 'h2.py file' per script.
+#
+#     python -m bench.server [-n requests] [-c clients]
+#
+
+import asyncio
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench.corpus import generate
+from server import Server, tree_json
+
+SMALL = 'cargo = halite * 2 - cost\nPrint(cargo > 900)\n'
+
+def start_server(path):
+    process = subprocess.Popen([sys.executable, 'h2.py', '--socket', path], stderr=subprocess.DEVNULL)
+    deadline = time.time() + 30
+    while not os.path.exists(path):
+        if time.time() > deadline or process.poll() is not None:
+            raise RuntimeError("server did not start")
+        time.sleep(0.01)
+    return process
+
+def stop_server(process, path):
+    process.send_signal(signal.SIGINT)
+    process.wait(10)
+    assert not os.path.exists(path), "socket left behind"
+
+# JSON round trip of what the server sends for a Python response
+def plain(response):
+    return json.loads(json.dumps(response))
+
+async def client(path, requests):
+    reader, writer = await asyncio.open_unix_connection(path, limit=2 ** 26)
+    responses = []
+    for request in requests:
+        writer.write(json.dumps(request).encode() + b'\n')
+        await writer.drain()
+        responses.append(json.loads((await reader.readline()).decode()))
+    writer.close()
+    return responses
+
+def check(path, clients):
+    texts = [generate(n * 20 + 5, depth=3, missions=0.1, errors=0.1, seed=n) for n in range(clients * 3)]
+    local = Server()
+    loop = asyncio.new_event_loop()
+    jobs = []
+    for n in range(clients):
+        requests = []
+        for m, text in enumerate(texts[n::clients]):
+            requests.append({'id': [n, m], 'op': ('parse', 'check', 'tokenize')[m % 3], 'text': text})
+        jobs.append(client(path, requests))
+
+    async def together():
+        return await asyncio.gather(*jobs)
+
+    results = loop.run_until_complete(together())
+
+    # a request the server fails on (the tree is too deep for the JSON encoder) gets an internal
+    # error, and the connection and server go on
+    deep = {'id': 'deep', 'op': 'parse', 'text': 'x = ' + '-' * 5000 + '1\n'}
+    failed, after = loop.run_until_complete(client(path, [deep, {'id': 'after', 'op': 'check', 'text': SMALL}]))
+    loop.close()
+    assert not failed['ok'] and failed['internal'] and failed['id'] == 'deep', failed
+    assert after['ok'] and after['statements'] == 2, after
+    for n, responses in enumerate(results):
+        for m, (response, text) in enumerate(zip(responses, texts[n::clients])):
+            assert response['ok'] and response['id'] == [n, m], response
+            if response.get('tokens') is not None:
+                tokens, errors = local.tokenize(text)
+                assert response['tokens'] == plain(tokens) and response['errors'] == plain(errors)
+            else:
+                tree, errors = local.parse(text)
+                assert response['errors'] == plain(errors)
+                if 'tree' in response:
+                    assert response['tree'] == plain(tree_json(tree))
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+def round_trips(send, receive, count):
+    times = []
+    line = json.dumps({'id': 1, 'op': 'check', 'text': SMALL}).encode() + b'\n'
+    for n in range(count):
+        start = time.perf_counter()
+        send(line)
+        response = receive()
+        times.append(time.perf_counter() - start)
+        assert json.loads(response.decode())['ok']
+    return times
+
+def main():
+    import getopt
+
+    count = 2000
+    clients = 8
+    opts, args = getopt.getopt(sys.argv[1:], "n:c:")
+    for o, a in opts:
+        if o == '-n':
+            count = int(a)
+        elif o == '-c':
+            clients = int(a)
+
+    path = os.path.join(tempfile.mkdtemp(), 'h2.sock')
+    process = start_server(path)
+    try:
+        check(path, clients)
+        print("check ok, {} clients".format(clients))
+
+        sock = socket.socket(socket.AF_UNIX)
+        sock.connect(path)
+        reader = sock.makefile('rb')
+        times = round_trips(sock.sendall, reader.readline, count)
+        sock.close()
+        print("socket      median {:.3f} ms, 99% {:.3f} ms".format(median(times) * 1000,
+                                                                   sorted(times)[count * 99 // 100] * 1000))
+    finally:
+        stop_server(process, path)
+        os.rmdir(os.path.dirname(path))
+
+    pipe = subprocess.Popen([sys.executable, 'h2.py', '--serve'], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                            stderr=subprocess.DEVNULL)
+
+    def send(line):
+        pipe.stdin.write(line)
+        pipe.stdin.flush()
+
+    times = round_trips(send, pipe.stdout.readline, count)
+    pipe.stdin.close()
+    pipe.wait(10)
+    print("stdin/out   median {:.3f} ms, 99% {:.3f} ms".format(median(times) * 1000,
+                                                               sorted(times)[count * 99 // 100] * 1000))
+
+    with tempfile.NamedTemporaryFile('w', suffix='.h2', delete=False) as f:
+        f.write(SMALL)
+    times = []
+    for n in range(5):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, 'h2.py', f.name], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    os.unlink(f.name)
+    print("h2.py file  median {:.3f} ms".format(median(times) * 1000))
+
+
+if __name__ == '__main__':
+    main()
+
+# end file
@@ -0,0 +1,75 @@
+#
+# bench/startup.py
+#
+# Cold start cost of the parsers: import + first parse in a fresh interpreter, sly (tables built
+# from the @_ productions at class creation) vs the module generated by parser_compiler.py.
+#
+#     python -m bench.startup [-n runs] [file]
+#
+
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import parser_compiler
+
+H2_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# child process: time import + first parse, print seconds
+CHILD = '''
+import sys, time
+start = time.perf_counter()
+from {module} import {cls}
+from {lexer_module} import {lexer}
+result = {cls}().parse({lexer}().tokenize(open(sys.argv[1]).read()))
+print(time.perf_counter() - start)
+'''
+
+CASES = [
+    ('sly      test_parser', 'test_parser', 'TestParser', 'test_lexer', 'TestLexer'),
+    ('compiled test_parser', 'test_parser_tab', 'TestParser', 'test_lexer_tab', 'TestLexer'),
+    ('sly      test_left_recursive', 'test_left_recursive', 'Parser', 'test_left_recursive', 'Lexer'),
+    ('compiled test_left_recursive', 'test_left_recursive_tab', 'Parser', 'test_left_recursive_tab', 'Lexer'),
+]
+
+def run_case(module, cls, lexer_module, lexer, path, runs, workdir):
+    env = dict(os.environ, PYTHONPATH=H2_DIR, PYTHONDONTWRITEBYTECODE='')
+    code = CHILD.format(module=module, cls=cls, lexer_module=lexer_module, lexer=lexer)
+    inner = []
+    outer = []
+    for n in range(runs):
+        start = time.perf_counter()
+        out = subprocess.run([sys.executable, '-c', code, path], cwd=workdir, env=env,
+                             stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=True)
+        outer.append(time.perf_counter() - start)
+        inner.append(float(out.stdout.decode().split()[-1]))
+    return statistics.median(inner), statistics.median(outer)
+
+def main():
+    import getopt
+
+    runs = 10
+    opts, args = getopt.getopt(sys.argv[1:], "n:")
+    for o, a in opts:
+        if o == '-n':
+            runs = int(a)
+    path = os.path.abspath(args[0] if args else os.path.join(H2_DIR, 'expression.data'))
+
+    for spec in parser_compiler.DEFAULT_SPECS:
+        parser_compiler.build(spec)
+
+    print("{} runs, input {}".format(runs, path))
+    print("{:32} {:>16} {:>16}".format('', 'import+parse ms', 'process ms'))
+    with tempfile.TemporaryDirectory() as workdir:
+        for label, module, cls, lexer_module, lexer in CASES:
+            inner, outer = run_case(module, cls, lexer_module, lexer, path, runs, workdir)
+            print("{:32} {:16.2f} {:16.2f}".format(label, inner * 1000, outer * 1000))
+
+
+if __name__ == '__main__':
+    main()
+
+# end file
@@ -0,0 +1,70 @@
+#
+# bench/stream.py
+#
+# Peak memory and time to first token of TestLexer.tokenize over the joined file vs
+# tokenize_stream over its lines.
+#
+#     python -m bench.stream [-n lines]
+#
+
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from test_lexer import TestLexer
+
+def joined(path):
+    with open(path) as f:
+        lines = []
+        for line in f:
+            lines.append(line)
+        return TestLexer().tokenize(''.join(lines))
+
+def streamed(path):
+    return TestLexer().tokenize_stream(open(path))
+
+def measure(path, tokenize):
+    start = time.perf_counter()
+    tokens = tokenize(path)
+    next(tokens)
+    first = time.perf_counter() - start
+    count = 1 + sum(1 for _ in tokens)
+    total = time.perf_counter() - start
+
+    # separate pass, tracemalloc slows everything down
+    tracemalloc.start()
+    for tok in tokenize(path):
+        pass
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return count, first, total, peak
+
+def main():
+    import getopt
+
+    lines = 200000
+    opts, args = getopt.getopt(sys.argv[1:], "n:")
+    for o, a in opts:
+        if o == '-n':
+            lines = int(a)
+
+    with tempfile.NamedTemporaryFile('w', suffix='.h2', delete=False) as f:
+        for n in range(lines):
+            f.write('v{} = "text {}" + (x * {}) # note\n'.format(n % 100, n, n))
+        path = f.name
+    try:
+        print("{} lines, {:.1f} MiB".format(lines, os.path.getsize(path) / 2**20))
+        for label, tokenize in (('join', joined), ('stream', streamed)):
+            count, first, total, peak = measure(path, tokenize)
+            print("{:8} {:9d} tokens  first token {:8.2f} ms  total {:7.2f} s  peak {:8.2f} MiB".format(
+                label, count, first * 1000, total, peak / 2**20))
+    finally:
+        os.unlink(path)
+
+
+if __name__ == '__main__':
+    main()
+
+# end file
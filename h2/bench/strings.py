@@ -0,0 +1,109 @@
+#
+# bench/strings.py
+#
+# decode() against ast.literal_eval(), which the STRING callback used to run on every literal:
+# random single line literals must decode the same (errors included), then the time per literal with and
+# without escapes. Templates: a compiled "${name}" string on the VM against substituting the
+# placeholders in the text at run time with a regex.
+#
+#     python -m bench.strings [-n count]
+#
+
+import ast
+import random
+import re
+import sys
+import timeit
+
+from bytecode import VM, compile_tree
+from strings import StringError, decode, template
+from test_lexer import TestLexer
+from test_parser import TestParser
+
+PIECES = ['a', 'Z', ' ', '$', '{', '}', "'", '\\n', '\\t', '\\\\', '\\"', "\\'", '\\x41', '\\x4',
+          '\\u00e9', '\\U0001F600', '\\101', '\\0', '\\N{BULLET}', '\\N{NOPE}', '\\q', '\\\n', 'é']
+
+TEMPLATE_SCRIPT = '''
+name = "ship"
+id = 12
+halite = 640
+Print("${name} ${id}: ${halite} halite, ${full}")
+'''
+
+def literal(rng):
+    return '"' + ''.join(rng.choice(PIECES) for n in range(rng.randint(0, 8))) + '"'
+
+def python(text):
+    try:
+        return ast.literal_eval(text)
+    except (SyntaxError, ValueError):
+        return StringError
+
+def ours(text):
+    try:
+        return decode(text)
+    except StringError:
+        return StringError
+
+def check(count):
+    rng = random.Random(42)
+    for n in range(count):
+        text = literal(rng)
+        assert python(text) == ours(text), text
+    # unlike Python's, a literal may span lines
+    assert decode('"two\nlines\\n"') == 'two\nlines\n'
+    assert template('${a} and ${ b }$${c}') == (('id', 'a'), ('string', ' and '), ('id', 'b'), ('string', '${c}'))
+    assert template('$${c}') == '${c}'
+    for bad in ('${', '${1}', '${a b}'):
+        try:
+            template(bad)
+        except StringError:
+            pass
+        else:
+            assert False, bad
+
+def main():
+    import getopt
+
+    count = 20000
+    opts, args = getopt.getopt(sys.argv[1:], "n:")
+    for o, a in opts:
+        if o == '-n':
+            count = int(a)
+
+    check(count)
+    print("check ok")
+
+    for label, text in (('plain', '"collect halite near the shipyard"'),
+                        ('escaped', '"collect\\thalite\\nnear the \\"shipyard\\""')):
+        before = min(timeit.repeat(lambda: ast.literal_eval(text), number=count, repeat=3)) / count
+        after = min(timeit.repeat(lambda: decode(text), number=count, repeat=3)) / count
+        print("{:8} literal_eval {:6.2f} us, decode {:6.3f} us, {:5.0f}x".format(label, before * 1e6, after * 1e6,
+                                                                              before / after))
+
+    parser = TestParser()
+    tree = parser.parse(TestLexer(names=parser.names).tokenize(TEMPLATE_SCRIPT))
+    program = compile_tree(tree)
+    text = "${name} ${id}: ${halite} halite, ${full}"
+    placeholder = re.compile(r'\$\{\s*([a-zA-Z_][a-zA-Z0-9_]*)\s*\}')
+    env = {'full': False}
+    out = lambda value: None
+
+    def compiled():
+        VM(dict(env), out).run(program)
+
+    def rescan():
+        values = dict(env)
+        VM(values, out).run(program)
+        placeholder.sub(lambda m: str(values[m.group(1)]), text)
+
+    with_template = min(timeit.repeat(compiled, number=count, repeat=3)) / count
+    with_rescan = min(timeit.repeat(rescan, number=count, repeat=3)) / count
+    print("template  VM run {:6.2f} us, run + re.sub of the text {:6.2f} us".format(with_template * 1e6,
+                                                                                  with_rescan * 1e6))
+
+
+if __name__ == '__main__':
+    main()
+
+# end file
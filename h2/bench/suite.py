@@ -0,0 +1,216 @@
+#
+# bench/suite.py
+#
+# Throughput, memory and startup of TestLexer, TestParser and the left recursive Parser over
+# corpora of different shapes (bench/corpus.py). Results are written to a JSON file that a later
+# run can be compared against:
+#
+#     python -m bench.suite                              # writes bench/baseline.json
+#     ... change something ...
+#     python -m bench.suite -o /tmp/new.json -c bench/baseline.json
+#
+# With -c, metrics more than -t percent worse than the baseline are listed as regressions and the
+# exit status is 1. Options: -n statements per corpus, -r repeats (best time is kept),
+# -s skip the startup runs.
+#
+
+import gc
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+
+from bench import startup
+from bench.corpus import generate
+from test_lexer import TestLexer
+from test_parser import TestParser
+from test_left_recursive import Lexer, Parser
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+# corpus shapes, see bench/corpus.py
+SHAPES = [
+    ('plain', {}),
+    ('deep', {'depth': 8}),
+    ('strings', {'strings': 0.6}),
+    ('comments', {'comments': 0.4}),
+    ('missions', {'missions': 0.1, 'nesting': 3}),
+    ('errors', {'errors': 0.02}),
+]
+
+# name, lexer class, parser class (None: tokenize only), left recursive grammar
+TARGETS = [
+    ('TestLexer', TestLexer, None, False),
+    ('TestParser', TestLexer, TestParser, False),
+    ('Parser', Lexer, Parser, True),
+]
+
+# startup cases from bench/startup.py: label, module, class, lexer module, lexer class
+STARTUP = [
+    ('TestParser', 'test_parser', 'TestParser', 'test_lexer', 'TestLexer'),
+    ('TestParser compiled', 'test_parser_tab', 'TestParser', 'test_lexer_tab', 'TestLexer'),
+    ('Parser', 'test_left_recursive', 'Parser', 'test_left_recursive', 'Lexer'),
+    ('Parser compiled', 'test_left_recursive_tab', 'Parser', 'test_left_recursive_tab', 'Lexer'),
+]
+
+# metric: True if higher is better
+METRICS = {
+    'tokens_per_sec': True,
+    'statements_per_sec': True,
+    'peak_bytes': False,
+    'startup_ms': False,
+}
+
+def run(lexer_class, parser_class, text):
+    tokens = lexer_class().tokenize(text)
+    if parser_class is None:
+        return sum(1 for _ in tokens)
+    return parser_class().parse(tokens)
+
+def measure(lexer_class, parser_class, text, statements, repeats):
+    # syntax error messages from the 'errors' corpus are expected
+    with redirect_stdout(io.StringIO()):
+        count = sum(1 for _ in lexer_class().tokenize(text))
+        best = None
+        for _ in range(repeats):
+            gc.collect()
+            start = time.perf_counter()
+            run(lexer_class, parser_class, text)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+
+        # separate pass, tracemalloc slows everything down
+        gc.collect()
+        tracemalloc.start()
+        result = run(lexer_class, parser_class, text)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        del result
+
+    return {
+        'tokens': count,
+        'statements': statements,
+        'seconds': best,
+        'tokens_per_sec': count / best,
+        'statements_per_sec': statements / best,
+        'peak_bytes': peak,
+    }
+
+def measure_startup(runs):
+    for spec in startup.parser_compiler.DEFAULT_SPECS:
+        startup.parser_compiler.build(spec)
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, 'startup.h2')
+        with open(path, 'w') as f:
+            f.write(generate(50, left=True))
+        for label, module, cls, lexer_module, lexer in STARTUP:
+            inner, outer = startup.run_case(module, cls, lexer_module, lexer, path, runs, workdir)
+            results[label] = {'startup_ms': inner * 1000, 'process_ms': outer * 1000}
+    return results
+
+def git_revision():
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], stdout=subprocess.PIPE,
+                             stderr=subprocess.DEVNULL, check=True)
+        return out.stdout.decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+# list of (key, metric, old, new, percent worse) for metrics worse than threshold percent
+def regressions(baseline, current, threshold):
+    found = []
+    for section in ('results', 'startup'):
+        old_section = baseline.get(section, {})
+        for key, values in sorted(current.get(section, {}).items()):
+            old_values = old_section.get(key)
+            if old_values is None:
+                continue
+            for metric, higher_better in METRICS.items():
+                old = old_values.get(metric)
+                new = values.get(metric)
+                if not old or new is None:
+                    continue
+                worse = (old - new) / old if higher_better else (new - old) / old
+                if worse * 100 > threshold:
+                    found.append((key, metric, old, new, worse * 100))
+    return found
+
+def main():
+    import getopt
+
+    statements = 20000
+    repeats = 3
+    output = BASELINE
+    compare = None
+    threshold = 10.0
+    startup_runs = 5
+    opts, args = getopt.getopt(sys.argv[1:], "n:r:o:c:t:s")
+    for o, a in opts:
+        if o == '-n':
+            statements = int(a)
+        elif o == '-r':
+            repeats = int(a)
+        elif o == '-o':
+            output = a
+        elif o == '-c':
+            compare = a
+        elif o == '-t':
+            threshold = float(a)
+        elif o == '-s':
+            startup_runs = 0
+
+    report = {
+        'meta': {
+            'revision': git_revision(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'statements': statements,
+            'repeats': repeats,
+        },
+        'results': {},
+        'startup': {},
+    }
+
+    print("{:22} {:>9} {:>12} {:>12} {:>10}".format('', 'tokens', 'tokens/s', 'stmts/s', 'peak MiB'))
+    for shape_name, shape in SHAPES:
+        for name, lexer_class, parser_class, left in TARGETS:
+            text = generate(statements, left=left, seed=1, **shape)
+            values = measure(lexer_class, parser_class, text, statements, repeats)
+            key = '{}/{}'.format(shape_name, name)
+            report['results'][key] = values
+            print("{:22} {:9d} {:12.0f} {:12.0f} {:10.2f}".format(key, values['tokens'],
+                  values['tokens_per_sec'], values['statements_per_sec'], values['peak_bytes'] / 2**20))
+
+    if startup_runs:
+        report['startup'] = measure_startup(startup_runs)
+        for label, values in report['startup'].items():
+            print("{:22} startup {:8.2f} ms".format(label, values['startup_ms']))
+
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print("wrote {}".format(output))
+
+    if compare:
+        with open(compare) as f:
+            baseline = json.load(f)
+        found = regressions(baseline, report, threshold)
+        print("compared with {} (revision {})".format(compare, baseline.get('meta', {}).get('revision')))
+        for key, metric, old, new, worse in found:
+            print("  REGRESSION {:22} {:20} {:14.2f} -> {:14.2f} ({:+.1f}%)".format(key, metric, old, new, worse))
+        if found:
+            sys.exit(1)
+        print("  no regressions over {}%".format(threshold))
+
+
+if __name__ == '__main__':
+    main()
+
+# end file
@@ -0,0 +1,101 @@
+#
+# bench/symbols.py
+#
+# Memory held by the parse tree of a large generated script with identifiers and strings
+# interned to symbol ids (symbols.py) and with every token keeping its own text, as before. Also
+# checks that tokens and nodes carry the table's ids.
+#
+#     python -m bench.symbols [-n statements]
+#
+
+import sys
+import time
+import tracemalloc
+
+from ast_cache import flatten
+from bench.corpus import generate
+from symbols import SYMBOL_KINDS, SymbolTable
+from test_lexer import TestLexer
+from test_parser import TestParser
+
+# the table's interface without interning: every value stays the lexer's own str, a tree only
+# for measuring
+class Copies(SymbolTable):
+
+    def intern(self, text):
+        return text
+
+def parse(text, names):
+    parser = TestParser(names=names)
+    lexer = TestLexer(names=names)
+    return parser.parse(lexer.tokenize(text))
+
+def check(text):
+    names = SymbolTable()
+    lexer = TestLexer(names=names)
+    seen = {}
+    for tok in lexer.tokenize(text):
+        if tok.type in ('ID', 'STRING'):
+            assert type(tok.value) is int and names.id(names.text(tok.value)) == tok.value
+            assert seen.setdefault(names.text(tok.value), tok.value) is tok.value
+    assert [names.id(text) for text in names.symbols] == list(range(len(names)))
+
+    parser = TestParser(names=names)
+    lexer = TestLexer(names=names)
+    tree = parser.parse(lexer.tokenize(text))
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        if isinstance(node.value, tuple) and node.value[0] in SYMBOL_KINDS:
+            assert names[names.symbols[node.value[1]]] is node.value[1]
+        stack.extend(node.children)
+    assert flatten(tree, names) == flatten(parse(text, Copies()))
+
+# identifier and string payloads in a tree, and how many distinct objects they are
+def payloads(tree):
+    count = 0
+    objects = set()
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        if isinstance(node.value, tuple) and node.value[0] in SYMBOL_KINDS:
+            count += 1
+            objects.add(id(node.value[1]))
+        stack.extend(node.children)
+    return count, len(objects)
+
+def measure(text, names):
+    tracemalloc.start()
+    start = time.perf_counter()
+    tree = parse(text, names)
+    elapsed = time.perf_counter() - start
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return tree, size, elapsed
+
+def main():
+    import getopt
+
+    statements = 20000
+    opts, args = getopt.getopt(sys.argv[1:], "n:")
+    for o, a in opts:
+        if o == '-n':
+            statements = int(a)
+
+    check(generate(500, strings=0.3, missions=0.1, seed=1))
+    print("check ok")
+
+    text = generate(statements, missions=0.05, comments=0.1, seed=2)
+    TestParser()
+    print("{} statements".format(statements))
+    print("{:10} {:>10} {:>10} {:>10} {:>10}".format('', 'payloads', 'objects', 'tree MB', 'parse s'))
+    for label, names in (('copies', Copies()), ('interned', SymbolTable())):
+        tree, size, elapsed = measure(text, names)
+        print("{:10} {:10d} {:10d} {:10.2f} {:10.2f}".format(label, *payloads(tree), size / 1e6, elapsed))
+        del tree
+
+
+if __name__ == '__main__':
+    main()
+
+# end file
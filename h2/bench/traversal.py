@@ -0,0 +1,157 @@
+#
+# bench/traversal.py
+#
+# Checks the traversal.py walks and printer against the recursive SimpleNode.__str__ they
+# replace, on parse trees of a generated corpus and on trees deeper than the recursion limit.
+# Then the time of both printers on a chain as deep as the recursive one can go, and the time and
+# peak memory of write_tree() on a tree of a million nodes.
+#
+#     python -m bench.traversal [-n nodes]
+#
+
+import sys
+import time
+import tracemalloc
+
+from bench.corpus import generate
+from simple_node import SimpleNode
+from symbols import SYMBOLS
+from test_lexer import TestLexer
+from test_parser import TestParser
+from traversal import Visitor, postorder, preorder, tree_string, write_tree
+
+# the printer SimpleNode had, with symbol ids printed as their text
+def recursive_str(node, level=0):
+    ret = "\t" * level + repr(SYMBOLS.value_text(node.value)) + "\n"
+    for child in node.children:
+        ret += recursive_str(child, level + 1)
+    return ret
+
+def recursive_preorder(node, depth=0):
+    yield node, depth
+    for child in node.children:
+        yield from recursive_preorder(child, depth + 1)
+
+def recursive_postorder(node, depth=0):
+    for child in node.children:
+        yield from recursive_postorder(child, depth + 1)
+    yield node, depth
+
+# x = 1 + (x + (x + ...)), depth operators deep
+def chain(depth):
+    x = SYMBOLS.intern('x')
+    node = SimpleNode(('number', 1))
+    for n in range(depth):
+        node = SimpleNode('+', [SimpleNode(('id', x)), node])
+    return SimpleNode('code', [SimpleNode(('assign', x), [node])])
+
+# nodes/4 statements of 4 nodes: a wide tree
+def wide(nodes):
+    statements = []
+    x = SYMBOLS.intern('x')
+    for n in range(nodes // 4):
+        statements.append(SimpleNode(('assign', SYMBOLS.intern('v{}'.format(n % 100))),
+                                     [SimpleNode('+', [SimpleNode(('id', x)), SimpleNode(('number', n))])]))
+    return SimpleNode('code', statements)
+
+# counts kinds, skips the insides of '+'
+class Counter(Visitor):
+
+    def __init__(self):
+        self.entered = {}
+        self.left = []
+
+    def enter(self, node, depth):
+        kind = node.value[0] if isinstance(node.value, tuple) else node.value
+        self.entered[kind] = self.entered.get(kind, 0) + 1
+
+    def enter_plus(self, node, depth):
+        self.enter(node, depth)
+        return False
+
+    def leave_assign(self, node, depth):
+        self.left.append(depth)
+
+class Sink(object):
+
+    def __init__(self):
+        self.size = 0
+        self.writes = 0
+
+    def write(self, text):
+        self.size += len(text)
+        self.writes += 1
+
+def check():
+    text = generate(3000, depth=4, missions=0.05, nesting=3, seed=2)
+    tree = TestParser().parse(TestLexer().tokenize(text))
+    assert str(tree) == recursive_str(tree)
+    assert tree_string(tree, 2) == recursive_str(tree, 2)
+    assert list(preorder(tree)) == list(recursive_preorder(tree))
+    assert list(postorder(tree)) == list(recursive_postorder(tree))
+    assert list(preorder([None, tree.children[0], None])) == list(recursive_preorder(tree.children[0]))
+
+    counter = Counter()
+    counter.visit(tree)
+    nodes = [node for node, depth in preorder(tree)]
+    assigns = [depth for node, depth in preorder(tree) if isinstance(node.value, tuple) and node.value[0] == 'assign']
+    assert counter.left == assigns
+    assert counter.entered['assign'] == len(assigns)
+    assert 'id' in counter.entered and sum(counter.entered.values()) < len(nodes)
+
+    # deeper than the recursion limit
+    depth = sys.getrecursionlimit() * 5
+    deep = chain(depth)
+    lines = str(deep).splitlines()
+    assert len(lines) == len(list(preorder(deep))) == len(list(postorder(deep))) == depth * 2 + 3
+    assert lines[-1] == '\t' * (depth + 2) + "('number', 1)"
+
+    # chunks also within one node's children
+    sink = Sink()
+    write_tree(SimpleNode('code', [SimpleNode(('number', n)) for n in range(10000)]), sink)
+    assert sink.writes > 5
+
+def main():
+    import getopt
+
+    nodes = 1000000
+    opts, args = getopt.getopt(sys.argv[1:], "n:")
+    for o, a in opts:
+        if o == '-n':
+            nodes = int(a)
+
+    check()
+    print("check ok")
+
+    deep = chain(sys.getrecursionlimit() - 100)
+    for label, printer in (('recursive', recursive_str), ('iterative', tree_string)):
+        start = time.perf_counter()
+        text = printer(deep)
+        print("{:10} deep chain   {:7.2f} ms, {} bytes".format(label, (time.perf_counter() - start) * 1000,
+                                                             len(text)))
+
+    tree = wide(nodes)
+    del text
+    # timed, then again for the peak memory
+    def run(printer):
+        if printer is None:
+            sink = Sink()
+            write_tree(tree, sink)
+            return sink.size
+        return len(printer(tree))
+
+    for label, printer in (('recursive', recursive_str), ('str()', str), ('write_tree', None)):
+        start = time.perf_counter()
+        size = run(printer)
+        seconds = time.perf_counter() - start
+        tracemalloc.start()
+        run(printer)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print("{:10} {} nodes {:7.2f} s, {} bytes, peak {:.0f} KB".format(label, nodes, seconds, size, peak / 1024))
+
+
+if __name__ == '__main__':
+    main()
+
+# end file
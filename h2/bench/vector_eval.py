@@ -0,0 +1,84 @@
+#
+# bench/vector_eval.py
+#
+# One Halite turn evaluated once over arrays of per ship state (vector_eval.py) against once per
+# ship on the Interpreter and the bytecode VM (bench/vm.py). Every ship's variables and output
+# must be the same either way. Needs NumPy.
+#
+#     python -m bench.vector_eval [-s ships,ships,...] [-t turns] [file]
+#
+
+import random
+import sys
+import time
+
+from bench import vm
+from bench.vm import run_turn
+from bytecode import VM, compile_tree
+from interpreter import Interpreter
+from test_lexer import TestLexer
+from test_parser import TestParser
+from vector_eval import VectorEvaluator, columns, element, row
+
+# bench.vm's script plus masks combined with Not
+SCRIPT = vm.SCRIPT + '''
+idle = Not (halite > 500)
+Print(Not Not (cost <= 50))
+Print(Not idle == full)
+'''
+
+def vector_turn(states, tree):
+    output = []
+    env = columns(states)
+    VectorEvaluator(env, output.append).run(tree)
+    return env, output
+
+# per ship envs and output in run_turn()'s order
+def per_ship(states, env, output):
+    envs = [row(env, n) for n in range(len(states))]
+    return envs, [element(value, n) for n in range(len(states)) for value in output]
+
+def best_of(turns, function, *args):
+    best = None
+    for turn in range(turns):
+        start = time.perf_counter()
+        function(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def main():
+    import getopt
+
+    fleets = [10, 100, 300, 1000]
+    turns = 10
+    opts, args = getopt.getopt(sys.argv[1:], "s:t:")
+    for o, a in opts:
+        if o == '-s':
+            fleets = [int(n) for n in a.split(',')]
+        elif o == '-t':
+            turns = int(a)
+    text = open(args[0]).read() if args else SCRIPT
+
+    tree = TestParser().parse(TestLexer().tokenize(text))
+    program = compile_tree(tree)
+    rng = random.Random(42)
+
+    print("{:>6} {:>14} {:>14} {:>14} {:>8}".format('ships', 'tree walk ms', 'bytecode ms', 'vector ms', 'vs vm'))
+    for ships in fleets:
+        states = [{'halite': rng.randint(0, 1000), 'cost': rng.randint(1, 100)} for n in range(ships)]
+
+        # same variables and output for every ship
+        expected = run_turn(Interpreter, states, tree)
+        assert per_ship(states, *vector_turn(states, tree)) == expected
+
+        walk = best_of(turns, run_turn, Interpreter, states, tree)
+        vm = best_of(turns, run_turn, VM, states, program)
+        vector = best_of(turns, vector_turn, states, tree)
+        print("{:6d} {:14.3f} {:14.3f} {:14.3f} {:8.1f}".format(ships, walk * 1000, vm * 1000, vector * 1000, vm / vector))
+
+
+if __name__ == '__main__':
+    main()
+
+# end file
@@ -0,0 +1,86 @@
+#
+# bench/vm.py
+#
+# One Halite turn = run a mission script once per ship. Compares the tree walking Interpreter
+# with the bytecode VM on the same parse tree and checks they produce the same results.
+#
+#     python -m bench.vm [-s ships] [-t turns] [file]
+#
+
+import random
+import sys
+import time
+
+from bytecode import VM, compile_tree
+from interpreter import Interpreter
+from test_lexer import TestLexer
+from test_parser import TestParser
+
+# used when no script is given, 'halite' and 'cost' are per ship inputs
+SCRIPT = '''
+cargo = halite * 2 - cost
+full = cargo > 900
+Mission("collect") Do
+    gain = (halite - cost) / 4
+    score = gain * 3 + cargo
+    near = score >= 100
+    Print(near)
+Done
+Mission("return") Do
+    left = 1000 - cargo
+    urgent = -left < 0
+    Print(urgent == full)
+Done
+total = cargo + halite * 5 - (cost + 3) * 2
+Print(total <= 4000)
+'''
+
+def run_turn(make_runner, states, tree):
+    output = []
+    envs = []
+    for state in states:
+        env = dict(state)
+        make_runner(env, output.append).run(tree)
+        envs.append(env)
+    return envs, output
+
+def main():
+    import getopt
+
+    ships = 300
+    turns = 20
+    opts, args = getopt.getopt(sys.argv[1:], "s:t:")
+    for o, a in opts:
+        if o == '-s':
+            ships = int(a)
+        elif o == '-t':
+            turns = int(a)
+    text = open(args[0]).read() if args else SCRIPT
+
+    tree = TestParser().parse(TestLexer().tokenize(text))
+    start = time.perf_counter()
+    program = compile_tree(tree)
+    compile_time = time.perf_counter() - start
+
+    rng = random.Random(42)
+    states = [{'halite': rng.randint(0, 1000), 'cost': rng.randint(1, 100)} for n in range(ships)]
+
+    # same results from both engines
+    assert run_turn(Interpreter, states, tree) == run_turn(VM, states, program)
+
+    print("{} ships, {} turns, {} instructions (compiled in {:.3f} ms)".format(
+        ships, turns, len(program.code) // 2, compile_time * 1000))
+    for label, runner, code in (('tree walk', Interpreter, tree), ('bytecode vm', VM, program)):
+        best = None
+        for turn in range(turns):
+            start = time.perf_counter()
+            run_turn(runner, states, code)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        print("{:12} {:8.3f} ms/turn {:8.2f} us/ship".format(label, best * 1000, best * 1e6 / ships))
+
+
+if __name__ == '__main__':
+    main()
+
+# end file
@@ -0,0 +1,452 @@
+#
+# bytecode.py
+#
+# Compile SimpleNode trees to a flat instruction array and run them on a stack VM.
+#
+#     program = compile_tree(parser.parse(lexer.tokenize(text)))
+#     VM(env).run(program)
+#
+# Instructions are (opcode, argument) pairs in an array('i'). Arguments index the constant pool
+# (LOAD_CONST), the name pool (LOAD_NAME, STORE_NAME), the frame (LOAD_SLOT, STORE_SLOT) or the
+# mission table (RUN_MISSION). Mission bodies are compiled after the main code and called like
+# subroutines, so a host can also run a single mission with VM.run(program, 'name').
+#
+# Trees resolved by resolver.py compile to slot instructions given the resolver's layout:
+#
+#     program = compile_tree(resolver.resolve(tree), resolver.layout())
+#
+# The VM then keeps variables in a list. Top level slots that can be read before they are
+# assigned are filled from env when a run starts (and checked when read, LOAD_CHECKED), the
+# assigned ones are stored back to env when it ends.
+#
+# Identifier and string payloads are symbol ids (symbols.py). The compiler numbers names by id and
+# puts their text in the name pool, the text of string literals in the constant pool, so the VM
+# never looks at the symbol table.
+#
+
+from array import array
+
+from interpreter import CONTAINERS, H2RuntimeError
+from simple_node import split_value
+from symbols import SYMBOLS
+
+# opcodes, roughly in order of dispatch frequency
+LOAD_NAME   = 0
+LOAD_CONST  = 1
+STORE_NAME  = 2
+BINARY_ADD  = 3
+BINARY_SUB  = 4
+BINARY_MUL  = 5
+BINARY_DIV  = 6
+COMPARE_EQ  = 7
+COMPARE_GT  = 8
+COMPARE_LT  = 9
+COMPARE_GE  = 10
+COMPARE_LE  = 11
+NEGATE      = 12
+PRINT       = 13
+RUN_MISSION = 14
+RETURN      = 15
+HALT        = 16
+NOT         = 17
+LOAD_SLOT   = 18
+STORE_SLOT  = 19
+LOAD_CHECKED = 20
+BUILD_STRING = 21
+
+OPNAMES = dict((value, name) for name, value in globals().items() if name.isupper() and isinstance(value, int))
+
+BINARY_OPCODES = {
+    '+': BINARY_ADD,
+    '-': BINARY_SUB,
+    '*': BINARY_MUL,
+    '/': BINARY_DIV,
+    '==': COMPARE_EQ,
+    '>': COMPARE_GT,
+    '<': COMPARE_LT,
+    '>=': COMPARE_GE,
+    '<=': COMPARE_LE,
+}
+
+class CompileError(Exception):
+    pass
+
+# frame slot not assigned yet
+UNSET = object()
+
+#
+# Compiled script
+#
+#     code      array('i') of opcode, argument pairs
+#     consts    constant pool
+#     names     variable names used by LOAD_NAME/STORE_NAME
+#     missions  list of (name, entry pc), indexed by RUN_MISSION's argument
+#     layout    resolver.Layout of the slots used by LOAD_SLOT/STORE_SLOT, None without
+#     unchecked code with LOAD_CHECKED as LOAD_SLOT, run when every slot it reads is filled
+#
+class Program(object):
+    __slots__ = ('code', 'consts', 'names', 'missions', 'layout', 'unchecked')
+
+    def __init__(self, code, consts, names, missions, layout=None):
+        self.code = code
+        self.consts = consts
+        self.names = names
+        self.missions = missions
+        self.layout = layout
+        self.unchecked = None
+        if layout is not None:
+            self.unchecked = array('i', code)
+            for pc in range(0, len(code), 2):
+                if code[pc] == LOAD_CHECKED:
+                    self.unchecked[pc] = LOAD_SLOT
+
+    def mission(self, name):
+        for n, (mission, pc) in enumerate(self.missions):
+            if mission == name:
+                return n
+        raise KeyError(name)
+
+    def disassemble(self):
+        lines = []
+        entries = dict((pc, name) for name, pc in self.missions)
+        code = self.code
+        for pc in range(0, len(code), 2):
+            if pc in entries:
+                lines.append('mission {!r}:'.format(entries[pc]))
+            op, arg = code[pc], code[pc + 1]
+            if op == LOAD_CONST:
+                detail = repr(self.consts[arg])
+            elif op in (LOAD_NAME, STORE_NAME):
+                detail = self.names[arg]
+            elif op in (LOAD_SLOT, STORE_SLOT, LOAD_CHECKED):
+                detail = '{} ({})'.format(arg, self.layout.names[arg])
+            elif op == RUN_MISSION:
+                detail = repr(self.missions[arg][0])
+            elif op == BUILD_STRING:
+                detail = str(arg)
+            else:
+                detail = ''
+            lines.append('{:6} {:12} {}'.format(pc, OPNAMES[op], detail).rstrip())
+        return '\n'.join(lines)
+
+class Compiler(object):
+
+    # layout: resolver.Layout for resolved trees
+    # symbols: the SymbolTable of the tree's ids
+    def __init__(self, layout=None, symbols=None):
+        self.layout = layout
+        self.symbols = SYMBOLS if symbols is None else symbols
+        self.code = array('i')
+        self.consts = []
+        self.const_index = {}
+        self.names = []
+        self.name_index = {}          # symbol id -> index in names
+        self.missions = []
+        self.pending = []          # (mission index, codeblock node) compiled after the main code
+
+    def emit(self, op, arg=0):
+        self.code.append(op)
+        self.code.append(arg)
+
+    def const(self, value):
+        # keyed by type too so True and 1 get different slots
+        key = (type(value), value)
+        n = self.const_index.get(key)
+        if n is None:
+            n = self.const_index[key] = len(self.consts)
+            self.consts.append(value)
+        return n
+
+    def name(self, id):
+        n = self.name_index.get(id)
+        if n is None:
+            n = self.name_index[id] = len(self.names)
+            self.names.append(self.symbols.text(id))
+        return n
+
+    def slot(self, slot):
+        if self.layout is None:
+            raise CompileError("Slot {} in a tree compiled without a layout".format(slot))
+        return slot
+
+    def compile(self, tree):
+        self.statements(tree)
+        self.emit(HALT)
+
+        # mission bodies, including missions nested in missions
+        while self.pending:
+            index, body = self.pending.pop(0)
+            name, _ = self.missions[index]
+            self.missions[index] = (name, len(self.code))
+            self.statements(body)
+            self.emit(RETURN)
+
+        return Program(self.code, self.consts, self.names, self.missions, self.layout)
+
+    # statement lists, iterative since Mission blocks can nest
+    def statements(self, tree):
+        if tree is None:
+            return
+        stack = list(reversed(tree)) if isinstance(tree, list) else [tree]
+        while stack:
+            node = stack.pop()
+            if node is None:
+                continue
+            kind, payload = split_value(node.value)
+            if kind in CONTAINERS:
+                stack.extend(reversed(node.children))
+            elif kind == 'assign':
+                self.expression(node.children[0])
+                self.emit(STORE_NAME, self.name(payload))
+            elif kind == '=':
+                self.expression(node.children[1])
+                self.emit(STORE_NAME, self.name(node.children[0].value[1]))
+            elif kind == 'store':
+                self.expression(node.children[0])
+                self.emit(STORE_SLOT, self.slot(payload))
+            elif kind == 'print':
+                self.expression(node.children[0])
+                self.emit(PRINT)
+            elif kind == 'mission':
+                index = len(self.missions)
+                self.missions.append((self.symbols.text(payload), -1))
+                self.pending.append((index, node.children[0] if node.children else None))
+                self.emit(RUN_MISSION, index)
+            elif kind == 'error':
+                raise CompileError(payload)
+            else:
+                raise CompileError("Unknown statement {!r}".format(node.value))
+
+    # expressions, emitted in post order with an explicit stack
+    def expression(self, root):
+        stack = [(root, False)]
+        while stack:
+            node, visited = stack.pop()
+            kind, payload = split_value(node.value)
+            if visited:
+                if kind == 'uminus':
+                    self.emit(NEGATE)
+                elif kind == 'not':
+                    self.emit(NOT)
+                elif kind == 'template':
+                    self.emit(BUILD_STRING, len(node.children))
+                else:
+                    self.emit(BINARY_OPCODES[kind])
+            elif kind in ('number', 'bool'):
+                self.emit(LOAD_CONST, self.const(payload))
+            elif kind == 'string':
+                self.emit(LOAD_CONST, self.const(self.symbols.text(payload)))
+            elif kind == 'id':
+                self.emit(LOAD_NAME, self.name(payload))
+            elif kind == 'load':
+                self.emit(LOAD_SLOT, self.slot(payload))
+            elif kind == 'load_checked':
+                self.emit(LOAD_CHECKED, self.slot(payload))
+            elif kind in BINARY_OPCODES or kind == 'uminus' or kind == 'not' or kind == 'template':
+                stack.append((node, True))
+                stack.extend((child, False) for child in reversed(node.children))
+            elif kind == 'error':
+                raise CompileError(payload)
+            else:
+                raise CompileError("Unknown expression {!r}".format(node.value))
+
+def compile_tree(tree, layout=None, symbols=None):
+    return Compiler(layout, symbols).compile(tree)
+
+class VM(object):
+
+    # env maps variable names to values and is updated in place, out is called for Print
+    def __init__(self, env=None, out=print):
+        self.env = {} if env is None else env
+        self.out = out
+
+    # run the main code, or a single mission by name
+    def run(self, program, mission=None):
+        if program.layout is not None:
+            return self.run_slots(program, mission)
+        code = program.code
+        consts = program.consts
+        names = program.names
+        missions = program.missions
+        env = self.env
+        out = self.out
+        stack = []
+        push = stack.append
+        pop = stack.pop
+        calls = []
+
+        if mission is None:
+            pc = 0
+        else:
+            pc = missions[program.mission(mission)][1]
+            calls.append(-1)
+
+        try:
+            while True:
+                op = code[pc]
+                arg = code[pc + 1]
+                pc += 2
+                if op == LOAD_NAME:
+                    push(env[names[arg]])
+                elif op == LOAD_CONST:
+                    push(consts[arg])
+                elif op == STORE_NAME:
+                    env[names[arg]] = pop()
+                elif op == BINARY_ADD:
+                    b = pop()
+                    stack[-1] = stack[-1] + b
+                elif op == BINARY_SUB:
+                    b = pop()
+                    stack[-1] = stack[-1] - b
+                elif op == BINARY_MUL:
+                    b = pop()
+                    stack[-1] = stack[-1] * b
+                elif op == BINARY_DIV:
+                    b = pop()
+                    stack[-1] = stack[-1] / b
+                elif op == COMPARE_EQ:
+                    b = pop()
+                    stack[-1] = stack[-1] == b
+                elif op == COMPARE_GT:
+                    b = pop()
+                    stack[-1] = stack[-1] > b
+                elif op == COMPARE_LT:
+                    b = pop()
+                    stack[-1] = stack[-1] < b
+                elif op == COMPARE_GE:
+                    b = pop()
+                    stack[-1] = stack[-1] >= b
+                elif op == COMPARE_LE:
+                    b = pop()
+                    stack[-1] = stack[-1] <= b
+                elif op == NEGATE:
+                    stack[-1] = -stack[-1]
+                elif op == NOT:
+                    stack[-1] = not stack[-1]
+                elif op == PRINT:
+                    out(pop())
+                elif op == RUN_MISSION:
+                    calls.append(pc)
+                    pc = missions[arg][1]
+                elif op == RETURN:
+                    pc = calls.pop()
+                    if pc < 0:
+                        return
+                elif op == HALT:
+                    return
+                elif op == BUILD_STRING:
+                    values = stack[len(stack) - arg:]
+                    del stack[len(stack) - arg:]
+                    push(''.join(map(str, values)))
+                else:
+                    raise H2RuntimeError("Bad opcode {} at {}".format(op, pc - 2))
+        except KeyError as e:
+            raise H2RuntimeError("Undefined variable '{}'".format(e.args[0]))
+        except (TypeError, ZeroDivisionError) as e:
+            raise H2RuntimeError("{}: {} at {}".format(e.__class__.__name__, e, pc - 2))
+
+    # run() for resolved programs. The same loop, kept separate so each kind of program finds its
+    # variable instructions at the head of the if chain.
+    def run_slots(self, program, mission=None):
+        consts = program.consts
+        missions = program.missions
+        env = self.env
+        out = self.out
+        stack = []
+        push = stack.append
+        pop = stack.pop
+        calls = []
+
+        layout = program.layout
+        slot_names = layout.names
+        unset = UNSET
+        frame = [unset] * len(slot_names)
+        for slot in layout.loads:
+            frame[slot] = env.get(slot_names[slot], unset)
+
+        if mission is None:
+            code = program.unchecked
+            for slot in layout.required:
+                if frame[slot] is unset:
+                    code = program.code
+                    break
+            pc = 0
+        else:
+            # a mission run on its own can also read its enclosing missions' empty slots
+            code = program.code
+            pc = missions[program.mission(mission)][1]
+            calls.append(-1)
+
+        try:
+            while True:
+                op = code[pc]
+                arg = code[pc + 1]
+                pc += 2
+                if op == LOAD_SLOT:
+                    push(frame[arg])
+                elif op == LOAD_CONST:
+                    push(consts[arg])
+                elif op == STORE_SLOT:
+                    frame[arg] = pop()
+                elif op == BINARY_ADD:
+                    b = pop()
+                    stack[-1] = stack[-1] + b
+                elif op == BINARY_SUB:
+                    b = pop()
+                    stack[-1] = stack[-1] - b
+                elif op == BINARY_MUL:
+                    b = pop()
+                    stack[-1] = stack[-1] * b
+                elif op == BINARY_DIV:
+                    b = pop()
+                    stack[-1] = stack[-1] / b
+                elif op == COMPARE_EQ:
+                    b = pop()
+                    stack[-1] = stack[-1] == b
+                elif op == COMPARE_GT:
+                    b = pop()
+                    stack[-1] = stack[-1] > b
+                elif op == COMPARE_LT:
+                    b = pop()
+                    stack[-1] = stack[-1] < b
+                elif op == COMPARE_GE:
+                    b = pop()
+                    stack[-1] = stack[-1] >= b
+                elif op == COMPARE_LE:
+                    b = pop()
+                    stack[-1] = stack[-1] <= b
+                elif op == NEGATE:
+                    stack[-1] = -stack[-1]
+                elif op == NOT:
+                    stack[-1] = not stack[-1]
+                elif op == PRINT:
+                    out(pop())
+                elif op == RUN_MISSION:
+                    calls.append(pc)
+                    pc = missions[arg][1]
+                elif op == RETURN:
+                    pc = calls.pop()
+                    if pc < 0:
+                        return
+                elif op == HALT:
+                    return
+                elif op == BUILD_STRING:
+                    values = stack[len(stack) - arg:]
+                    del stack[len(stack) - arg:]
+                    push(''.join(map(str, values)))
+                elif op == LOAD_CHECKED:
+                    value = frame[arg]
+                    if value is unset:
+                        raise H2RuntimeError("Undefined variable '{}'".format(slot_names[arg]))
+                    push(value)
+                else:
+                    raise H2RuntimeError("Bad opcode {} at {}".format(op, pc - 2))
+        except (TypeError, ZeroDivisionError) as e:
+            raise H2RuntimeError("{}: {} at {}".format(e.__class__.__name__, e, pc - 2))
+        finally:
+            for slot in layout.stores:
+                value = frame[slot]
+                if value is not unset:
+                    env[slot_names[slot]] = value
+
+# end file
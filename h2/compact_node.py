@@ -0,0 +1,191 @@
+#
+# compact_node.py
+#
+# Memory compact alternatives to SimpleNode.
+#
+#     Node    slotted node: integer kind code, payload and a children tuple
+#     Arena   whole tree in parallel arrays: kind, payload index, first child and next sibling
+#
+# Both parsers take a node factory, e.g. TestParser(node_factory=Node) or
+# Parser(node_factory=arena.node), and both forms convert to and from SimpleNode trees so the
+# existing printers keep working.
+#
+
+from array import array
+
+from simple_node import SimpleNode, split_value
+
+#
+# Kind codes. Kinds with a payload come from tuple values, ('number', 1), the others from plain
+# strings, '+'. Unknown kinds are registered on first use.
+#
+KINDS = []
+KIND_CODES = {}
+HAS_PAYLOAD = []
+
+def register_kind(name, has_payload):
+    code = KIND_CODES.get(name)
+    if code is None:
+        code = KIND_CODES[name] = len(KINDS)
+        KINDS.append(name)
+        HAS_PAYLOAD.append(has_payload)
+    return code
+
+for _name in ('number', 'bool', 'string', 'id', 'ID', 'assign', 'mission', 'error'):
+    register_kind(_name, True)
+for _name in ('code', 'statements', 'statement', 'codeblock', 'print', '=', 'uminus',
+              '+', '-', '*', '/', '==', '>', '<', '>=', '<=', 'not', 'template'):
+    register_kind(_name, False)
+
+def kind_code(value):
+    kind, payload = split_value(value)
+    code = KIND_CODES.get(kind)
+    if code is None:
+        code = register_kind(kind, isinstance(value, tuple))
+    return code, payload
+
+def make_value(code, payload):
+    if HAS_PAYLOAD[code]:
+        return (KINDS[code], payload)
+    return KINDS[code]
+
+class Node(object):
+    __slots__ = ('kind', 'payload', 'children')
+
+    # same signature as SimpleNode so it can be used as a parser node factory
+    def __init__(self, value, children=()):
+        self.kind, self.payload = kind_code(value)
+        self.children = tuple(children)
+
+    @property
+    def value(self):
+        return make_value(self.kind, self.payload)
+
+    def __str__(self, level=0):
+        return to_simple(self).__str__(level)
+
+    def __repr__(self):
+        return '<Node {!r}>'.format(self.value)
+
+#
+# Conversions between trees. Iterative, parse trees can be deeper than the recursion limit.
+# A parse result may also be a list of statement nodes (left recursive parser).
+#
+def _convert(tree, make):
+    if tree is None:
+        return None
+    if isinstance(tree, list):
+        return [_convert(node, make) for node in tree]
+
+    # post order: children are converted before their parent
+    done = []
+    stack = [(tree, False)]
+    while stack:
+        node, visited = stack.pop()
+        if visited:
+            n = len(node.children)
+            children = done[len(done) - n:] if n else []
+            del done[len(done) - n:]
+            done.append(make(node.value, children))
+        else:
+            stack.append((node, True))
+            stack.extend((child, False) for child in reversed(node.children))
+    return done[0]
+
+def from_simple(tree):
+    return _convert(tree, Node)
+
+def to_simple(tree):
+    return _convert(tree, SimpleNode)
+
+#
+# Tree stored in parallel arrays. Node n is
+#
+#     kinds[n]           kind code
+#     payloads[n]        index in payload_pool, -1 for none
+#     first_child[n]     node id of the first child, -1 for a leaf
+#     next_sibling[n]    node id of the next child of the same parent, -1 for the last one
+#
+# Node ids are plain ints, so a parse with node_factory=arena.node returns ids (or a list of
+# ids) that index the arena.
+#
+class Arena(object):
+
+    def __init__(self):
+        self.kinds = array('B')
+        self.payloads = array('i')
+        self.first_child = array('i')
+        self.next_sibling = array('i')
+        self.payload_pool = []
+        self.payload_index = {}
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def _payload(self, payload):
+        # keyed by type too so True and 1 are stored separately
+        key = (type(payload), payload)
+        n = self.payload_index.get(key)
+        if n is None:
+            n = self.payload_index[key] = len(self.payload_pool)
+            self.payload_pool.append(payload)
+        return n
+
+    # node factory, same signature as SimpleNode; children are node ids
+    def node(self, value, children=()):
+        code, payload = kind_code(value)
+        n = len(self.kinds)
+        self.kinds.append(code)
+        self.payloads.append(self._payload(payload) if HAS_PAYLOAD[code] else -1)
+        self.first_child.append(children[0] if children else -1)
+        self.next_sibling.append(-1)
+        for prev, child in zip(children, children[1:]):
+            self.next_sibling[prev] = child
+        return n
+
+    def kind(self, n):
+        return KINDS[self.kinds[n]]
+
+    def payload(self, n):
+        p = self.payloads[n]
+        return self.payload_pool[p] if p >= 0 else None
+
+    def value(self, n):
+        return make_value(self.kinds[n], self.payload(n))
+
+    def children(self, n):
+        child = self.first_child[n]
+        while child >= 0:
+            yield child
+            child = self.next_sibling[child]
+
+    def to_simple(self, root):
+        if root is None:
+            return None
+        if isinstance(root, list):
+            return [self.to_simple(n) for n in root]
+
+        done = []
+        stack = [(root, False)]
+        while stack:
+            n, visited = stack.pop()
+            if visited:
+                count = sum(1 for _ in self.children(n))
+                children = done[len(done) - count:] if count else []
+                del done[len(done) - count:]
+                done.append(SimpleNode(self.value(n), children))
+            else:
+                stack.append((n, True))
+                stack.extend((child, False) for child in reversed(list(self.children(n))))
+        return done[0]
+
+    # add a SimpleNode or Node tree, returns the id (or list of ids) of its root
+    def add(self, tree):
+        return _convert(tree, self.node)
+
+    @classmethod
+    def from_simple(cls, tree):
+        arena = cls()
+        return arena, arena.add(tree)
+
+# end file
@@ -0,0 +1,251 @@
+#
+# dataflow.py
+#
+# Turn to turn evaluation that recomputes only what changed since the last turn.
+#
+#     flow = Dataflow(tree, env, out)
+#     report = flow.turn()                      # first turn: everything is computed
+#     env['halite'] = 640
+#     report = flow.turn(changed={'halite'})    # only what depends on halite
+#     report.recomputed, report.reused
+#
+# The statements (missions inline, as Interpreter.run() runs them) are compiled once into a graph
+# of cells: one per operator node of an expression that reads a variable, and one per variable the
+# script reads from env (an input). A read of a variable assigned earlier in the script points
+# straight at the assigned expression's cell, scripts have no branches so which assignment that is
+# never changes. Expressions without variables are computed once while building the graph, and
+# an expression repeated on the same cells (the same subtree reading the same assignments, e.g.
+# a shared node of a hashcons.py DAG) is one cell, computed once per turn.
+#
+# Every cell keeps its last value and the cells that read it. A turn takes the inputs the host
+# changed in env, or compares all of them with changed=None, and recomputes their readers in
+# graph order; a recomputed cell whose value is the same as before (same type and ==) doesn't pass
+# the change on. Then the statements are replayed from the cells: assignments store into env,
+# Print calls out, in script order. Errors are values too, the first statement whose value is an
+# H2RuntimeError raises it after the statements before it took effect, as with Interpreter.run().
+#
+# Inputs the script also assigns (x = x + 1) get last turn's final value from env, they are
+# compared on every turn whatever changed says. Other changes to env the host doesn't report are
+# not seen.
+#
+# Variables are keyed by the text of their symbol ids (symbols.py), as in env.
+#
+
+import heapq
+
+from hashcons import payload_key
+from interpreter import BINARY_OPS, H2RuntimeError, Interpreter
+from optimizer import assignment
+from scheduler import statements
+from simple_node import split_value
+from symbols import SYMBOLS
+
+# statement kinds of Dataflow.program
+ASSIGN = 'assign'
+PRINT = 'print'
+
+# expression kinds with arguments
+OPERATORS = set(BINARY_OPS) | {'uminus', 'not', 'template'}
+
+def same(a, b):
+    return a is b or (type(a) is type(b) and a == b)
+
+class Cell(object):
+    __slots__ = ('index', 'kind', 'payload', 'args', 'value', 'readers', 'queued')
+
+    # kind 'input' (payload: the H2RuntimeError of reading it while undefined), 'const' or an
+    # expression node kind; index orders a cell after the cells it reads
+    def __init__(self, index, kind, payload=None, args=(), value=None):
+        self.index = index
+        self.kind = kind
+        self.payload = payload
+        self.args = args
+        self.value = value
+        self.readers = []
+        self.queued = False
+
+#
+# One turn
+#
+#     changed      inputs whose value changed
+#     recomputed   cells computed again
+#     reused       cells whose value was kept
+#
+class FlowReport(object):
+    __slots__ = ('changed', 'recomputed', 'reused')
+
+    def __init__(self, changed, recomputed, reused):
+        self.changed = changed
+        self.recomputed = recomputed
+        self.reused = reused
+
+    def __repr__(self):
+        return '<FlowReport {} changed, {} recomputed, {} reused>'.format(self.changed, self.recomputed,
+                                                                          self.reused)
+
+class Dataflow(object):
+
+    # tree is a parse result (a node or a list of statement nodes), env, out and symbols as for
+    # Interpreter; share=False gives every expression its own cells
+    def __init__(self, tree, env=None, out=print, share=True, symbols=None):
+        self.env = {} if env is None else env
+        self.out = out
+        self.symbols = SYMBOLS if symbols is None else symbols
+        self.interpreter = Interpreter(symbols=self.symbols)
+        self.numbers = {} if share else None    # (kind, payload, arguments) -> cell
+        self.cells = []               # every cell but constants, in graph order
+        self.inputs = {}              # name -> input cell
+        self.program = []             # (ASSIGN, name, cell) or (PRINT, None, cell) per statement
+        self.fresh = True             # nothing computed yet
+        self.last = None              # FlowReport of the latest turn, also when it raised
+        self.recomputed = 0           # totals over all turns
+        self.reused = 0
+
+        defined = {}                  # name -> cell of its latest assignment while building
+        body = [] if tree is None else tree if isinstance(tree, list) else [tree]
+        for node in statements(body):
+            name, value = assignment(node)
+            if name is not None:
+                name = self.symbols.text(name)
+                cell = self.build(value, defined)
+                defined[name] = cell
+                self.program.append((ASSIGN, name, cell))
+                continue
+            kind, payload = split_value(node.value)
+            if kind == 'print':
+                self.program.append((PRINT, None, self.build(node.children[0], defined)))
+            elif kind == 'error':
+                self.program.append((PRINT, None, self.constant(H2RuntimeError(payload))))
+            else:
+                error = H2RuntimeError("Unknown statement {!r}".format(node.value))
+                self.program.append((PRINT, None, self.constant(error)))
+
+        # inputs the script overwrites, env carries their value from one turn to the next
+        self.carried = set(self.inputs) & set(defined)
+
+    def constant(self, value):
+        return Cell(-1, 'const', value=value)
+
+    def add(self, kind, payload=None, args=()):
+        cell = Cell(len(self.cells), kind, payload, args)
+        self.cells.append(cell)
+        for arg in args:
+            arg.readers.append(cell)
+        return cell
+
+    # the cell of an expression, defined maps names to the cells assigned to them so far
+    def build(self, node, defined):
+        kind, payload = split_value(node.value)
+        if kind == 'id':
+            name = self.symbols.text(payload)
+            cell = defined.get(name)
+            if cell is None:
+                cell = self.inputs.get(name)
+                if cell is None:
+                    undefined = H2RuntimeError("Undefined variable '{}'".format(name))
+                    cell = self.inputs[name] = self.add('input', undefined)
+            return cell
+        if kind not in OPERATORS:
+            try:
+                return self.constant(self.interpreter.evaluate(node))
+            except H2RuntimeError as e:
+                return self.constant(e)
+        args = [self.build(child, defined) for child in node.children]
+        cell = Cell(-1, kind, payload, args)
+        if all(arg.kind == 'const' for arg in args):
+            return self.constant(self.compute(cell))
+        if self.numbers is None:
+            return self.add(kind, payload, args)
+        # an operation on the same cells is the same value
+        key = (kind, payload_key(payload), tuple(('const', payload_key(arg.value)) if arg.kind == 'const'
+                                                 else arg.index for arg in args))
+        cell = self.numbers.get(key)
+        if cell is None:
+            cell = self.numbers[key] = self.add(kind, payload, args)
+        return cell
+
+    # value of an operator cell from its arguments' values, the Interpreter's semantics; the first
+    # argument holding an error is the result
+    def compute(self, cell):
+        values = [arg.value for arg in cell.args]
+        for value in values:
+            if isinstance(value, H2RuntimeError):
+                return value
+        kind = cell.kind
+        if kind in BINARY_OPS:
+            try:
+                return BINARY_OPS[kind](values[0], values[1])
+            except (TypeError, ZeroDivisionError) as e:
+                return H2RuntimeError("{}: {}".format(e.__class__.__name__, e))
+        elif kind == 'uminus':
+            try:
+                return -values[0]
+            except TypeError as e:
+                return H2RuntimeError("{}: {}".format(e.__class__.__name__, e))
+        elif kind == 'not':
+            return not values[0]
+        return ''.join([str(value) for value in values])
+
+    # changed: names of the inputs the host changed in env since the last turn, None for all
+    def turn(self, changed=None):
+        env = self.env
+        queue = []
+        if self.fresh:
+            self.fresh = False
+            for name, cell in self.inputs.items():
+                cell.value = env.get(name, cell.payload)
+            for cell in self.cells:
+                if cell.kind != 'input':
+                    cell.queued = True
+                    queue.append(cell.index)
+            count = len(self.inputs)
+        else:
+            names = self.inputs if changed is None else self.carried.union(changed)
+            count = 0
+            for name in names:
+                cell = self.inputs.get(name)
+                if cell is None:
+                    continue
+                value = env.get(name, cell.payload)
+                if not same(value, cell.value):
+                    cell.value = value
+                    count += 1
+                    for reader in cell.readers:
+                        if not reader.queued:
+                            reader.queued = True
+                            queue.append(reader.index)
+        heapq.heapify(queue)
+
+        # graph order: a cell is recomputed after everything it reads
+        cells = self.cells
+        compute = self.compute
+        recomputed = 0
+        while queue:
+            cell = cells[heapq.heappop(queue)]
+            cell.queued = False
+            recomputed += 1
+            value = compute(cell)
+            if not same(value, cell.value):
+                cell.value = value
+                for reader in cell.readers:
+                    if not reader.queued:
+                        reader.queued = True
+                        heapq.heappush(queue, reader.index)
+
+        reused = len(cells) - len(self.inputs) - recomputed
+        self.recomputed += recomputed
+        self.reused += reused
+        report = self.last = FlowReport(count, recomputed, reused)
+
+        out = self.out
+        for kind, name, cell in self.program:
+            value = cell.value
+            if isinstance(value, H2RuntimeError):
+                raise value.with_traceback(None)
+            if kind is ASSIGN:
+                env[name] = value
+            else:
+                out(value)
+        return report
+
+# end file
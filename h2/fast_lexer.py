@@ -0,0 +1,206 @@
+#
+# fast_lexer.py
+#
+# Second lexer engine for the same token spec: a sly Lexer class (TestLexer, the left recursive
+# Lexer) or a generated *_tab.py lexer. Tokens are identical to the class's own tokenize().
+#
+#     lexer = FastLexer(TestLexer(), values={'NUMBER': int})
+#     parser.parse(lexer.tokenize(text))
+#
+# The class's master regex is extended into a single pattern that also skips ignored characters
+# and matches literals and (last) any other character as an error, so finditer() walks the whole
+# text with one match per token. Reserved words are resolved with one dict lookup: every word
+# in reserved_words (and the remapping) is passed through the ID callback once up front and its
+# (type, value) kept, e.g. 'Done' -> ('BLOCK_END', 'Done'), 'True' -> ('BOOL', True). The ID
+# callback isn't called for other identifiers; it is assumed to leave them alone apart from
+# interning them in the lexer's names (symbols.SymbolTable) as ids, which is done here instead.
+#
+# values maps token types whose callback only converts the matched text (NUMBER) to a function
+# doing just that. Other callbacks (STRING, ENDLINE) and error() are called on a context of the
+# wrapped lexer (parse_context.py) as usual, with its index/lineno kept up to date.
+#
+
+import re
+
+from line_index import LineIndex
+from lrparser import Token
+from stream_lexer import TokenStream
+
+# extra groups of the master pattern
+END = 'END__'
+LITERAL = 'LITERAL__'
+ERROR = 'ERROR__'
+
+# (regex, keywords) per (lexer class, identifier type)
+_compiled = {}
+
+def _char_class(chars):
+    return '[{}]'.format(''.join('\\' + c if c in '\\]^-[' else c for c in sorted(chars)))
+
+def _compile(lexer, identifier):
+    cls = type(lexer)
+    key = (cls, identifier)
+    if key in _compiled:
+        return _compiled[key]
+
+    # ignored characters are a prefix of every match, the token is the group that matched. Any
+    # character starts a match (ERROR last), so the prefix never gives characters back except at
+    # the end of the text, where END matches instead.
+    master = cls._master_re
+    parts = [master.pattern]
+    if lexer.literals:
+        parts.append('(?P<{}>{})'.format(LITERAL, _char_class(lexer.literals)))
+    parts.append('(?P<{}>\\Z)'.format(END))
+    parts.append('(?P<{}>[\\s\\S])'.format(ERROR))
+    prefix = _char_class(lexer.ignore) + '*' if lexer.ignore else ''
+    regex = re.compile('{}(?:{})'.format(prefix, '|'.join(parts)), master.flags)
+
+    # reserved words through the remapping and the callbacks, as tokenize() would
+    remapping = cls._remapping
+    token_funcs = cls._token_funcs
+    lexer = lexer.context()
+    words = set(getattr(lexer, 'reserved_words', ())) | set(remapping.get(identifier, ()))
+    keywords = {}
+    for word in words:
+        tok = Token()
+        tok.value = word
+        tok.lineno = 1
+        tok.index = 0
+        tok.end = len(word)
+        tok.type = remapping.get(identifier, {}).get(word, identifier)
+        if tok.type in token_funcs:
+            lexer.index = tok.end
+            lexer.lineno = 1
+            tok = token_funcs[tok.type](lexer, tok)
+        if tok is None or tok.type in cls._ignored_tokens:
+            keywords[word] = None
+        else:
+            keywords[word] = (tok.type, tok.value)
+
+    _compiled[key] = regex, keywords
+    return regex, keywords
+
+class FastLexer(object):
+
+    # characters of remaining input passed to error() in token.value, as in stream_lexer.py
+    error_context = 80
+
+    # lexer: the lexer instance whose spec, callbacks and error() are used
+    # values: token type -> function converting the matched text, replacing its callback
+    # identifier: token type whose callback promotes reserved words
+    def __init__(self, lexer, values=None, identifier='ID'):
+        self.lexer = lexer
+        self.values = dict(values or {})
+        self.identifier = identifier
+        self.regex, self.keywords = _compile(lexer, identifier)
+        cls = type(lexer)
+        skip = set(self.values) | {identifier}
+        self.token_funcs = dict((name, func) for name, func in cls._token_funcs.items() if name not in skip)
+        self.remapping = dict((name, remap) for name, remap in cls._remapping.items() if name != identifier)
+        self.ignored_tokens = cls._ignored_tokens
+        names = getattr(lexer, 'names', None)
+        self.intern = names.intern if names is not None else None
+        self.lines = None
+        self.lineno = 1
+
+    # a TokenStream
+    def tokenize(self, text, lineno=1, index=0, lines=None):
+        if lines is None:
+            lines = LineIndex(text)
+        self.lines = lines
+        lexer = self.lexer.call_context(lines=lines, text=text)
+        return TokenStream(self._tokenize(lexer, text, lineno, index), lines)
+
+    # column of a token, 1-based
+    def find_column(self, text, token):
+        return self.lines.column(token.index)
+
+    def _tokenize(self, lexer, text, lineno, index):
+        finditer = self.regex.finditer
+        keywords = self.keywords
+        identifier = self.identifier
+        values = self.values
+        token_funcs = self.token_funcs
+        remapping = self.remapping
+        ignored_tokens = self.ignored_tokens
+        error_context = self.error_context
+        intern = self.intern
+
+        try:
+            while True:
+                # restarted at index when a callback or error() moves the position
+                moved = False
+                for m in finditer(text, index):
+                    kind = m.lastgroup
+                    if kind == END:
+                        break
+
+                    tok = Token()
+                    tok.lineno = lineno
+                    tok.index = start = m.start(kind)
+                    tok.end = index = m.end()
+                    value = m.group(kind)
+
+                    if kind == identifier:
+                        if value in keywords:
+                            promoted = keywords[value]
+                            if promoted is None:
+                                continue
+                            kind, value = promoted
+                        elif intern is not None:
+                            value = intern(value)
+                    elif kind in values:
+                        value = values[kind](value)
+                    elif kind == LITERAL:
+                        kind = value
+                    elif kind == ERROR:
+                        tok.type = 'ERROR'
+                        tok.value = text[start:start + error_context]
+                        lexer.index = start
+                        lexer.lineno = lineno
+                        tok = lexer.error(tok)
+                        if tok is not None:
+                            tok.end = lexer.index
+                            yield tok
+                        lineno = lexer.lineno
+                        if lexer.index != index:
+                            index = lexer.index
+                            moved = True
+                            break
+                        continue
+                    else:
+                        if kind in remapping:
+                            kind = remapping[kind].get(value, kind)
+                        if kind in token_funcs:
+                            tok.type = kind
+                            tok.value = value
+                            lexer.index = index
+                            lexer.lineno = lineno
+                            tok = token_funcs[kind](lexer, tok)
+                            lineno = lexer.lineno
+                            if lexer.index != index:
+                                index = lexer.index
+                                moved = True
+                            if tok is None or tok.type in ignored_tokens:
+                                if moved:
+                                    break
+                                continue
+                            yield tok
+                            if moved:
+                                break
+                            continue
+
+                    if kind in ignored_tokens:
+                        continue
+                    tok.type = kind
+                    tok.value = value
+                    yield tok
+
+                if not moved:
+                    index = len(text)
+                    return
+        finally:
+            self.lineno = lexer.lineno = lineno
+            lexer.index = index
+
+# end file
@@ -2,24 +2,278 @@
 #
 # h2.py
 #
+# Check H2 scripts. Each file is lexed and parsed on its own; with -j N the files are spread over
+# N worker processes, each reusing one lexer/parser. Results are printed in file order as soon as
+# they are ready:
+#
+#     path: 120 statements, 4.31 ms
+#     path:12:7: Syntax error at line 12, char 7. Token NUMBER(4)
+#
+# The exit status is 1 if any file has errors. Without files stdin is checked.
+#
+# With -c DIR parse results are kept in an ast_cache.ASTCache in DIR; unchanged files are loaded
+# from it instead of being lexed and parsed.
+#
+# With -o FILE the parse trees are also written to FILE in the compiled h2c.py format (files are
+# then parsed in this process). Compiled files can be checked like scripts, each script in them
+# is reported as file.h2c(name) with the errors recorded in its tree.
+#
+# With --profile files are checked in this process with profiler.py's wrappers installed in the
+# lexer and parser, and a table of the time spent per production and per token type is printed
+# at the end; --profile-json FILE also writes it to FILE. Cache hits aren't parsed, so they
+# aren't in it.
+#
+# Files of MMAP_THRESHOLD bytes or more are lexed straight from an mmap of the file instead of
+# being read into a str, see mmap_lexer.py. Not with -c DIR (the cache is keyed by the text) or
+# --profile, nor for files with '\r' line ends or when the locale's encoding isn't UTF-8.
+#
+# With --serve no files are checked: requests to check, parse or tokenize texts are read as JSON
+# lines from stdin, or from clients of the Unix domain socket given with --socket PATH, and
+# answered by one warm lexer/parser, see server.py. -c DIR applies, -v logs each request's time.
+#
+
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from simple_node import split_value
+from statements import count_statements
+
+# lexer and parser of this process, see warm_up()
+lexer = None
+parser = None
+
+# ASTCache of this process, see use_cache()
+cache = None
+
+# suffix of compiled files, see h2c.py
+COMPILED = '.h2c'
+
+# files this large are lexed from an mmap, see check_mapped()
+MMAP_THRESHOLD = 16 * 1024 * 1024
+
+# size from which check_file() maps files, None for never
+mmap_threshold = MMAP_THRESHOLD
+
+class FileResult(object):
+    __slots__ = ('path', 'statements', 'errors', 'seconds', 'cached')
+
+    # errors is a list of (line, column, message), line/column None when unknown
+    # cached is True when the parse result came from the cache
+    def __init__(self, path, statements, errors, seconds, cached=False):
+        self.path = path
+        self.statements = statements
+        self.errors = errors
+        self.seconds = seconds
+        self.cached = cached
+
+def warm_up():
+    global lexer, parser
+    from test_lexer import TestLexer
+    from test_parser import TestParser
+    parser = TestParser()
+    lexer = TestLexer(names=parser.names)
+
+# directory None for no cache
+def use_cache(directory):
+    global cache
+    if directory is None:
+        cache = None
+    elif cache is None or cache.directory != os.path.expanduser(directory):
+        from ast_cache import ASTCache
+        if parser is None:
+            warm_up()
+        cache = ASTCache(directory, names=parser.names)
+
+# (tree, errors, parser context, line index) of a text. The parse runs on contexts of the lexer
+# and parser (parse_context.py), the parser context has its positions for h2c.parser_lines().
+def parse_in_context(text):
+    if parser is None:
+        warm_up()
+    errors = []
+
+    def report(line, column, message):
+        errors.append((line, column, message))
+
+    tokens = lexer.context(report=report).tokenize(text)
+    context = parser.context(report=report)
+    tree = context.parse(tokens)
+    return tree, errors, context, tokens.lines
+
+# (tree, errors) of a text
+def parse_text(text):
+    return parse_in_context(text)[:2]
+
+def check_text(path, text):
+    start = time.perf_counter()
+    if cache is None:
+        tree, errors = parse_text(text)
+        cached = False
+    else:
+        hits = cache.hits
+        tree, errors = cache.parse(text, parse_text)
+        cached = cache.hits != hits
+    return FileResult(path, count_statements(tree), errors, time.perf_counter() - start, cached)
+
+# error nodes of a tree as (line, None, message), lines from a compiled file's line table
+def tree_errors(tree):
+    errors = []
+    stack = [tree] if tree is not None else []
+    while stack:
+        node = stack.pop()
+        kind, payload = split_value(node.value)
+        if kind == 'error':
+            errors.append((getattr(node, 'line', None) or None, None, payload))
+        stack.extend(reversed(node.children))
+    return errors
+
+# one FileResult per script in a compiled file
+def check_compiled(path):
+    from h2c import H2CError, H2CFile
+    results = []
+    try:
+        with H2CFile(path) as h2c:
+            for name in h2c.names():
+                start = time.perf_counter()
+                tree = h2c.root(name)
+                statements = count_statements(tree)
+                errors = tree_errors(tree)
+                results.append(FileResult('{}({})'.format(path, name), statements, errors,
+                                          time.perf_counter() - start))
+    except (OSError, H2CError) as e:
+        return [FileResult(path, 0, [(None, None, str(e))], 0.0)]
+    return results
+
+# FileResult of a script lexed from an mmap of it, see mmap_lexer.py. None if that could lex
+# differently from reading it as text (see mmap_lexer.same_as_text()).
+def check_mapped(path):
+    from mmap_lexer import MmapLexer, mapped, same_as_text
+    if parser is None:
+        warm_up()
+    start = time.perf_counter()
+    errors = []
+
+    def report(line, column, message):
+        errors.append((line, column, message))
+
+    try:
+        with mapped(path) as buffer:
+            if not same_as_text(buffer):
+                return None
+            tree = parser.context(report=report).parse(MmapLexer(lexer.context(report=report)).tokenize(buffer))
+    except (OSError, UnicodeDecodeError) as e:
+        return FileResult(path, 0, [(None, None, str(e))], 0.0)
+    return FileResult(path, count_statements(tree), errors, time.perf_counter() - start)
+
+# FileResults of a path, one per script for compiled files. cache_directory is passed along to
+# worker processes, see use_cache()
+def check_file(path, cache_directory=None):
+    if path.endswith(COMPILED):
+        return check_compiled(path)
+    use_cache(cache_directory)
+    try:
+        if cache is None and mmap_threshold is not None and os.path.getsize(path) >= mmap_threshold:
+            result = check_mapped(path)
+            if result is not None:
+                return [result]
+        with open(path) as f:
+            text = f.read()
+    except (OSError, UnicodeDecodeError) as e:
+        return [FileResult(path, 0, [(None, None, str(e))], 0.0)]
+    return [check_text(path, text)]
+
+# FileResults in the order of paths, jobs > 1 checks them in worker processes
+def check_files(paths, jobs=1, cache_directory=None):
+    if jobs <= 1 or len(paths) <= 1:
+        for path in paths:
+            for result in check_file(path, cache_directory):
+                yield result
+        return
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        chunksize = max(1, len(paths) // (jobs * 8))
+        for results in executor.map(check_file, paths, [cache_directory] * len(paths), chunksize=chunksize):
+            for result in results:
+                yield result
+
+# the FileResult of stdin, read and checked when the generator is first advanced: with --profile
+# that is inside the profile's install() block
+def check_stdin(cache_directory=None):
+    use_cache(cache_directory)
+    yield check_text('<stdin>', sys.stdin.read())
+
+# check and parse sources in this process, writing the trees to output in the h2c format
+def compile_files(paths, output):
+    from h2c import Writer, parser_lines
+    writer = Writer()
+    for path in paths:
+        start = time.perf_counter()
+        try:
+            with open(path) as f:
+                text = f.read()
+        except (OSError, UnicodeDecodeError) as e:
+            yield FileResult(path, 0, [(None, None, str(e))], 0.0)
+            continue
+        tree, errors, context, lines = parse_in_context(text)
+        writer.add(path, tree, parser_lines(context, lines))
+        yield FileResult(path, count_statements(tree), errors, time.perf_counter() - start)
+    writer.write(output)
+
+def print_result(result, verbose):
+    for line, column, message in result.errors:
+        if line is None:
+            print("{}: {}".format(result.path, message))
+        elif column is None:
+            print("{}:{}: {}".format(result.path, line, message))
+        else:
+            print("{}:{}:{}: {}".format(result.path, line, column, message))
+    if verbose or not result.errors:
+        print("{}: {} statements, {:.2f} ms{}".format(result.path, result.statements, result.seconds * 1000,
+                                                     " (cached)" if result.cached else ""))
+
+# print results as they come, returns the number of files, statements, errors and cache hits
+def print_results(results, verbose):
+    files = statements = errors = hits = 0
+    for result in results:
+        print_result(result, verbose)
+        sys.stdout.flush()
+        files += 1
+        statements += result.statements
+        errors += len(result.errors)
+        hits += result.cached
+    return files, statements, errors, hits
 
 def main():
-    import sys
+    global mmap_threshold
     import getopt
-    import fileinput
 
     debug = 0
     verbose = 0
+    jobs = 1
+    cache_directory = None
+    output = None
+    profile = False
+    profile_json = None
+    serve = False
+    socket_path = None
 
     def usage():
         program_name = sys.argv[0]
-        print("Usage: {} [options]".format(program_name))
+        print("Usage: {} [options] [file ...]".format(program_name))
+        print("  -c DIR,\t --cache DIR\tKeep parse results in DIR.")
         print("  -d,\t --debug\tDebug.")
         print("  -h,\t --help\t\tHelp.")
+        print("  -j N,\t --jobs N\tCheck files in N processes, 0 for one per CPU.")
+        print("  -o FILE, --output FILE\tWrite the parse trees to FILE (.h2c).")
+        print("  --profile\t\tPrint parse time per production and token type.")
+        print("  --profile-json FILE\tAlso write the profile to FILE as JSON.")
+        print("  --serve\t\tAnswer JSON requests on stdin/stdout, see server.py.")
+        print("  --socket PATH\t\tServe on a Unix domain socket at PATH.")
         print("  -v,\t --verbose\tVerbose.")
 
     try:
-        opts, args = getopt.getopt(sys.argv[1:] , "dhv", ["debug", "help", "verbose"])
+        opts, args = getopt.getopt(sys.argv[1:] , "c:dhj:o:v", ["cache=", "debug", "help", "jobs=", "output=", "profile",
+                                                                  "profile-json=", "serve", "socket=", "verbose"])
     except getopt.GetoptError as err:
         print(err)
         usage()
@@ -28,21 +282,71 @@ def main():
     #print("argv: {}".format(sys.argv))
 
     for o, a in opts:
-        if o in ("-d", "--debug"):
+        if o in ("-c", "--cache"):
+            cache_directory = a
+        elif o in ("-d", "--debug"):
             debug = 0
             verbose = 9999
         elif o in ("-h", "--help"):
-            sys.argv.remove(o)
             usage()
             sys.exit(0)
+        elif o in ("-j", "--jobs"):
+            jobs = int(a) or os.cpu_count() or 1
+        elif o in ("-o", "--output"):
+            output = a
+        elif o == "--profile":
+            profile = True
+        elif o == "--profile-json":
+            profile = True
+            profile_json = a
+        elif o == "--serve":
+            serve = True
+        elif o == "--socket":
+            serve = True
+            socket_path = a
         elif o in ("-v", "--verbose"):
             verbose += 1
         else:
             assert False, "Invalid option"
 
-    with fileinput.input() as f:
-        #parser.parse(''.join(f), tracking=True)
-        print("{}".format(''.join(f)))
+    if serve:
+        from server import Server
+        server = Server(cache_directory, sys.stderr if verbose else None)
+        if socket_path is None:
+            server.serve_files()
+        else:
+            server.serve_socket(socket_path)
+        sys.exit(0)
+
+    if profile:
+        from profiler import Profile
+        warm_up()
+        jobs = 1
+        mmap_threshold = None
+        profile = Profile()
+
+    start = time.perf_counter()
+    if output is not None:
+        results = compile_files(args, output)
+    elif args:
+        results = check_files(args, jobs, cache_directory)
+    else:
+        results = check_stdin(cache_directory)
+
+    if profile:
+        with profile.install(type(parser), type(lexer)):
+            files, statements, errors, hits = print_results(results, verbose)
+        print(profile.table())
+        if profile_json is not None:
+            profile.dump(profile_json)
+    else:
+        files, statements, errors, hits = print_results(results, verbose)
+
+    if verbose:
+        print("{} files, {} statements, {} errors in {:.2f} s".format(files, statements, errors, time.perf_counter() - start))
+        if cache_directory is not None:
+            print("cache: {} hits, {} misses".format(hits, files - hits))
+    sys.exit(1 if errors else 0)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,408 @@
+#
+# h2c.py
+#
+# Compiled H2 scripts: parse trees in a binary file that is mmap()ed and read lazily, so loading
+# a mission set costs the pages actually visited.
+#
+#     writer = Writer()
+#     writer.add('collect.h2', tree, line)       # line(node) -> source line, optional
+#     writer.write('missions.h2c')
+#
+#     with H2CFile('missions.h2c') as h2c:
+#         Interpreter(env).run(h2c.root('collect.h2'))     # lazy
+#         tree = h2c.tree('return.h2')                     # SimpleNodes
+#
+# Layout, little endian. Offsets are from the start of the file, counts are numbers of records
+# (bytes for strings):
+#
+#     header     magic 'H2C\0', format version u16, flags u16 (0), grammar hash 32 bytes
+#                (ast_cache.grammar_version()), then (offset u32, count u32) of each section:
+#     kinds      u32 per kind: constant holding the kind's name
+#     consts     (tag u8, 3 pad, a i32, b u32) per constant, deduplicated by type and value:
+#                  INT    a = value (int32)
+#                  BOOL   a = 0 or 1
+#                  STR    a = offset in strings, b = length in bytes
+#                  BIGINT decimal text in strings as for STR, ints outside int32
+#                  FLOAT  repr() text in strings as for STR
+#     strings    UTF-8 text of STR, BIGINT and FLOAT constants
+#     nodes      (kind u16, 2 pad, payload i32, first child i32, next sibling i32) per node, -1
+#                for no payload/child/sibling. Trees are in pre order, so a statement's nodes
+#                are next to each other. Same links as compact_node.Arena.
+#     lines      u32 per node, the source line the node starts on, 0 when unknown
+#     roots      (name u32, root node i32) per tree, name is a STR constant, root -1 for an
+#                empty script
+#
+# Nodes are read with struct.unpack_from() on a memoryview of the map. LazyNode has SimpleNode's
+# value and children, so the Interpreter, bytecode compiler and printers work on a file as is;
+# strings are decoded and interned on first use.
+#
+# Symbol ids (symbols.py) are stored as STR constants of their text and interned in the reader's
+# symbols (SYMBOLS by default) when read, ids are only meaningful in the process that made them.
+#
+
+import bisect
+import mmap
+import struct
+import sys
+
+from ast_cache import grammar_version
+from simple_node import SimpleNode, split_value
+from symbols import SYMBOL_KINDS, SYMBOLS
+
+MAGIC = b'H2C\0'
+FORMAT = 1
+
+SECTIONS = ('kinds', 'consts', 'strings', 'nodes', 'lines', 'roots')
+
+HEADER = struct.Struct('<4sHH32s' + 'II' * len(SECTIONS))
+KIND = struct.Struct('<I')
+CONST = struct.Struct('<BxxxiI')
+NODE = struct.Struct('<Hxxiii')
+LINE = struct.Struct('<I')
+ROOT = struct.Struct('<Ii')
+
+# constant tags
+INT = 0
+BOOL = 1
+STR = 2
+BIGINT = 3
+FLOAT = 4
+
+INT_MIN = -2 ** 31
+INT_MAX = 2 ** 31 - 1
+
+class H2CError(Exception):
+    pass
+
+# line(node) for Writer.add() from a sly parser's recorded positions and the lexer's LineIndex
+def parser_lines(parser, lines):
+    def line(node):
+        try:
+            index = parser.index_position(node)[0]
+        except (AttributeError, KeyError):
+            return 0
+        return lines.line(index) if index is not None else 0
+    return line
+
+class Writer(object):
+
+    # symbols: SymbolTable of the trees' ids
+    def __init__(self, version=None, symbols=None):
+        self.version = grammar_version() if version is None else version
+        self.symbols = SYMBOLS if symbols is None else symbols
+        self.kinds = []
+        self.kind_index = {}
+        self.consts = []              # (tag, a, b)
+        self.const_index = {}
+        self.strings = bytearray()
+        self.nodes = []               # [kind, payload, first child, next sibling]
+        self.lines = []
+        self.roots = []
+
+    def const(self, value):
+        # keyed by type too so True and 1 are stored separately
+        key = (type(value), value)
+        n = self.const_index.get(key)
+        if n is not None:
+            return n
+        if isinstance(value, bool):
+            record = (BOOL, int(value), 0)
+        elif isinstance(value, int) and INT_MIN <= value <= INT_MAX:
+            record = (INT, value, 0)
+        elif isinstance(value, int):
+            record = self.text(BIGINT, str(value))
+        elif isinstance(value, float):
+            record = self.text(FLOAT, repr(value))
+        elif isinstance(value, str):
+            record = self.text(STR, value)
+        else:
+            raise H2CError("Can't store constant {!r}".format(value))
+        n = self.const_index[key] = len(self.consts)
+        self.consts.append(record)
+        return n
+
+    def text(self, tag, text):
+        data = text.encode('utf-8', 'surrogatepass')
+        offset = len(self.strings)
+        self.strings += data
+        return (tag, offset, len(data))
+
+    def kind(self, name):
+        n = self.kind_index.get(name)
+        if n is None:
+            n = self.kind_index[name] = len(self.kinds)
+            self.kinds.append(self.const(name))
+        return n
+
+    # add a named tree (SimpleNode, Node or LazyNode; None for an empty script)
+    def add(self, name, tree, line=None):
+        if tree is None:
+            self.roots.append((self.const(name), -1))
+            return
+        root = len(self.nodes)
+        nodes = self.nodes
+        last_child = {}
+        value_text = self.symbols.value_text
+        stack = [(tree, -1)]
+        while stack:
+            node, parent = stack.pop()
+            n = len(nodes)
+            kind, payload = split_value(value_text(node.value))
+            has_payload = isinstance(node.value, tuple)
+            nodes.append([self.kind(kind), self.const(payload) if has_payload else -1, -1, -1])
+            self.lines.append((line(node) or 0) if line is not None else 0)
+            if parent >= 0:
+                prev = last_child.get(parent)
+                if prev is None:
+                    nodes[parent][2] = n
+                else:
+                    nodes[prev][3] = n
+                last_child[parent] = n
+            stack.extend((child, n) for child in reversed(node.children))
+        self.roots.append((self.const(name), root))
+
+    def to_bytes(self):
+        sections = [
+            b''.join(KIND.pack(n) for n in self.kinds),
+            b''.join(CONST.pack(*record) for record in self.consts),
+            bytes(self.strings),
+            b''.join(NODE.pack(*record) for record in self.nodes),
+            b''.join(LINE.pack(line) for line in self.lines),
+            b''.join(ROOT.pack(*record) for record in self.roots),
+        ]
+        counts = [len(self.kinds), len(self.consts), len(self.strings), len(self.nodes),
+                  len(self.lines), len(self.roots)]
+        table = []
+        offset = HEADER.size
+        for data, count in zip(sections, counts):
+            table.extend((offset, count))
+            offset += len(data)
+        header = HEADER.pack(MAGIC, FORMAT, 0, bytes.fromhex(self.version), *table)
+        return header + b''.join(sections)
+
+    def write(self, path):
+        with open(path, 'wb') as f:
+            f.write(self.to_bytes())
+
+class LazyNode(object):
+    __slots__ = ('file', 'n')
+
+    def __init__(self, file, n):
+        self.file = file
+        self.n = n
+
+    @property
+    def value(self):
+        return self.file.value(self.n)
+
+    @property
+    def children(self):
+        file = self.file
+        return [LazyNode(file, child) for child in file.children(self.n)]
+
+    @property
+    def line(self):
+        return self.file.line(self.n)
+
+    def __str__(self, level=0):
+        return self.file.to_simple(self.n).__str__(level)
+
+    def __repr__(self):
+        return '<LazyNode {}>'.format(self.n)
+
+class H2CFile(object):
+
+    # check_grammar: refuse files written for another grammar version
+    # symbols: SymbolTable the trees' symbols are interned in
+    def __init__(self, path, check_grammar=True, symbols=None):
+        self.path = path
+        self.symbols = SYMBOLS if symbols is None else symbols
+        with open(path, 'rb') as f:
+            try:
+                self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise H2CError("{}: empty file".format(path))
+        self.data = memoryview(self.map)
+        try:
+            self.read_header(check_grammar)
+        except BaseException:
+            self.close()
+            raise
+
+    def read_header(self, check_grammar):
+        if len(self.data) < HEADER.size:
+            raise H2CError("{}: not an h2c file".format(self.path))
+        fields = HEADER.unpack_from(self.data, 0)
+        magic, version, flags, grammar = fields[:4]
+        if magic != MAGIC:
+            raise H2CError("{}: not an h2c file".format(self.path))
+        if version != FORMAT:
+            raise H2CError("{}: h2c format {}, expected {}".format(self.path, version, FORMAT))
+        self.grammar = grammar.hex()
+        if check_grammar and self.grammar != grammar_version():
+            raise H2CError("{}: compiled for another grammar version".format(self.path))
+
+        sizes = (KIND.size, CONST.size, 1, NODE.size, LINE.size, ROOT.size)
+        for n, (name, size) in enumerate(zip(SECTIONS, sizes)):
+            offset, count = fields[4 + 2 * n], fields[5 + 2 * n]
+            if offset + count * size > len(self.data):
+                raise H2CError("{}: truncated {} section".format(self.path, name))
+            setattr(self, name + '_offset', offset)
+            setattr(self, name + '_count', count)
+        if self.lines_count != self.nodes_count:
+            raise H2CError("{}: {} lines for {} nodes".format(self.path, self.lines_count, self.nodes_count))
+
+        # small tables, read up front
+        self._consts = {}
+        self._symbols = {}
+        self.kinds = [self.const(KIND.unpack_from(self.data, self.kinds_offset + n * KIND.size)[0])
+                      for n in range(self.kinds_count)]
+        self.symbol_kinds = [kind in SYMBOL_KINDS for kind in self.kinds]
+        self.roots = {}
+        for n in range(self.roots_count):
+            name, root = ROOT.unpack_from(self.data, self.roots_offset + n * ROOT.size)
+            self.roots[self.const(name)] = root
+        self.starts = sorted(root for root in self.roots.values() if root >= 0)
+
+    def close(self):
+        self.data.release()
+        self.map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.nodes_count
+
+    def names(self):
+        return list(self.roots)
+
+    # LazyNode of a named tree, None for an empty script
+    def root(self, name):
+        n = self.roots[name]
+        return LazyNode(self, n) if n >= 0 else None
+
+    def const(self, n):
+        value = self._consts.get(n, self)
+        if value is not self:
+            return value
+        if not 0 <= n < self.consts_count:
+            raise H2CError("{}: bad constant {}".format(self.path, n))
+        tag, a, b = CONST.unpack_from(self.data, self.consts_offset + n * CONST.size)
+        if tag == INT:
+            value = a
+        elif tag == BOOL:
+            value = bool(a)
+        elif tag in (STR, BIGINT, FLOAT):
+            if a < 0 or a + b > self.strings_count:
+                raise H2CError("{}: bad string in constant {}".format(self.path, n))
+            start = self.strings_offset + a
+            text = str(self.data[start:start + b], 'utf-8', 'surrogatepass')
+            if tag == STR:
+                value = sys.intern(text)
+            elif tag == BIGINT:
+                value = int(text)
+            else:
+                value = float(text)
+        else:
+            raise H2CError("{}: bad constant tag {}".format(self.path, tag))
+        self._consts[n] = value
+        return value
+
+    # symbol id of STR constant n
+    def symbol(self, n):
+        id = self._symbols.get(n)
+        if id is None:
+            text = self.const(n)
+            if not isinstance(text, str):
+                raise H2CError("{}: constant {} is not a symbol".format(self.path, n))
+            id = self._symbols[n] = self.symbols.intern(text)
+        return id
+
+    # payload of a node of kind, constant n
+    def payload(self, kind, n):
+        return self.symbol(n) if self.symbol_kinds[kind] else self.const(n)
+
+    def node(self, n):
+        if not 0 <= n < self.nodes_count:
+            raise H2CError("{}: bad node {}".format(self.path, n))
+        return NODE.unpack_from(self.data, self.nodes_offset + n * NODE.size)
+
+    def value(self, n):
+        kind, payload, first_child, next_sibling = self.node(n)
+        if payload < 0:
+            return self.kinds[kind]
+        return (self.kinds[kind], self.payload(kind, payload))
+
+    # end of the nodes of the tree node n is in: the next tree's root
+    def tree_end(self, n):
+        k = bisect.bisect_right(self.starts, n)
+        return self.starts[k] if k < len(self.starts) else self.nodes_count
+
+    # node ids of the children of node n. Links only go forward within n's tree, as in tree(); a
+    # file where they don't is corrupt and could send the walk round in a loop.
+    def children(self, n):
+        end = self.tree_end(n)
+        result = []
+        last = n
+        child = self.node(n)[2]
+        while child >= 0:
+            if not last < child < end:
+                raise H2CError("{}: bad links at node {}".format(self.path, n))
+            result.append(child)
+            last = child
+            child = self.node(child)[3]
+        return result
+
+    def line(self, n):
+        return LINE.unpack_from(self.data, self.lines_offset + n * LINE.size)[0]
+
+    # a named tree as SimpleNodes. A tree's nodes are contiguous in pre order, up to the next
+    # root, so they are unpacked in one go and built from the last one back.
+    def tree(self, name):
+        root = self.roots[name]
+        if root < 0:
+            return None
+        end = self.tree_end(root)
+        start = self.nodes_offset + root * NODE.size
+        records = list(NODE.iter_unpack(self.data[start:self.nodes_offset + end * NODE.size]))
+        kinds = self.kinds
+        payload_of = self.payload
+        built = [None] * len(records)
+        try:
+            for n in range(len(records) - 1, -1, -1):
+                kind, payload, child, next_sibling = records[n]
+                children = []
+                last = root + n
+                while child >= 0:
+                    if child <= last:
+                        raise IndexError(child)
+                    children.append(built[child - root])
+                    last = child
+                    child = records[child - root][3]
+                value = kinds[kind] if payload < 0 else (kinds[kind], payload_of(kind, payload))
+                built[n] = SimpleNode(value, children)
+        except IndexError:
+            raise H2CError("{}: bad links in tree {!r}".format(self.path, name))
+        return built[0]
+
+    # subtree of node n as SimpleNodes
+    def to_simple(self, n):
+        done = []
+        stack = [(n, False)]
+        while stack:
+            n, visited = stack.pop()
+            if visited:
+                count = len(self.children(n))
+                children = done[len(done) - count:] if count else []
+                del done[len(done) - count:]
+                done.append(SimpleNode(self.value(n), children))
+            else:
+                stack.append((n, True))
+                stack.extend((child, False) for child in reversed(self.children(n)))
+        return done[0]
+
+# end file
@@ -0,0 +1,116 @@
+#
+# hashcons.py
+#
+# Hash-consed parse trees: identical subtrees are built once and shared, the tree becomes a DAG.
+#
+#     table = HashConser()
+#     parser = TestParser(node_factory=table.node)
+#     dag = parser.parse(lexer.tokenize(text))
+#     count, shared = sharing(dag)
+#
+# HashConser.node is a node factory like compact_node.Node: it returns the HashNode already built
+# for the same value and children, or builds and records a new one. The table holds its nodes
+# weakly, a node lives as long as a tree uses it, so one table can serve a parser across many
+# files without growing with them.
+#
+# HashNode compares and hashes by structure: kind, payload (with its type, 1 and 1.0 and True are
+# different payloads) and children. The hash is computed once when the node is built, from the
+# children's cached hashes, and children of a hash-consed node are the canonical ones, so in
+# practice equal nodes are the same object and == is an identity check. Children are a tuple,
+# nodes are never changed once built.
+#
+# Consumers that walk the tree (Interpreter, the compiler, optimizer, flatten()) see the same
+# values and children as with SimpleNode and work unchanged, a shared node is just visited once
+# per occurrence. dataflow.Dataflow computes a shared expression once per turn where it reads
+# the same assignments.
+#
+
+import weakref
+
+from simple_node import split_value
+from traversal import tree_string
+
+# payload compared with its type: 1, 1.0 and True are equal in Python but not as literals. Floats
+# by repr, -0.0 == 0.0 too
+def payload_key(payload):
+    if type(payload) is float:
+        return float, repr(payload)
+    return type(payload), payload
+
+def node_key(value, children):
+    kind, payload = split_value(value)
+    return kind, payload_key(payload), children
+
+class HashNode(object):
+    __slots__ = ('value', 'children', 'hash', '__weakref__')
+
+    # same signature as SimpleNode; children are kept as a tuple
+    def __init__(self, value, children=(), key=None):
+        self.value = value
+        self.children = tuple(children)
+        self.hash = hash(node_key(value, self.children) if key is None else key)
+
+    def __hash__(self):
+        return self.hash
+
+    def __eq__(self, other):
+        if self is other:
+            return True
+        if not isinstance(other, HashNode) or self.hash != other.hash:
+            return False
+        return node_key(self.value, self.children) == node_key(other.value, other.children)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __str__(self, level=0):
+        return tree_string(self, level)
+
+    def __repr__(self):
+        return '<HashNode {!r}>'.format(self.value)
+
+#
+# Weak-value table of the nodes built so far, HashConser().node is the parser's node factory
+#
+class HashConser(object):
+
+    def __init__(self):
+        self.table = weakref.WeakValueDictionary()
+        self.built = 0                # nodes built
+        self.shared = 0               # node() calls answered with an existing node
+
+    def node(self, value, children=()):
+        children = tuple(children)
+        key = node_key(value, children)
+        node = self.table.get(key)
+        if node is not None:
+            self.shared += 1
+            return node
+        node = HashNode(value, children, key)
+        self.table[key] = node
+        self.built += 1
+        return node
+
+    def __len__(self):
+        return len(self.table)
+
+# number of distinct nodes of a tree or DAG, and a list of the ones a walk of it reaches more than
+# once: below a shared node everything is. The walk visits every occurrence, as many nodes as the
+# parse tree had. By identity, equal nodes built apart are distinct.
+def sharing(tree):
+    seen = set()
+    shared = {}
+    stack = [] if tree is None else list(tree) if isinstance(tree, list) else [tree]
+    while stack:
+        node = stack.pop()
+        if node is None:
+            continue
+        key = id(node)
+        if key in seen:
+            shared[key] = node
+        else:
+            seen.add(key)
+        stack.extend(node.children)
+    return len(seen), list(shared.values())
+
+# end file
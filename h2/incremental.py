@@ -0,0 +1,182 @@
+#
+# incremental.py
+#
+# Re-lex and re-parse only the part of a script an edit touches.
+#
+#     doc = IncrementalParser()
+#     tree = doc.parse(text)
+#     tree = doc.edit(offset, deleted, inserted)      # replace text[offset:offset + deleted]
+#
+# The text is split into top level segments, each ending with an ENDLINE that is not inside a
+# Do ... Done block, so a whole Mission block is one segment. A segment is lexed and parsed on its
+# own and keeps the number of statements it added to the tree, its tokens are dropped. An edit
+# re-lexes from the start of the segment it falls in until a new segment boundary lands on an old
+# one past the edit; from there the text and the lexer state are the same as before. Only those
+# segments are re-parsed and their statements spliced into the tree, later segments are just
+# shifted and never lexed or parsed again. An edit that unbalances a Do ... Done block re-parses
+# up to where it balances again, e.g. the end.
+#
+# The tree is a 'code' node whose children are the top level statement nodes (comments and blank
+# lines add none). Unlike a full parse
+#
+#   - a syntax error is contained in its segment instead of being recovered from at the next
+#     statement the parser can sync on
+#   - error messages keep the line/char they had when their segment was last parsed
+#
+# A lexer that drops ENDLINE tokens (the left recursive Lexer) gives one segment, i.e. a full
+# re-parse on every edit.
+#
+
+from bisect import bisect_left, bisect_right
+
+from line_index import LineIndex
+from simple_node import SimpleNode, split_value
+from test_lexer import TestLexer
+from test_parser import TestParser
+
+# nodes wrapped around the top level statements of a parse result
+WRAPPERS = {'code', 'statements', 'statement'}
+
+# top level statement nodes of a parse result (a node or a list), in order
+def top_statements(tree):
+    statements = []
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        if node is None:
+            continue
+        if isinstance(node, list):
+            stack.extend(reversed(node))
+        elif split_value(node.value)[0] in WRAPPERS:
+            stack.extend(reversed(node.children))
+        else:
+            statements.append(node)
+    return statements
+
+class IncrementalParser(object):
+
+    endline = 'ENDLINE'
+    block_begin = 'BLOCK_BEGIN'
+    block_end = 'BLOCK_END'
+
+    def __init__(self, lexer=None, parser=None):
+        self.lexer = TestLexer() if lexer is None else lexer
+        self.parser = TestParser() if parser is None else parser
+        self.text = ''
+        self.lines = LineIndex()
+        self.tree = SimpleNode('code', [])
+
+        # per segment, in text order
+        self.starts = []        # offset of its first character
+        self.counts = []        # number of statements it has in tree.children
+        self.clean = []         # False if the lexer skipped anything but ignored characters
+
+        self.relexed = 0        # segments lexed and parsed by the last parse()/edit()
+
+    def parse(self, text):
+        self.text = text
+        self.lines = LineIndex(text)
+        self.tree = SimpleNode('code', [])
+        self.starts = []
+        self.counts = []
+        self.clean = []
+        self._update(0, 0, 0)
+        return self.tree
+
+    def edit(self, offset, deleted, inserted):
+        text = self.text
+        if offset < 0 or deleted < 0 or offset + deleted > len(text):
+            raise ValueError("Edit {}:{} outside of the text ({} characters)".format(offset, offset + deleted, len(text)))
+        if not deleted and not inserted:
+            return self.tree
+
+        self.text = text[:offset] + inserted + text[offset + deleted:]
+        self.lines.edit(offset, deleted, inserted)
+
+        # start at the segment holding the edit, or earlier if the lexer skipped characters
+        # before it: an unterminated string there may now have its closing quote
+        first = max(bisect_right(self.starts, offset) - 1, 0)
+        while first > 0 and not self.clean[first - 1]:
+            first -= 1
+        self._update(first, offset + deleted, len(inserted) - deleted)
+        return self.tree
+
+    # re-lex from segment first, resyncing with an old segment that starts at or after resume
+    # (an old offset, the end of the edit), delta is the change in length
+    def _update(self, first, resume, delta):
+        text = self.text
+        lines = self.lines
+        starts = self.starts
+        ignore = self.lexer.ignore
+        endline = self.endline
+        block_begin = self.block_begin
+        block_end = self.block_end
+
+        start = starts[first] if starts else 0
+        old = bisect_left(starts, resume, first + 1) if starts else 0
+        last = len(starts)
+
+        new_starts = []
+        new_counts = []
+        new_clean = []
+        statements = []
+
+        tokens = self.lexer.tokenize(text, lines.line(start), start, lines)
+        segment = []
+        depth = 0
+        end = start             # end of the last token
+        clean = True
+        try:
+            for tok in tokens:
+                if end < tok.index and text[end:tok.index].strip(ignore):
+                    clean = False
+                end = tok.end
+                segment.append(tok)
+
+                if tok.type == block_begin:
+                    depth += 1
+                elif tok.type == block_end:
+                    if depth:
+                        depth -= 1
+                elif tok.type == endline and not depth:
+                    self._segment(start, segment, clean, new_starts, new_counts, new_clean, statements)
+                    start = end
+                    segment = []
+                    clean = True
+
+                    # boundaries line up again, the rest is unchanged
+                    while old < last and starts[old] + delta < end:
+                        old += 1
+                    if old < last and starts[old] + delta == end:
+                        break
+            else:
+                # rest of the text, possibly with no tokens
+                if end < len(text) and text[end:].strip(ignore):
+                    clean = False
+                if segment or start < len(text):
+                    self._segment(start, segment, clean, new_starts, new_counts, new_clean, statements)
+                old = last
+        finally:
+            tokens.close()
+
+        # splice
+        counts = self.counts
+        children = self.tree.children
+        at = sum(counts[:first])
+        children[at:at + sum(counts[first:old])] = statements
+        starts[first:] = new_starts + [s + delta for s in starts[old:]]
+        counts[first:old] = new_counts
+        self.clean[first:old] = new_clean
+        self.relexed = len(new_starts)
+
+    def _segment(self, start, tokens, clean, starts, counts, cleans, statements):
+        if not tokens or (len(tokens) == 1 and tokens[0].type == self.endline):
+            found = []
+        else:
+            found = top_statements(self.parser.parse(iter(tokens), self.lines))
+        starts.append(start)
+        counts.append(len(found))
+        cleans.append(clean)
+        statements.extend(found)
+
+# end file
@@ -0,0 +1,105 @@
+#
+# interpreter.py
+#
+# Naive tree walking evaluator for the SimpleNode trees built by TestParser and the left
+# recursive Parser. Every visit re-dispatches on the node value; bytecode.py is the fast path,
+# this is the reference it is checked and benchmarked against.
+#
+# Identifier and string payloads are symbol ids (symbols.py), looked up in the symbols table:
+# env is keyed by the names' text and string values are the literals' text.
+#
+
+import operator
+
+from simple_node import split_value
+from symbols import SYMBOLS
+
+# statement list wrappers, their children are executed in order
+CONTAINERS = {'code', 'statements', 'statement', 'codeblock'}
+
+BINARY_OPS = {
+    '+': operator.add,
+    '-': operator.sub,
+    '*': operator.mul,
+    '/': operator.truediv,
+    '==': operator.eq,
+    '>': operator.gt,
+    '<': operator.lt,
+    '>=': operator.ge,
+    '<=': operator.le,
+}
+
+class H2RuntimeError(Exception):
+    pass
+
+class Interpreter(object):
+
+    # env maps variable names to values and is updated in place, out is called for Print
+    # symbols: the SymbolTable of the trees' ids
+    def __init__(self, env=None, out=print, symbols=None):
+        self.env = {} if env is None else env
+        self.out = out
+        self.symbols = SYMBOLS if symbols is None else symbols
+
+    # run a parse result: a node or a list of statement nodes
+    def run(self, tree):
+        if tree is None:
+            return
+        # explicit stack, Mission blocks can nest
+        stack = list(reversed(tree)) if isinstance(tree, list) else [tree]
+        while stack:
+            node = stack.pop()
+            if node is None:
+                continue
+            kind, payload = split_value(node.value)
+            if kind in CONTAINERS:
+                stack.extend(reversed(node.children))
+            elif kind == 'mission':
+                stack.extend(reversed(node.children))
+            else:
+                self.execute(node)
+
+    def execute(self, node):
+        kind, payload = split_value(node.value)
+        if kind == 'assign':
+            self.env[self.symbols.text(payload)] = self.evaluate(node.children[0])
+        elif kind == '=':
+            self.env[self.symbols.text(node.children[0].value[1])] = self.evaluate(node.children[1])
+        elif kind == 'print':
+            self.out(self.evaluate(node.children[0]))
+        elif kind == 'error':
+            raise H2RuntimeError(payload)
+        else:
+            raise H2RuntimeError("Unknown statement {!r}".format(node.value))
+
+    def evaluate(self, node):
+        kind, payload = split_value(node.value)
+        if kind in ('number', 'bool'):
+            return payload
+        elif kind == 'string':
+            return self.symbols.text(payload)
+        elif kind == 'id':
+            name = self.symbols.text(payload)
+            try:
+                return self.env[name]
+            except KeyError:
+                raise H2RuntimeError("Undefined variable '{}'".format(name))
+        elif kind in BINARY_OPS:
+            try:
+                return BINARY_OPS[kind](self.evaluate(node.children[0]), self.evaluate(node.children[1]))
+            except (TypeError, ZeroDivisionError) as e:
+                raise H2RuntimeError("{}: {}".format(e.__class__.__name__, e))
+        elif kind == 'uminus':
+            try:
+                return -self.evaluate(node.children[0])
+            except TypeError as e:
+                raise H2RuntimeError("{}: {}".format(e.__class__.__name__, e))
+        elif kind == 'not':
+            return not self.evaluate(node.children[0])
+        elif kind == 'template':
+            return ''.join([str(self.evaluate(child)) for child in node.children])
+        elif kind == 'error':
+            raise H2RuntimeError(payload)
+        raise H2RuntimeError("Unknown expression {!r}".format(node.value))
+
+# end file
@@ -0,0 +1,64 @@
+#
+# line_index.py
+#
+# Offsets of line starts, built in one pass over the text (or a chunk at a time while
+# streaming), so (line, column) of any index is a bisect instead of a rfind back to the
+# previous newline. Lines and columns are 1-based.
+#
+
+from array import array
+from bisect import bisect_right
+
+class LineIndex(object):
+
+    def __init__(self, text=None):
+        self.starts = array('q', [0])   # starts[n] is the offset of line n + 1
+        self.size = 0                   # number of characters seen
+        if text is not None:
+            self.feed(text)
+
+    # add the next chunk of text, which starts at offset self.size
+    def feed(self, text):
+        base = self.size
+        starts = self.starts
+        find = text.find
+        n = find('\n')
+        while n >= 0:
+            starts.append(base + n + 1)
+            n = find('\n', n + 1)
+        self.size = base + len(text)
+
+    # replace deleted characters at offset with inserted, as in an editor
+    def edit(self, offset, deleted, inserted):
+        starts = self.starts
+        delta = len(inserted) - deleted
+        lo = bisect_right(starts, offset)
+        hi = bisect_right(starts, offset + deleted)
+        added = array('q')
+        find = inserted.find
+        n = find('\n')
+        while n >= 0:
+            added.append(offset + n + 1)
+            n = find('\n', n + 1)
+        added.extend(start + delta for start in starts[hi:])
+        starts[lo:] = added
+        self.size += delta
+
+    def __len__(self):
+        return len(self.starts)
+
+    def line(self, index):
+        return bisect_right(self.starts, index)
+
+    def column(self, index):
+        return index - self.starts[bisect_right(self.starts, index) - 1] + 1
+
+    def position(self, index):
+        line = bisect_right(self.starts, index)
+        return line, index - self.starts[line - 1] + 1
+
+    # offset of the first character of a line
+    def start(self, line):
+        return self.starts[line - 1]
+
+# end file
@@ -0,0 +1,361 @@
+#
+# lrparser.py
+#
+# Runtime for the modules generated by parser_compiler.py. LRParser.parse is a copy of sly's
+# Parser.parse (including error recovery) that reads the array encoded tables of a generated
+# *_tab.py module, LRLexer.tokenize is sly's Lexer.tokenize over a precompiled master regex.
+# Neither sly nor the table construction is needed at runtime.
+#
+
+import re
+
+# Number of symbols that must be shifted to leave recovery mode (same as sly)
+ERROR_COUNT = 3
+
+# Action table entry for 'no action', i.e. a syntax error
+ACTION_ERROR = 0x7fffffff
+
+#
+# Lexer token, same attributes as sly's Token
+#
+class Token(object):
+    __slots__ = ('type', 'value', 'lineno', 'index', 'end')
+
+    def __repr__(self):
+        return 'Token(type={!r}, value={!r}, lineno={}, index={}, end={})'.format(
+            self.type, self.value, self.lineno, self.index, self.end)
+
+#
+# Grammar symbol (non-terminal or error) pushed on the symbol stack
+#
+class Symbol(object):
+    __slots__ = ('type', 'value', 'lineno', 'index', 'end')
+
+    def __str__(self):
+        return self.type
+
+    def __repr__(self):
+        return str(self)
+
+#
+# Object passed to the reduction callbacks. Same interface as sly's YaccProduction:
+# p[n], p.NAME, p.NAME0, p.lineno, p.index and hasattr(p, 'NAME').
+#
+class Production(object):
+    __slots__ = ('_slice', '_namemap', '_stack')
+
+    def __init__(self, s, stack=None):
+        self._slice = s
+        self._namemap = {}
+        self._stack = stack
+
+    def __getitem__(self, n):
+        if n >= 0:
+            return self._slice[n].value
+        else:
+            return self._stack[n].value
+
+    def __setitem__(self, n, v):
+        if n >= 0:
+            self._slice[n].value = v
+        else:
+            self._stack[n].value = v
+
+    def __len__(self):
+        return len(self._slice)
+
+    @property
+    def lineno(self):
+        for tok in self._slice:
+            lineno = getattr(tok, 'lineno', None)
+            if lineno:
+                return lineno
+        raise AttributeError('No line number found')
+
+    @property
+    def index(self):
+        for tok in self._slice:
+            index = getattr(tok, 'index', None)
+            if index is not None:
+                return index
+        raise AttributeError('No index attribute found')
+
+    @property
+    def end(self):
+        result = None
+        for tok in self._slice:
+            r = getattr(tok, 'end', None)
+            if r:
+                result = r
+        return result
+
+    def __getattr__(self, name):
+        try:
+            return self._slice[self._namemap[name]].value
+        except KeyError:
+            raise AttributeError('No symbol {}. Must be one of {{{}}}.'.format(name, ', '.join(self._namemap)))
+
+#
+# Base class of the generated parsers. The generated module calls _load_tables() once
+# after the class body; parse() is then a plain table walk.
+#
+class LRParser(object):
+
+    @classmethod
+    def _load_tables(cls, signature, terminals, nonterminals, action, goto, defaulted, productions):
+        cls._lr_signature = signature
+        cls._terminals = dict((name, n) for n, name in enumerate(terminals))
+        cls._nonterminals = dict((name, n) for n, name in enumerate(nonterminals))
+        cls._action = action
+        cls._goto = goto
+        cls._defaulted = defaulted
+
+        # (name, goto column, length, callback, namemap) indexed by production number
+        prods = [None]
+        for name, length, callback, namemap in productions:
+            func = getattr(cls, callback) if callback else None
+            prods.append((name, cls._nonterminals[name], length, func, dict(namemap)))
+        cls._productions = prods
+
+    def error(self, token):
+        import sys
+        if token:
+            lineno = getattr(token, 'lineno', 0)
+            if lineno:
+                sys.stderr.write('Syntax error at line {}, token={}\n'.format(lineno, token.type))
+            else:
+                sys.stderr.write('Syntax error, token={}\n'.format(token.type))
+        else:
+            sys.stderr.write('Parse error in input. EOF\n')
+
+    def errok(self):
+        self.errorok = True
+
+    def restart(self):
+        del self.statestack[:]
+        del self.symstack[:]
+        sym = Symbol()
+        sym.type = '$end'
+        self.symstack.append(sym)
+        self.statestack.append(0)
+        self.state = 0
+
+    def parse(self, tokens):
+        lookahead = None                    # Current lookahead symbol
+        lookaheadstack = []                 # Stack of lookahead symbols
+        terminals = self._terminals
+        nterminals = len(terminals)
+        nnonterminals = len(self._nonterminals)
+        actions = self._action
+        goto = self._goto
+        defaulted = self._defaulted
+        prods = self._productions
+        pslice = Production(None)
+        errorcount = 0
+
+        tokens = iter(tokens)
+        self.tokens = tokens
+        self.statestack = statestack = []
+        self.symstack = symstack = []
+        pslice._stack = symstack
+        self.errorok = False
+        self.restart()
+
+        errtoken = None
+        while True:
+            state = self.state
+            t = defaulted[state]
+            if t == ACTION_ERROR:
+                if not lookahead:
+                    if not lookaheadstack:
+                        lookahead = next(tokens, None)
+                    else:
+                        lookahead = lookaheadstack.pop()
+                    if not lookahead:
+                        lookahead = Symbol()
+                        lookahead.type = '$end'
+
+                column = terminals.get(lookahead.type)
+                if column is not None:
+                    t = actions[state * nterminals + column]
+
+            if t != ACTION_ERROR:
+                if t > 0:
+                    # shift
+                    statestack.append(t)
+                    self.state = t
+                    symstack.append(lookahead)
+                    lookahead = None
+                    if errorcount:
+                        errorcount -= 1
+                    continue
+
+                if t < 0:
+                    # reduce
+                    pname, pcolumn, plen, func, namemap = prods[-t]
+                    pslice._namemap = namemap
+                    pslice._slice = symstack[-plen:] if plen else []
+
+                    sym = Symbol()
+                    sym.type = pname
+                    value = func(self, pslice) if func else None
+                    if value is pslice:
+                        value = (pname, *(s.value for s in pslice._slice))
+                    sym.value = value
+
+                    if plen:
+                        sym.lineno = getattr(symstack[-plen], 'lineno', None)
+                        sym.index = getattr(symstack[-plen], 'index', None)
+                        sym.end = getattr(symstack[-1], 'end', None)
+                        del symstack[-plen:]
+                        del statestack[-plen:]
+                    else:
+                        sym.lineno = None
+                        sym.index = None
+                        sym.end = None
+
+                    symstack.append(sym)
+                    self.state = goto[statestack[-1] * nnonterminals + pcolumn]
+                    statestack.append(self.state)
+                    continue
+
+                # accept
+                return getattr(symstack[-1], 'value', None)
+
+            # Syntax error. See sly's Parser.parse for the recovery strategy.
+            if errorcount == 0 or self.errorok:
+                errorcount = ERROR_COUNT
+                self.errorok = False
+                if lookahead.type == '$end':
+                    errtoken = None
+                else:
+                    errtoken = lookahead
+
+                tok = self.error(errtoken)
+                if tok:
+                    lookahead = tok
+                    self.errorok = True
+                    continue
+                else:
+                    if not errtoken:
+                        return
+            else:
+                errorcount = ERROR_COUNT
+
+            if len(statestack) <= 1 and lookahead.type != '$end':
+                lookahead = None
+                self.state = 0
+                del lookaheadstack[:]
+                continue
+
+            if lookahead.type == '$end':
+                return
+
+            if lookahead.type != 'error':
+                sym = symstack[-1]
+                if sym.type == 'error':
+                    lookahead = None
+                    continue
+
+                t = Symbol()
+                t.type = 'error'
+                t.lineno = getattr(lookahead, 'lineno', None)
+                t.index = getattr(lookahead, 'index', None)
+                t.end = getattr(lookahead, 'end', None)
+                t.value = lookahead
+                lookaheadstack.append(lookahead)
+                lookahead = t
+            else:
+                symstack.pop()
+                statestack.pop()
+                self.state = statestack[-1]
+
+#
+# Base class of the generated lexers. The generated module calls _load_rules() once after the
+# class body with the master regex sly built from the token rules.
+#
+class LRLexer(object):
+    ignore = ''
+    literals = set()
+
+    @classmethod
+    def _load_rules(cls, signature, pattern, flags, token_funcs, ignored_tokens, remapping):
+        cls._lr_signature = signature
+        cls._master_re = re.compile(pattern, flags)
+        cls._token_funcs = dict((name, getattr(cls, func)) for name, func in token_funcs.items())
+        cls._ignored_tokens = set(ignored_tokens)
+        cls._remapping = remapping
+
+    def tokenize(self, text, lineno=1, index=0):
+        _ignored_tokens = self._ignored_tokens
+        _master_re = self._master_re
+        _ignore = self.ignore
+        _token_funcs = self._token_funcs
+        _literals = self.literals
+        _remapping = self._remapping
+
+        self.text = text
+        try:
+            while True:
+                try:
+                    if text[index] in _ignore:
+                        index += 1
+                        continue
+                except IndexError:
+                    return
+
+                tok = Token()
+                tok.lineno = lineno
+                tok.index = index
+                m = _master_re.match(text, index)
+                if m:
+                    tok.end = index = m.end()
+                    tok.value = m.group()
+                    tok.type = m.lastgroup
+
+                    if tok.type in _remapping:
+                        tok.type = _remapping[tok.type].get(tok.value, tok.type)
+
+                    if tok.type in _token_funcs:
+                        self.index = index
+                        self.lineno = lineno
+                        tok = _token_funcs[tok.type](self, tok)
+                        index = self.index
+                        lineno = self.lineno
+                        if not tok:
+                            continue
+
+                    if tok.type in _ignored_tokens:
+                        continue
+
+                    yield tok
+
+                else:
+                    if text[index] in _literals:
+                        tok.value = text[index]
+                        tok.end = index + 1
+                        tok.type = tok.value
+                        index += 1
+                        yield tok
+                    else:
+                        self.index = index
+                        self.lineno = lineno
+                        tok.type = 'ERROR'
+                        tok.value = text[index:]
+                        tok = self.error(tok)
+                        if tok is not None:
+                            tok.end = self.index
+                            yield tok
+
+                        index = self.index
+                        lineno = self.lineno
+
+        finally:
+            self.text = text
+            self.index = index
+            self.lineno = lineno
+
+    def error(self, t):
+        raise ValueError('Illegal character {!r} at index {}'.format(t.value[0], self.index))
+
+# end file
@@ -0,0 +1,301 @@
+#
+# mmap_lexer.py
+#
+# Lexing a script file in place: the file is mapped with mmap and the lexer's token regexes run
+# over the bytes, so a large file is never read into a str (f.read() holds the bytes and the
+# decoded text at once). The tokens are those of the lexer's own tokenize(), for sly lexers and
+# generated *_tab.py ones:
+#
+#     with mapped(path) as buffer:
+#         tree = parser.parse(MmapLexer(lexer).tokenize(buffer))
+#
+# A token's value is decoded from the buffer when it is first read: by a callback (ID interns
+# it, NUMBER converts it, STRING decodes it) or by the parser (operators become node kinds).
+# Punctuation, keywords and newlines are matched and passed on without ever becoming a str.
+# Values must be read before the buffer is closed, which the parse does.
+#
+# token.index/end are byte offsets into the file. tokens.lines is a LineIndex over the buffer,
+# built the first time a position is asked for (errors, h2c line tables) and counting columns in
+# characters, so (line, column) match the text path for UTF-8 input too: the first position
+# asked on a non-ASCII line finds where its characters start, later ones bisect that. Undecodable
+# bytes in a token raise UnicodeDecodeError, as reading the file as text would.
+#
+# The buffer is taken as UTF-8 with '\n' line ends. Reading the file as text (open(path)) decodes
+# with the locale's encoding and turns '\r\n' and '\r' into '\n'; same_as_text() says whether the
+# two agree, h2.py reads the file as text when they don't.
+#
+# The master regex is compiled again for bytes. The token patterns are ASCII, \d and \s in them
+# then match ASCII digits and spaces only; other characters outside string literals are lexer
+# errors, one per character as on the text path. Callbacks see the lexer's usual attributes,
+# with lexer.index a byte offset.
+#
+
+import codecs
+import locale
+import mmap
+import re
+from array import array
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from line_index import LineIndex
+from stream_lexer import TokenStream
+
+# extra groups of the master pattern, as in fast_lexer.py
+END = 'END__'
+LITERAL = 'LITERAL__'
+ERROR = 'ERROR__'
+
+# value of a token not decoded yet
+_UNREAD = object()
+
+# bytes lexed (or scanned for line starts) between releases of the pages behind, see _release()
+RELEASE = 16 * 1024 * 1024
+
+# bytes regex per lexer class
+_compiled = {}
+
+# a byte of a non-ASCII character, and the first byte of any UTF-8 character
+_NON_ASCII = re.compile(b'[\x80-\xff]')
+_CHAR_START = re.compile(b'[^\x80-\xbf]')
+
+def _byte_class(chars):
+    return '[{}]'.format(''.join('\\' + c if c in '\\]^-[' else c for c in sorted(chars)))
+
+def _compile(cls):
+    if cls in _compiled:
+        return _compiled[cls]
+    master = cls._master_re
+    parts = [master.pattern]
+    if cls.literals:
+        parts.append('(?P<{}>{})'.format(LITERAL, _byte_class(cls.literals)))
+    parts.append('(?P<{}>\\Z)'.format(END))
+    parts.append('(?P<{}>[\\s\\S])'.format(ERROR))
+    prefix = _byte_class(cls.ignore) + '*' if cls.ignore else ''
+    pattern = '{}(?:{})'.format(prefix, '|'.join(parts))
+    regex = _compiled[cls] = re.compile(pattern.encode('ascii'), master.flags & ~re.UNICODE)
+    return regex
+
+# a read-only map of the file at path, b'' for an empty file (mmap can't map 0 bytes)
+@contextmanager
+def mapped(path):
+    with open(path, 'rb') as f:
+        if not f.seek(0, 2):
+            yield b''
+            return
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        yield buffer
+    finally:
+        buffer.close()
+
+# let the kernel drop buffer[start:end] from memory: a read-only map of a file reads the pages
+# again if they are needed. On Python 3.8+ where the system has MADV_DONTNEED, otherwise the
+# pages stay until the map is closed.
+def _release(buffer, start, end):
+    if isinstance(buffer, mmap.mmap) and hasattr(buffer, 'madvise') and hasattr(mmap, 'MADV_DONTNEED'):
+        start -= start % mmap.PAGESIZE
+        end -= end % mmap.PAGESIZE
+        if end > start:
+            buffer.madvise(mmap.MADV_DONTNEED, start, end - start)
+
+# True if lexing buffer gives the tokens of lexing the file read with open(path): the locale's
+# encoding is UTF-8 and there is no '\r' for universal newlines to translate. Scanned a RELEASE
+# at a time, releasing the pages behind as lexing does.
+def same_as_text(buffer):
+    if codecs.lookup(locale.getpreferredencoding(False)).name != 'utf-8':
+        return False
+    start = 0
+    while start < len(buffer):
+        end = min(start + RELEASE, len(buffer))
+        if buffer.find(b'\r', start, end) >= 0:
+            return False
+        _release(buffer, start, end)
+        start = end
+    return True
+
+#
+# Token whose value is decoded from the buffer on first use. Same attributes as lrparser.Token.
+#
+class LazyToken(object):
+    __slots__ = ('type', '_value', 'lineno', 'index', 'end', 'buffer')
+
+    @property
+    def value(self):
+        value = self._value
+        if value is _UNREAD:
+            value = self._value = self.buffer[self.index:self.end].decode('utf-8')
+        return value
+
+    @value.setter
+    def value(self, value):
+        self._value = value
+
+    def __repr__(self):
+        return 'Token(type={!r}, value={!r}, lineno={}, index={}, end={})'.format(
+            self.type, self.value, self.lineno, self.index, self.end)
+
+#
+# LineIndex of a bytes buffer: line starts found on first use, columns in characters
+#
+class MappedLines(LineIndex):
+
+    def __init__(self, buffer):
+        self.buffer = buffer
+        self.size = len(buffer)
+        # line -> None for an ASCII line, else the offsets in it of its characters' first bytes,
+        # for the lines positions were asked on
+        self.chars = {}
+
+    # starts, built when first needed
+    def __getattr__(self, name):
+        if name != 'starts':
+            raise AttributeError(name)
+        starts = array('q', [0])
+        buffer = self.buffer
+        find = buffer.find
+        released = 0
+        n = find(b'\n')
+        while n >= 0:
+            starts.append(n + 1)
+            if n - released >= RELEASE:
+                _release(buffer, released, n)
+                released = n
+            n = find(b'\n', n + 1)
+        self.starts = starts
+        return starts
+
+    def column(self, index):
+        return self.position(index)[1]
+
+    def position(self, index):
+        line, column = LineIndex.position(self, index)
+        if column > 1:
+            if line in self.chars:
+                chars = self.chars[line]
+            else:
+                chars = self.chars[line] = self._chars(line)
+            if chars is not None:
+                column = bisect_left(chars, column - 1) + 1
+        return line, column
+
+    def _chars(self, line):
+        starts = self.starts
+        end = starts[line] if line < len(starts) else self.size
+        segment = self.buffer[starts[line - 1]:end]
+        if _NON_ASCII.search(segment) is None:
+            return None
+        return array('q', [m.start() for m in _CHAR_START.finditer(segment)])
+
+class MmapLexer(object):
+
+    # characters of remaining input passed to error() in token.value, as in stream_lexer.py
+    error_context = 80
+
+    # lexer: the lexer instance whose spec, callbacks and error() are used, it runs on a
+    # context of it (parse_context.py)
+    def __init__(self, lexer):
+        self.lexer = lexer
+        self.regex = _compile(type(lexer))
+        self.lines = None
+
+    # TokenStream of a bytes-like buffer of UTF-8 text, e.g. from mapped()
+    def tokenize(self, buffer, lineno=1):
+        self.lines = lines = MappedLines(buffer)
+        lexer = self.lexer.call_context(lines=lines, text=buffer)
+        return TokenStream(self._tokenize(lexer, buffer, lineno), lines)
+
+    def _tokenize(self, lexer, buffer, lineno):
+        cls = type(lexer)
+        finditer = self.regex.finditer
+        token_funcs = cls._token_funcs
+        remapping = cls._remapping
+        ignored_tokens = cls._ignored_tokens
+        index = 0
+        released = 0
+
+        try:
+            while True:
+                # restarted at index when a callback or error() moves the position
+                moved = False
+                for m in finditer(buffer, index):
+                    kind = m.lastgroup
+                    if kind == END:
+                        break
+                    if index - released >= RELEASE:
+                        _release(buffer, released, index)
+                        released = index
+
+                    tok = LazyToken()
+                    tok.buffer = buffer
+                    tok.lineno = lineno
+                    tok.index = start = m.start(kind)
+                    tok.end = index = m.end()
+                    tok._value = _UNREAD
+
+                    if kind == LITERAL:
+                        kind = tok.value
+                    elif kind == ERROR:
+                        tok.type = 'ERROR'
+                        tok.value = context = self._context(buffer, start)
+                        lexer.index = start
+                        lexer.lineno = lineno
+                        tok = lexer.error(tok)
+                        # error() moves on in characters, the buffer is in bytes
+                        if lexer.index > start:
+                            lexer.index = start + len(context[:lexer.index - start].encode('utf-8'))
+                        if tok is not None:
+                            tok.end = lexer.index
+                            yield tok
+                        lineno = lexer.lineno
+                        if lexer.index != index:
+                            index = lexer.index
+                            moved = True
+                            break
+                        continue
+                    else:
+                        if kind in remapping:
+                            kind = remapping[kind].get(tok.value, kind)
+                        if kind in token_funcs:
+                            tok.type = kind
+                            lexer.index = index
+                            lexer.lineno = lineno
+                            tok = token_funcs[kind](lexer, tok)
+                            lineno = lexer.lineno
+                            if lexer.index != index:
+                                index = lexer.index
+                                moved = True
+                            if tok is None or tok.type in ignored_tokens:
+                                if moved:
+                                    break
+                                continue
+                            yield tok
+                            if moved:
+                                break
+                            continue
+
+                    if kind in ignored_tokens:
+                        continue
+                    tok.type = kind
+                    yield tok
+
+                if not moved:
+                    index = len(buffer)
+                    return
+        finally:
+            lexer.index = index
+            lexer.lineno = lineno
+
+    # up to error_context characters of the buffer from start. A sequence cut short by the
+    # end of the slice is left out, bad UTF-8 at start raises UnicodeDecodeError.
+    def _context(self, buffer, start):
+        chunk = buffer[start:start + self.error_context * 4]
+        try:
+            text = chunk.decode('utf-8')
+        except UnicodeDecodeError as e:
+            if e.start == 0:
+                raise
+            text = chunk[:e.start].decode('utf-8')
+        return text[:self.error_context]
+
+# end file
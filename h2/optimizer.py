@@ -0,0 +1,305 @@
+#
+# optimizer.py
+#
+# Tree to tree pass between parsing and execution.
+#
+#     optimizer = Optimizer()
+#     tree = optimizer.optimize(parser.parse(lexer.tokenize(text)))
+#     for message in optimizer.errors: ...
+#
+#   - constant folding: operators on number, bool and string literals are computed once, with the
+#     same Python semantics the Interpreter and VM apply at run time, uminus and Not of a literal included;
+#     a string template's literal segments are joined, the whole template once they all are
+#   - literal propagation: a read of a variable whose last assignment stored a literal becomes
+#     that literal
+#   - dead assignments: an assignment of a literal that is overwritten, or not in live, before
+#     anything reads it is removed
+#   - operations that are certain to fail, e.g. "hello" + 4, are reported in .errors and left in
+#     place so they still raise at run time
+#
+# Scripts run top to bottom with missions inline, so propagation follows the statement order. A
+# mission body only uses the literals it assigns itself and keeps every assignment the host could
+# read, so a mission can still be run on its own (VM.run(program, 'name')).
+#
+# live is the set of names the host reads after the run, None (the default) for all of them. With
+# live=None only assignments that are overwritten before being read are removed.
+#
+# Names are tracked by symbol id (symbols.py). String literals are folded on their text and the
+# result interned in symbols for the new node.
+#
+
+from interpreter import BINARY_OPS, CONTAINERS
+from simple_node import SimpleNode, split_value
+from symbols import SYMBOLS
+
+LITERALS = {'number', 'bool', 'string'}
+
+# folding stops at results bigger than this, e.g. a string doubled in a loop of assignments
+MAX_STRING = 4096
+MAX_BITS = 4096
+
+# no folded value
+NOTHING = object()
+
+def literal_kind(value):
+    if isinstance(value, bool):
+        return 'bool'
+    if isinstance(value, str):
+        return 'string'
+    return 'number'
+
+# true if computing a op b could build a huge string or integer
+def too_big(kind, a, b):
+    if kind == '+':
+        if isinstance(a, str) and isinstance(b, str):
+            return len(a) + len(b) > MAX_STRING
+    elif kind == '*':
+        if isinstance(a, str) and isinstance(b, int):
+            return len(a) * b > MAX_STRING
+        if isinstance(b, str) and isinstance(a, int):
+            return len(b) * a > MAX_STRING
+        if isinstance(a, int) and isinstance(b, int):
+            return a.bit_length() + b.bit_length() > MAX_BITS
+    return False
+
+# (name, value node) of an assignment, TestParser ('assign', name) or left recursive '='
+def assignment(node):
+    kind, payload = split_value(node.value)
+    if kind == 'assign':
+        return payload, node.children[0]
+    if kind == '=':
+        return node.children[0].value[1], node.children[1]
+    return None, None
+
+# names read by an expression
+def reads(root):
+    names = set()
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        kind, payload = split_value(node.value)
+        if kind == 'id':
+            names.add(payload)
+        else:
+            stack.extend(node.children)
+    return names
+
+class Optimizer(object):
+
+    # node builds the new nodes, the same factory the parser used
+    # symbols: the SymbolTable of the tree's ids
+    def __init__(self, node=SimpleNode, live=None, symbols=None):
+        self.node = node
+        self.symbols = SYMBOLS if symbols is None else symbols
+        self.live = None if live is None else set(map(self.symbols.intern, live))
+        self.errors = []
+        self.folded = 0
+        self.propagated = 0
+        self.removed = 0
+
+    # tree is a parse result, a node or a list of statement nodes; returns the same shape
+    def optimize(self, tree):
+        if tree is None:
+            return None
+        statements = tree if isinstance(tree, list) else [tree]
+
+        statements = self.propagate(statements, {})
+
+        # names dead at the end of the run: assigned but not read by the host
+        if self.live is None:
+            dead = set()
+        else:
+            dead = self.assigned(statements) - self.live
+        statements = self.prune(statements, dead, set(dead))
+
+        if isinstance(tree, list):
+            return statements
+        return statements[0] if statements else None
+
+    #
+    # forward pass: fold expressions, propagate literals. known maps names to literal values and
+    # is updated in place.
+    #
+    def propagate(self, statements, known):
+        result = []
+        for node in statements:
+            kind, payload = split_value(node.value)
+            if kind in CONTAINERS:
+                node = self.rebuild(node, self.propagate(node.children, known))
+            elif kind == 'mission':
+                if node.children:
+                    inner = {}
+                    body = self.propagate(node.children, inner)
+                    # the mission ran inline: what it assigned replaces what was known
+                    for name in self.assigned(body):
+                        known.pop(name, None)
+                    known.update(inner)
+                    node = self.rebuild(node, body)
+            elif kind == 'assign' or kind == '=':
+                name, value = assignment(node)
+                folded = self.expression(value, known)
+                folded_kind, folded_payload = split_value(folded.value)
+                if folded_kind in LITERALS:
+                    known[name] = self.value(folded_kind, folded_payload)
+                else:
+                    known.pop(name, None)
+                if folded is not value:
+                    if kind == 'assign':
+                        node = self.node(node.value, [folded])
+                    else:
+                        node = self.node(node.value, [node.children[0], folded])
+            elif kind == 'print':
+                folded = self.expression(node.children[0], known)
+                if folded is not node.children[0]:
+                    node = self.node(node.value, [folded])
+            result.append(node)
+        return result
+
+    # fold an expression, post order with an explicit stack
+    def expression(self, root, known):
+        done = []
+        stack = [(root, False)]
+        while stack:
+            node, visited = stack.pop()
+            kind, payload = split_value(node.value)
+            if not visited:
+                if kind == 'id' and payload in known:
+                    self.propagated += 1
+                    done.append(self.literal(known[payload]))
+                elif node.children:
+                    stack.append((node, True))
+                    stack.extend((child, False) for child in reversed(node.children))
+                else:
+                    done.append(node)
+                continue
+
+            n = len(node.children)
+            children = done[len(done) - n:]
+            del done[len(done) - n:]
+            value = self.fold(kind, children)
+            if kind == 'template' and value is NOTHING:
+                children = self.merge(children)
+            if value is not NOTHING:
+                self.folded += 1
+                done.append(self.literal(value))
+            elif len(children) == n and all(new is old for new, old in zip(children, node.children)):
+                done.append(node)
+            else:
+                done.append(self.node(node.value, children))
+        return done[0]
+
+    # value of an operator node whose children are literals, NOTHING if it can't be folded
+    def fold(self, kind, children):
+        values = []
+        for child in children:
+            child_kind, payload = split_value(child.value)
+            if child_kind not in LITERALS:
+                return NOTHING
+            values.append(self.value(child_kind, payload))
+
+        try:
+            if kind == 'uminus':
+                return -values[0]
+            if kind == 'not':
+                return not values[0]
+            if kind == 'template':
+                return ''.join(map(str, values))
+            if kind in BINARY_OPS:
+                a, b = values
+                if too_big(kind, a, b):
+                    return NOTHING
+                return BINARY_OPS[kind](a, b)
+        except TypeError as e:
+            self.errors.append("Type error: {} ({})".format(self.describe(kind, values), e))
+        except ZeroDivisionError:
+            self.errors.append("Division by zero: {}".format(self.describe(kind, values)))
+        except OverflowError:
+            pass
+        return NOTHING
+
+    # a template's adjacent literal segments joined into one
+    def merge(self, children):
+        merged = []
+        for child in children:
+            kind, payload = split_value(child.value)
+            if kind in LITERALS and merged and split_value(merged[-1].value)[0] in LITERALS:
+                self.folded += 1
+                merged[-1] = self.literal(str(self.value(*split_value(merged[-1].value))) +
+                                          str(self.value(kind, payload)))
+            else:
+                merged.append(child)
+        return merged
+
+    def describe(self, kind, values):
+        if kind == 'uminus':
+            return '-{!r}'.format(values[0])
+        if kind == 'not':
+            return 'Not {!r}'.format(values[0])
+        return '{!r} {} {!r}'.format(values[0], kind, values[1])
+
+    # Python value of a literal node's payload
+    def value(self, kind, payload):
+        if kind == 'string':
+            return self.symbols.text(payload)
+        return payload
+
+    def literal(self, value):
+        kind = literal_kind(value)
+        if kind == 'string':
+            return self.node((kind, self.symbols.intern(value)))
+        return self.node((kind, value))
+
+    def rebuild(self, node, children):
+        if len(children) == len(node.children) and all(new is old for new, old in zip(children, node.children)):
+            return node
+        return self.node(node.value, children)
+
+    # names assigned anywhere in statements, missions included
+    def assigned(self, statements):
+        names = set()
+        stack = list(statements)
+        while stack:
+            node = stack.pop()
+            name, value = assignment(node)
+            if name is not None:
+                names.add(name)
+            elif node.children and split_value(node.value)[0] in CONTAINERS | {'mission'}:
+                stack.extend(node.children)
+        return names
+
+    #
+    # backward pass: remove assignments of literals to dead names. dead is the set of names whose
+    # current value is overwritten or ignored before anything reads it, updated in place.
+    # at_exit is the dead set at the end of the run, where a mission run on its own ends too.
+    #
+    def prune(self, statements, dead, at_exit):
+        result = []
+        for node in reversed(statements):
+            kind, payload = split_value(node.value)
+            if kind in CONTAINERS:
+                node = self.rebuild(node, self.prune(node.children, dead, at_exit))
+            elif kind == 'mission':
+                if node.children:
+                    # the body ends where the script continues or, run on its own, at the exit
+                    inner = dead & at_exit
+                    body = self.prune(node.children, inner, at_exit)
+                    dead.clear()
+                    dead.update(inner)
+                    node = self.rebuild(node, body)
+            elif kind == 'assign' or kind == '=':
+                name, value = assignment(node)
+                if name in dead and split_value(value.value)[0] in LITERALS:
+                    self.removed += 1
+                    continue
+                dead.add(name)
+                dead -= reads(value)
+            elif kind == 'print':
+                dead -= reads(node.children[0])
+            result.append(node)
+        result.reverse()
+        return result
+
+def optimize(tree, live=None, node=SimpleNode, symbols=None):
+    return Optimizer(node, live, symbols).optimize(tree)
+
+# end file
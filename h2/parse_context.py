@@ -0,0 +1,127 @@
+#
+# parse_context.py
+#
+# Parsing from many threads with one lexer/parser. sly keeps its tables on the class, the
+# instances only hold the state of the call in progress: the parser's state and symbol stacks,
+# line_start/char_adj/lines and sly's position tables, the lexer's text/index/lineno/lines. Those
+# live on a context, a view of the instance with the same class and configuration (node factory,
+# names, report) and its own copy of that state:
+#
+#     tokens = lexer.tokenize(text)                 # tokens.lines: the LineIndex of this call
+#     tree = parser.parse(tokens)                   # runs on a new context of parser
+#
+#     context = parser.context(report=report)
+#     tree = context.parse(tokens)                  # runs on context, index_position() works
+#
+#     pool = ParserPool(4)
+#     with pool.context() as context:
+#         tree, errors = context.parse(text)
+#
+# TestParser.parse() and StreamingLexer.tokenize()/tokenize_stream() called on an instance run
+# on a new context of it, so an instance shared between threads is never written to. Called on a
+# context they run on it, resetting its state first: a context is for one thread at a time, and
+# keeps the results of its last call (lines, positions) for whoever made it.
+#
+# ParserPool holds one lexer/parser pair and hands out at most size ParseContexts at a time,
+# blocking when all are in use. All share the pair's SymbolTable, see symbols.py for its lock.
+# The node factory is called from all threads too: SimpleNode and compact_node.Node are fine,
+# a HashConser shared this way may build an equal node twice (the trees are still equal).
+#
+
+import queue
+
+#
+# Mixin ahead of the sly (or lrparser) base class
+#
+class Reentrant(object):
+
+    # the instance a context was made from, None on the instance itself
+    shared = None
+
+    # a view of this instance with its own per-call state, attributes in state set on it
+    def context(self, **state):
+        view = object.__new__(type(self))
+        view.__dict__.update(self.__dict__)
+        view.shared = self if self.shared is None else self.shared
+        view.__dict__.update(state)
+        return view
+
+    # what a call runs on: this context with state set, or a new context of this instance
+    def call_context(self, **state):
+        if self.shared is None:
+            return self.context(**state)
+        self.__dict__.update(state)
+        return self
+
+#
+# A lexer/parser context pair collecting the errors of a parse
+#
+class ParseContext(object):
+
+    def __init__(self, lexer, parser):
+        self.errors = []
+        self.lexer = lexer.context(report=self.report)
+        self.parser = parser.context(report=self.report)
+
+    def report(self, line, column, message):
+        self.errors.append((line, column, message))
+
+    # (tree, errors) of a text
+    def parse(self, text):
+        self.errors = []
+        tree = self.parser.parse(self.lexer.tokenize(text))
+        return tree, self.errors
+
+    # ([tokens], errors) of a text
+    def tokenize(self, text):
+        self.errors = []
+        return list(self.lexer.tokenize(text)), self.errors
+
+class ParserPool(object):
+
+    # size: most contexts out at a time
+    # lexer/parser: the shared pair, a new TestLexer/TestParser pair sharing names by default
+    def __init__(self, size, lexer=None, parser=None):
+        if parser is None:
+            from test_parser import TestParser
+            parser = TestParser()
+        if lexer is None:
+            from test_lexer import TestLexer
+            lexer = TestLexer(names=parser.names)
+        self.lexer = lexer
+        self.parser = parser
+        self.size = size
+        self.free = queue.LifoQueue(size)
+        for n in range(size):
+            self.free.put(ParseContext(lexer, parser))
+
+    # a context, waiting up to timeout seconds (None: for ever) for one to be released.
+    # Raises queue.Empty on a timeout.
+    def acquire(self, timeout=None):
+        return self.free.get(timeout=timeout)
+
+    def release(self, context):
+        context.errors = []
+        self.free.put_nowait(context)
+
+    def context(self, timeout=None):
+        return _Checkout(self, self.acquire(timeout))
+
+    # (tree, errors) of a text, on a context of the pool
+    def parse(self, text):
+        with self.context() as context:
+            return context.parse(text)
+
+class _Checkout(object):
+
+    def __init__(self, pool, context):
+        self.pool = pool
+        self.item = context
+
+    def __enter__(self):
+        return self.item
+
+    def __exit__(self, *exc):
+        self.pool.release(self.item)
+
+# end file
@@ -0,0 +1,355 @@
+#!/usr/bin/python3.6
+#
+# parser_compiler.py
+#
+# Build step that turns sly Lexer/Parser classes into standalone modules, e.g.
+#
+#     ./parser_compiler.py test_lexer:TestLexer test_parser:TestParser test_left_recursive:Lexer,Parser
+#
+# writes test_lexer_tab.py, test_parser_tab.py and test_left_recursive_tab.py next to the grammar
+# modules. A generated parser holds the LALR tables as flat arrays, a generated lexer the master
+# regex sly built, and both carry copies of the token/reduction callbacks and the other methods
+# of the original class. They only depend on lrparser.py at runtime:
+#
+#     from test_lexer_tab import TestLexer
+#     from test_parser_tab import TestParser
+#
+# A generated module is keyed by a hash of its grammar (_lr_signature) and is only rewritten
+# when the hash changes, use -f to force. With no arguments the three modules above are built.
+#
+
+import ast
+import builtins
+import hashlib
+import importlib
+import inspect
+import os
+import sys
+import textwrap
+import types
+
+from lrparser import ACTION_ERROR
+
+# bump when the layout of the generated modules changes
+TAB_VERSION = '2'
+
+DEFAULT_SPECS = ['test_lexer:TestLexer', 'test_parser:TestParser', 'test_left_recursive:Lexer,Parser']
+
+# class attributes owned by sly or rebuilt by the generated module
+_skip_attributes = {
+    '__module__', '__qualname__', '__doc__', '__dict__', '__weakref__',
+    'tokens', 'precedence', 'debugfile', 'start', 'log', 'ignore', 'literals',
+}
+
+def _is_lexer(cls):
+    return hasattr(cls, '_master_re')
+
+#
+# Hash of everything that determines the tables and callbacks of a class. For a parser:
+# tokens, precedence, start symbol, productions and callback source. For a lexer: the master
+# regex, ignore set, literals and callback source.
+#
+def grammar_signature(cls):
+    h = hashlib.sha1()
+    h.update(TAB_VERSION.encode())
+    h.update(cls.__qualname__.encode())
+    h.update(repr([base.__qualname__ for base in cls.__bases__]).encode())
+    h.update(repr(sorted(cls.tokens)).encode())
+    if _is_lexer(cls):
+        h.update(cls._master_re.pattern.encode())
+        h.update(repr((cls.reflags, cls.ignore, sorted(cls.literals), sorted(cls._ignored_tokens))).encode())
+        funcs = [f for _, f in sorted(cls._token_funcs.items())]
+    else:
+        grammar = cls._grammar
+        h.update(repr(getattr(cls, 'precedence', ())).encode())
+        h.update(repr(grammar.Start).encode())
+        for p in grammar.Productions:
+            h.update(str(p).encode())
+        funcs = [p.func for p in grammar.Productions if p.func]
+    funcs += [v for v in vars(cls).values() if isinstance(v, types.FunctionType)]
+    for func in funcs:
+        h.update(inspect.getsource(func).encode())
+    return h.hexdigest()
+
+def module_signature(classes):
+    return hashlib.sha1(''.join(grammar_signature(cls) for cls in classes).encode()).hexdigest()
+
+#
+# Source of a method without its decorators, renamed and indented for a class body
+#
+def _method_source(func, name):
+    source = textwrap.dedent(inspect.getsource(func))
+    tree = ast.parse(source)
+    lines = source.splitlines()[tree.body[0].lineno - 1:]
+    lines[0] = lines[0].replace('def {}('.format(func.__name__), 'def {}('.format(name), 1)
+    return textwrap.indent('\n'.join(lines), '    ') + '\n'
+
+# all global names referenced by a code object, including nested functions
+def _global_names(code):
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            names |= _global_names(const)
+    return names
+
+# global names used by a method, including default argument values, e.g. node_factory=node
+def _method_globals(func):
+    names = _global_names(func.__code__)
+    args = ast.parse(textwrap.dedent(inspect.getsource(func))).body[0].args
+    for default in args.defaults + [d for d in args.kw_defaults if d is not None]:
+        names |= set(n.id for n in ast.walk(default) if isinstance(n, ast.Name))
+    return names
+
+# True if repr(value) evaluates back to value
+def _is_literal(value):
+    try:
+        return ast.literal_eval(repr(value)) == value
+    except (ValueError, SyntaxError):
+        return False
+
+#
+# Return an import statement or assignment that recreates a global in the generated module
+#
+def _export(name, value, module_name):
+    if isinstance(value, types.ModuleType):
+        return 'import {} as {}'.format(value.__name__, name)
+    if isinstance(value, (type, types.FunctionType)) and value.__module__ != module_name:
+        return 'from {} import {} as {}'.format(value.__module__, value.__qualname__, name)
+    # an instance shared with the module of its class, e.g. symbols.SYMBOLS, not a copy of it
+    home = sys.modules.get(type(value).__module__)
+    if home is not None and home.__name__ not in ('builtins', module_name) and getattr(home, name, None) is value:
+        return 'from {} import {}'.format(home.__name__, name)
+    if isinstance(value, (set, frozenset)) and _is_literal(value):
+        # sorted so the generated module is stable across runs
+        return '{} = {{{}}}'.format(name, ', '.join(repr(v) for v in sorted(value)))
+    if _is_literal(value):
+        return '{} = {!r}'.format(name, value)
+    raise TypeError("Can't export global {!r} ({}) used by the generated module".format(name, type(value).__name__))
+
+# format a sequence as a python literal wrapped at ~100 columns
+def _wrap(items, indent='    '):
+    lines = []
+    line = indent
+    for item in items:
+        text = repr(item) + ', '
+        if len(line) + len(text) > 100:
+            lines.append(line.rstrip())
+            line = indent
+        line += text
+    lines.append(line.rstrip())
+    return '\n'.join(lines)
+
+#
+# Generated parts of one class: (runtime base class, [(function, method name)], table source)
+#
+def _parser_parts(cls):
+    grammar = cls._grammar
+    lrtable = cls._lrtable
+
+    # column order of the action and goto tables
+    terminals = ['$end'] + sorted(set(grammar.Terminals) | set(
+        t for row in lrtable.lr_action.values() for t in row) - {'$end'})
+    nonterminals = sorted(grammar.Nonterminals)
+    # the augmented start symbol S' is reduced through the goto table too
+    if grammar.Productions[0].name not in nonterminals:
+        nonterminals.append(grammar.Productions[0].name)
+
+    nstates = len(lrtable.lr_action)
+    tcolumn = dict((t, n) for n, t in enumerate(terminals))
+    ncolumn = dict((t, n) for n, t in enumerate(nonterminals))
+
+    action = [ACTION_ERROR] * (nstates * len(terminals))
+    for state, row in lrtable.lr_action.items():
+        for term, act in row.items():
+            action[state * len(terminals) + tcolumn[term]] = act
+
+    goto = [-1] * (nstates * len(nonterminals))
+    for state, row in lrtable.lr_goto.items():
+        for nonterm, target in row.items():
+            goto[state * len(nonterminals) + ncolumn[nonterm]] = target
+
+    defaulted = [ACTION_ERROR] * nstates
+    for state, act in lrtable.defaulted_states.items():
+        defaulted[state] = act
+
+    # reduction callbacks, one method per decorated function
+    callbacks = {}
+    methods = []
+    productions = []
+    for p in grammar.Productions[1:]:
+        callback = None
+        if p.func:
+            if p.func not in callbacks:
+                callbacks[p.func] = '_p_{}_{}'.format(len(callbacks) + 1, p.func.__name__)
+                methods.append((p.func, callbacks[p.func]))
+            callback = callbacks[p.func]
+
+        namemap = []
+        for key, accessor in p.namemap.items():
+            if len(accessor.__defaults__) != 1:
+                raise NotImplementedError('EBNF productions are not supported: {}'.format(p))
+            namemap.append((key, accessor.__defaults__[0]))
+        productions.append((p.name, p.len, callback, tuple(namemap)))
+
+    prefix = '_{}'.format(cls.__name__)
+    tables = []
+    tables.append('{}_terminals = (\n{}\n)'.format(prefix, _wrap(terminals)))
+    tables.append('{}_nonterminals = (\n{}\n)'.format(prefix, _wrap(nonterminals)))
+    tables.append("{}_action = array('i', [\n{}\n])".format(prefix, _wrap(action)))
+    tables.append("{}_goto = array('i', [\n{}\n])".format(prefix, _wrap(goto)))
+    tables.append("{}_defaulted = array('i', [\n{}\n])".format(prefix, _wrap(defaulted)))
+    tables.append('{}_productions = (\n{}\n)'.format(prefix, '\n'.join('    {!r},'.format(p) for p in productions)))
+    tables.append('{0}._load_tables({1!r}, {2}_terminals, {2}_nonterminals, {2}_action, {2}_goto, {2}_defaulted, {2}_productions)'.format(
+        cls.__name__, grammar_signature(cls), prefix))
+    return 'LRParser', methods, '\n\n'.join(tables)
+
+def _lexer_parts(cls):
+    methods = []
+    for func in cls._token_funcs.values():
+        if (func, func.__name__) not in methods:
+            methods.append((func, func.__name__))
+    token_funcs = dict((name, func.__name__) for name, func in cls._token_funcs.items())
+
+    tables = '{}._load_rules({!r}, {!r}, {!r}, {!r}, {!r}, {!r})'.format(
+        cls.__name__, grammar_signature(cls), cls._master_re.pattern, int(cls.reflags),
+        token_funcs, sorted(cls._ignored_tokens), cls._remapping)
+    return 'LRLexer', methods, tables
+
+#
+# Generate the source of a standalone module holding the given classes of one grammar module
+#
+def generate(classes):
+    module = sys.modules[classes[0].__module__]
+    exports = {}
+    out_classes = []
+    out_tables = []
+
+    for cls in classes:
+        base, methods, tables = (_lexer_parts if _is_lexer(cls) else _parser_parts)(cls)
+        rule_funcs = set(func for func, _ in methods)
+
+        # plain methods (__init__, error, ...) and class attributes
+        attributes = []
+        plain = []
+        for name, value in vars(cls).items():
+            if name in _skip_attributes or name.startswith('_') and not isinstance(value, types.FunctionType):
+                continue
+            if isinstance(value, types.FunctionType):
+                if value not in rule_funcs and not hasattr(value, 'rules'):
+                    plain.append((value, name))
+            elif name not in getattr(cls, '_token_names', ()):
+                alias = '_{}_{}'.format(cls.__name__, name)
+                exports[alias] = _export(alias, value, module.__name__)
+                attributes.append((name, alias))
+
+        methods = plain + methods
+        for func, name in methods:
+            for gname in sorted(_method_globals(func)):
+                if gname in module.__dict__ and not hasattr(builtins, gname):
+                    exports[gname] = _export(gname, module.__dict__[gname], module.__name__)
+
+        # mixins such as StreamingLexer are imported, sly's base classes are replaced
+        bases = []
+        for mixin in cls.__bases__:
+            if mixin.__module__.split('.')[0] != 'sly' and mixin is not object:
+                exports[mixin.__name__] = _export(mixin.__name__, mixin, module.__name__)
+                bases.append(mixin.__name__)
+        bases.append(base)
+
+        body = ['class {}({}):'.format(cls.__name__, ', '.join(bases))]
+        body.extend('    {} = {}'.format(name, alias) for name, alias in attributes)
+        if _is_lexer(cls):
+            body.append('    ignore = {!r}'.format(cls.ignore))
+            body.append('    literals = {!r}'.format(set(cls.literals)))
+        body.append('')
+        body.extend(_method_source(func, name) for func, name in methods)
+        out_classes.append('\n'.join(body))
+        out_tables.append(tables)
+
+    out = []
+    out.append('#')
+    out.append('# {}_tab.py'.format(module.__name__))
+    out.append('#')
+    out.append('# Generated by parser_compiler.py from {}. Do not edit.'.format(
+        ', '.join('{}.{}'.format(module.__name__, cls.__qualname__) for cls in classes)))
+    out.append('#')
+    out.append('')
+    out.append('from array import array')
+    out.append('from lrparser import LRLexer, LRParser')
+    # imports first, then literal globals
+    out.extend(sorted(exports.values(), key=lambda line: (not line.startswith(('import ', 'from ')), line)))
+    out.append('')
+    out.append('_lr_signature = {!r}'.format(module_signature(classes)))
+    out.append('')
+    out.extend(out_classes)
+    out.append('\n\n'.join(out_tables))
+    out.append('')
+    out.append('# end file')
+    return '\n'.join(out) + '\n'
+
+# signature of an already generated module, None if there isn't one
+def _current_signature(path):
+    try:
+        with open(path) as f:
+            for line in f:
+                if line.startswith('_lr_signature = '):
+                    return ast.literal_eval(line.split('=', 1)[1].strip())
+    except OSError:
+        pass
+    return None
+
+#
+# Write <module>_tab.py for 'module:Class[,Class...]'. Returns (path, written).
+#
+def build(spec, force=False, outdir=None):
+    module_name, _, class_names = spec.partition(':')
+    module = importlib.import_module(module_name)
+    classes = [getattr(module, name) for name in (class_names or 'Parser').split(',')]
+
+    path = os.path.join(outdir or os.path.dirname(os.path.abspath(module.__file__)), '{}_tab.py'.format(module_name))
+    if not force and _current_signature(path) == module_signature(classes):
+        return path, False
+
+    source = generate(classes)
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        f.write(source)
+    os.replace(tmp, path)
+    return path, True
+
+def main():
+    import getopt
+
+    def usage():
+        print("Usage: {} [options] module:Class[,Class...] ...".format(sys.argv[0]))
+        print("  -f,\t --force\tRewrite even if the grammar hash is unchanged.")
+        print("  -h,\t --help\t\tHelp.")
+        print("  -o,\t --outdir\tOutput directory (default: next to the grammar module).")
+
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], "fho:", ["force", "help", "outdir="])
+    except getopt.GetoptError as err:
+        print(err)
+        usage()
+        sys.exit(2)
+
+    force = False
+    outdir = None
+    for o, a in opts:
+        if o in ("-f", "--force"):
+            force = True
+        elif o in ("-h", "--help"):
+            usage()
+            sys.exit(0)
+        elif o in ("-o", "--outdir"):
+            outdir = a
+
+    for spec in args or DEFAULT_SPECS:
+        path, written = build(spec, force, outdir)
+        print("{}: {}".format(path, 'written' if written else 'up to date'))
+
+
+if __name__ == '__main__':
+    main()
+
+# end file
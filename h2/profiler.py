@@ -0,0 +1,237 @@
+#
+# profiler.py
+#
+# Opt-in instrumentation of the lexer and parser, 'h2.py --profile' prints it for the checked
+# files. Per production and per token type: calls, time and memory blocks allocated, plus the
+# syntax and lexer errors seen during error recovery.
+#
+#     profile = Profile()
+#     with profile.install(TestParser, TestLexer):
+#         tree = parser.parse(lexer.tokenize(text))
+#     print(profile.table())
+#     json.dump(profile.to_json(), f)
+#
+# install() swaps timing wrappers into the classes: the reduction functions (sly's
+# _grammar.Productions[n].func, or _productions of a parser generated by parser_compiler.py),
+# the lexer's token callbacks (_token_funcs: NUMBER, STRING, ID, ENDLINE), tokenize() and both
+# error() methods. The originals are put back when the with block ends, so without a profile
+# nothing is wrapped and parsing costs what it always did. Parsers and lexers of the installed
+# classes profile whichever instance runs, including ones created before install().
+#
+# Tokens are timed around the lexer generator's next(), so a token type's time includes
+# matching it and running its callback; reductions are timed around the rule function only.
+# Blocks are the change in sys.getallocatedblocks() over a call, the memory blocks it left
+# allocated: a reduction building a node counts the node, its children list and so on.
+#
+
+import json
+import sys
+import time
+
+from stream_lexer import TokenStream
+
+timer = time.perf_counter
+blocks = sys.getallocatedblocks
+
+# calls, seconds and net memory blocks of one production or token type
+class Stat(object):
+    __slots__ = ('calls', 'seconds', 'blocks')
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.blocks = 0
+
+    def to_json(self):
+        return {'calls': self.calls, 'seconds': self.seconds, 'blocks': self.blocks}
+
+# 'expr -> expr PLUS expr' of a sly Production
+def production_name(production):
+    return '{} -> {}'.format(production.name, ' '.join(production.prod) or '<empty>')
+
+# the same from a generated parser's (name, goto column, length, callback, namemap), the symbols
+# being the namemap's first name for each position
+def generated_name(production):
+    name, column, length, func, namemap = production
+    symbols = [None] * length
+    for symbol, n in sorted(namemap.items(), key=lambda item: item[1], reverse=True):
+        if n < length:
+            symbols[n] = symbol
+    return '{} -> {}'.format(name, ' '.join(symbols) or '<empty>')
+
+class Profile(object):
+
+    def __init__(self):
+        self.productions = {}         # production name -> Stat
+        self.callbacks = {}           # token type -> Stat of its callback
+        self.tokens = {}              # token type -> Stat of producing the token
+        self.events = []              # error recovery, dicts of kind/type/value/index
+        self.seconds = 0.0            # time inside install()
+
+    def stat(self, table, key):
+        stat = table.get(key)
+        if stat is None:
+            stat = table[key] = Stat()
+        return stat
+
+    # context manager installing the wrappers into parser_class and lexer_class (either None)
+    def install(self, parser_class=None, lexer_class=None):
+        return Installed(self, parser_class, lexer_class)
+
+    def wrap(self, func, stat):
+        def wrapper(owner, arg):
+            before = blocks()
+            start = timer()
+            try:
+                return func(owner, arg)
+            finally:
+                stat.seconds += timer() - start
+                stat.calls += 1
+                stat.blocks += blocks() - before
+        return wrapper
+
+    def wrap_error(self, func, kind):
+        events = self.events
+
+        def error(owner, token):
+            if token is None:
+                events.append({'kind': kind, 'type': '$end', 'value': None, 'index': None})
+            else:
+                events.append({'kind': kind, 'type': getattr(token, 'type', None),
+                               'value': str(getattr(token, 'value', '')), 'index': getattr(token, 'index', None)})
+            return func(owner, token)
+        return error
+
+    # tokenize() is called right away, stream lexers set up their line index there. The timed
+    # tokens keep the TokenStream's lines.
+    def wrap_tokenize(self, func):
+        profile = self
+
+        def tokenize(lexer, *args, **kwargs):
+            tokens = func(lexer, *args, **kwargs)
+            return TokenStream(profile.tokens_of(iter(tokens)), getattr(tokens, 'lines', None))
+        return tokenize
+
+    def tokens_of(self, tokens):
+        stats = self.tokens
+        while True:
+            before = blocks()
+            start = timer()
+            try:
+                token = next(tokens)
+            except StopIteration:
+                return
+            stat = stats.get(token.type)
+            if stat is None:
+                stat = stats[token.type] = Stat()
+            stat.seconds += timer() - start
+            stat.calls += 1
+            stat.blocks += blocks() - before
+            yield token
+
+    def to_json(self):
+        return {
+            'seconds': self.seconds,
+            'productions': dict((name, stat.to_json()) for name, stat in self.productions.items()),
+            'callbacks': dict((name, stat.to_json()) for name, stat in self.callbacks.items()),
+            'tokens': dict((name, stat.to_json()) for name, stat in self.tokens.items()),
+            'events': list(self.events),
+        }
+
+    def dump(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_json(), f, indent=1, sort_keys=True)
+
+    # sorted text tables: most time first
+    def table(self):
+        lines = []
+        for title, stats in (('Productions', self.productions), ('Token callbacks', self.callbacks),
+                             ('Tokens', self.tokens)):
+            used = [(name, stat) for name, stat in stats.items() if stat.calls]
+            if not used:
+                continue
+            lines.append('{:>9} {:>10} {:>9} {:>9}  {}'.format('calls', 'total ms', 'us/call', 'blocks', title))
+            for name, stat in sorted(used, key=lambda item: item[1].seconds, reverse=True):
+                lines.append('{:9d} {:10.3f} {:9.3f} {:9d}  {}'.format(stat.calls, stat.seconds * 1000,
+                                                                     stat.seconds * 1e6 / stat.calls,
+                                                                     stat.blocks, name))
+            lines.append('')
+        if self.events:
+            counts = {}
+            for event in self.events:
+                key = (event['kind'], event['type'])
+                counts[key] = counts.get(key, 0) + 1
+            lines.append('{:>9}  {}'.format('events', 'Error recovery'))
+            for (kind, type), count in sorted(counts.items(), key=lambda item: -item[1]):
+                lines.append('{:9d}  {} at {}'.format(count, kind, type))
+            lines.append('')
+        return '\n'.join(lines)
+
+#
+# The swapped attributes of one install(), undone by __exit__
+#
+class Installed(object):
+
+    def __init__(self, profile, parser_class, lexer_class):
+        self.profile = profile
+        self.parser_class = parser_class
+        self.lexer_class = lexer_class
+        self.undo = []                # (object, attribute, old value, inherited)
+        self.start = None
+
+    def __enter__(self):
+        profile = self.profile
+        parser_class = self.parser_class
+        lexer_class = self.lexer_class
+        try:
+            if parser_class is not None:
+                grammar = getattr(parser_class, '_grammar', None)
+                if grammar is not None:
+                    # sly: production objects shared by every instance
+                    for production in grammar.Productions:
+                        if production.func is not None:
+                            stat = profile.stat(profile.productions, production_name(production))
+                            self.set_attribute(production, 'func', profile.wrap(production.func, stat))
+                else:
+                    # generated parser: tuples in a class list, replaced as a whole
+                    productions = parser_class._productions[:1]
+                    for production in parser_class._productions[1:]:
+                        name, column, length, func, namemap = production
+                        if func is not None:
+                            func = profile.wrap(func, profile.stat(profile.productions, generated_name(production)))
+                        productions.append((name, column, length, func, namemap))
+                    self.set_attribute(parser_class, '_productions', productions)
+                self.set_attribute(parser_class, 'error', profile.wrap_error(parser_class.error, 'syntax error'))
+
+            if lexer_class is not None:
+                token_funcs = dict(lexer_class._token_funcs)
+                for name, func in token_funcs.items():
+                    token_funcs[name] = profile.wrap(func, profile.stat(profile.callbacks, name))
+                self.set_attribute(lexer_class, '_token_funcs', token_funcs)
+                self.set_attribute(lexer_class, 'tokenize', profile.wrap_tokenize(lexer_class.tokenize))
+                self.set_attribute(lexer_class, 'error', profile.wrap_error(lexer_class.error, 'lexer error'))
+        except BaseException:
+            self.restore()
+            raise
+        self.start = timer()
+        return profile
+
+    def __exit__(self, *exc):
+        self.profile.seconds += timer() - self.start
+        self.restore()
+
+    # attributes set on a class itself are restored, inherited ones deleted again
+    def set_attribute(self, owner, name, value):
+        inherited = isinstance(owner, type) and name not in vars(owner)
+        self.undo.append((owner, name, None if inherited else getattr(owner, name), inherited))
+        setattr(owner, name, value)
+
+    def restore(self):
+        while self.undo:
+            owner, name, value, inherited = self.undo.pop()
+            if inherited:
+                delattr(owner, name)
+            else:
+                setattr(owner, name, value)
+
+# end file
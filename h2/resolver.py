@@ -0,0 +1,182 @@
+#
+# resolver.py
+#
+# Scope resolution between parsing (and optimizer.py) and bytecode.py. Every variable gets a slot
+# in one frame list: assignments become ('store', slot) and reads ('load', slot), so the VM
+# indexes a list instead of looking names up in env.
+#
+#     resolver = Resolver(inputs={'halite', 'cost'})
+#     program = compile_tree(resolver.resolve(tree), resolver.layout())
+#     for message in resolver.errors: ...
+#     VM(env).run(program)
+#
+# Scopes are the top level and each Mission body. A name belongs to the scope of its first
+# assignment in statement order (missions run inline) and is found from that scope and the ones
+# nested in it. A mission can read and update the top level's variables, while the names it
+# introduces are its own: sibling missions don't see them and the host doesn't get them back.
+#
+# A read of a name that isn't assigned before it, in its scope or an enclosing one, is reported
+# in .errors as a use before assignment unless the name is in inputs. It still gets a top level
+# slot, loaded from env when the run starts, so values the host keeps between turns work and a
+# missing one raises at run time as before.
+#
+# Scripts have no branches, so a read after an assignment in the same run is certain to find a
+# value and stays a plain 'load'. Other reads, of inputs and of enclosing scopes' variables in a
+# mission (which can be run on its own), are ('load_checked', slot) and raise on an empty slot.
+#
+# Scopes find slots by symbol id (symbols.py), the layout has the names' text for env.
+#
+
+from interpreter import CONTAINERS
+from optimizer import assignment
+from simple_node import SimpleNode, split_value
+from symbols import SYMBOLS
+
+#
+# Frame layout of a resolved tree
+#
+#     names     variable name per slot
+#     top       top level slots, the ones shared with env
+#     loads     top level slots filled from env at the start of a run, read by a 'load_checked'
+#     stores    top level slots stored back to env at the end of a run, assigned by a 'store'
+#     required  loads a whole run reads before assigning them; once env has these no
+#               'load_checked' of a whole run can find an empty slot
+#
+class Layout(object):
+    __slots__ = ('names', 'top', 'loads', 'stores', 'required')
+
+    def __init__(self, names, top, loads, stores, required):
+        self.names = names
+        self.top = top
+        self.loads = loads
+        self.stores = stores
+        self.required = required
+
+class Scope(object):
+
+    def __init__(self, parent=None, label='top level'):
+        self.parent = parent
+        self.label = label
+        self.slots = {}               # symbol id -> slot
+
+    def find(self, id):
+        scope = self
+        while scope is not None:
+            slot = scope.slots.get(id)
+            if slot is not None:
+                return slot
+            scope = scope.parent
+        return None
+
+class Resolver(object):
+
+    # inputs: names the host puts in env before the run
+    # node builds the new nodes, the same factory the parser used
+    # symbols: the SymbolTable of the tree's ids
+    def __init__(self, inputs=(), node=SimpleNode, symbols=None):
+        self.inputs = set(inputs)
+        self.node = node
+        self.symbols = SYMBOLS if symbols is None else symbols
+        self.names = []
+        self.top = Scope()
+        self.checked = set()          # slots read by a 'load_checked'
+        self.required = set()         # ... before a whole run assigns them
+        self.stored = set()           # slots assigned
+        self.errors = []
+        for name in sorted(self.inputs):
+            self.declare(self.top, self.symbols.intern(name))
+
+    def declare(self, scope, id):
+        slot = scope.slots[id] = len(self.names)
+        self.names.append(self.symbols.text(id))
+        return slot
+
+    def layout(self):
+        top = sorted(self.top.slots.values())
+        return Layout(list(self.names), top, [slot for slot in top if slot in self.checked],
+                      [slot for slot in top if slot in self.stored],
+                      [slot for slot in top if slot in self.required])
+
+    # tree is a parse result, a node or a list of statement nodes; returns the same shape
+    def resolve(self, tree):
+        if tree is None:
+            return None
+        statements = self.statements(tree if isinstance(tree, list) else [tree], self.top, set(), set())
+        if isinstance(tree, list):
+            return statements
+        return statements[0] if statements else None
+
+    #
+    # assigned is the set of slots certain to hold a value at this point of the run, updated in
+    # place. A mission body starts with an empty one since it can be run on its own; run inline,
+    # what it assigns is assigned afterwards. inline is the same for a whole run, where missions
+    # also see what was assigned before them.
+    #
+    def statements(self, statements, scope, assigned, inline):
+        result = []
+        for node in statements:
+            kind, payload = split_value(node.value)
+            if kind in CONTAINERS:
+                node = self.node(node.value, self.statements(node.children, scope, assigned, inline))
+            elif kind == 'mission':
+                inner = Scope(scope, "Mission {!r}".format(self.symbols.text(payload)))
+                body = set()
+                node = self.node(node.value, self.statements(node.children, inner, body, inline))
+                assigned |= body
+            elif kind == 'assign' or kind == '=':
+                name, value = assignment(node)
+                value = self.expression(value, scope, assigned, inline)
+                slot = scope.find(name)
+                if slot is None:
+                    slot = self.declare(scope, name)
+                assigned.add(slot)
+                inline.add(slot)
+                self.stored.add(slot)
+                node = self.node(('store', slot), [value])
+            elif kind == 'print':
+                node = self.node(node.value, [self.expression(node.children[0], scope, assigned, inline)])
+            result.append(node)
+        return result
+
+    # rewrite reads, post order with an explicit stack
+    def expression(self, root, scope, assigned, inline):
+        done = []
+        stack = [(root, False)]
+        while stack:
+            node, visited = stack.pop()
+            kind, payload = split_value(node.value)
+            if not visited:
+                if kind == 'id':
+                    slot = self.read(payload, scope)
+                    if slot in assigned:
+                        done.append(self.node(('load', slot)))
+                    else:
+                        self.checked.add(slot)
+                        if slot not in inline:
+                            self.required.add(slot)
+                        done.append(self.node(('load_checked', slot)))
+                elif node.children:
+                    stack.append((node, True))
+                    stack.extend((child, False) for child in reversed(node.children))
+                else:
+                    done.append(node)
+                continue
+
+            n = len(node.children)
+            children = done[len(done) - n:]
+            del done[len(done) - n:]
+            done.append(self.node(node.value, children))
+        return done[0]
+
+    def read(self, id, scope):
+        slot = scope.find(id)
+        if slot is None:
+            self.errors.append("Use of '{}' before assignment in {}".format(self.symbols.text(id), scope.label))
+            slot = self.declare(self.top, id)
+        return slot
+
+def resolve(tree, inputs=(), node=SimpleNode, symbols=None):
+    resolver = Resolver(inputs, node, symbols)
+    return resolver.resolve(tree), resolver.layout(), resolver.errors
+
+# end file
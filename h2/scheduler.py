@@ -0,0 +1,254 @@
+#
+# scheduler.py
+#
+# Runs a script's Mission blocks within a per turn time budget. Halite kills a bot that goes
+# over its turn limit, so instead of running the whole script, each mission is a task that runs
+# a statement at a time and is suspended when the turn's deadline or its own quota is reached.
+# A suspended mission resumes where it stopped next turn; a finished one starts over.
+#
+#     scheduler = Scheduler(env, budget=0.5)                  # seconds per turn
+#     scheduler.load(tree, priorities={'return': 1}, quotas={'collect': 0.05})
+#     report = scheduler.turn()
+#     for mission in report.missions.values():
+#         print(mission.name, mission.state, mission.used)
+#
+# The statements outside Mission blocks are a task too, named TOP, which runs before the missions
+# unless priorities say otherwise since it sets what they read. Tasks run by priority, highest
+# first; tasks of the same priority take turns a statement at a time, in script order. Missions
+# nested in a mission run inline as part of it. A task is named after its mission; the second
+# mission of a script with the same name is 'name#2', the third 'name#3' ..., and gets the
+# priority and quota given for name.
+#
+# A task is a generator over its statements: the generator is where the mission stopped, and the
+# Interpreter executes the statement it yields against the shared env. The deadline and quotas
+# are checked between statements, so a turn can overrun by one statement's time; one statement
+# is one expression, short next to a turn. A mission that raises H2RuntimeError is reported
+# with the error and starts over next turn, the others go on.
+#
+# clock is called once when a turn starts and once after each statement. FakeClock stands in
+# for time.monotonic() in checks: with step=s every statement takes s seconds.
+#
+
+import time
+
+from interpreter import CONTAINERS, H2RuntimeError, Interpreter
+from simple_node import split_value
+
+# name of the task running the statements outside Mission blocks, and its default priority
+TOP = ''
+TOP_PRIORITY = float('inf')
+
+# mission states in a TurnReport
+DONE = 'done'                 # ran to its end this turn, starts over next turn
+DEADLINE = 'deadline'         # suspended at the turn's deadline, resumes next turn
+QUOTA = 'quota'               # suspended after using its quota, resumes next turn
+WAITING = 'waiting'           # the deadline came before it could run, keeps its place
+ERROR = 'error'               # raised H2RuntimeError, starts over next turn
+
+class SchedulerError(Exception):
+    pass
+
+class FakeClock(object):
+
+    # start: first reading, step: seconds the clock moves on after each reading
+    def __init__(self, start=0.0, step=0.0):
+        self.now = start
+        self.step = step
+
+    def __call__(self):
+        now = self.now
+        self.now += self.step
+        return now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+# the statements of body in execution order, nested Mission blocks inline
+def statements(body):
+    stack = list(reversed(body))
+    while stack:
+        node = stack.pop()
+        if node is None:
+            continue
+        kind, payload = split_value(node.value)
+        if kind in CONTAINERS or kind == 'mission':
+            stack.extend(reversed(node.children))
+        else:
+            yield node
+
+# (top level statements, [(mission name's symbol id, body) ...]) of a parse result
+def split_missions(tree):
+    top = []
+    missions = []
+    if tree is None:
+        return top, missions
+    stack = list(reversed(tree)) if isinstance(tree, list) else [tree]
+    while stack:
+        node = stack.pop()
+        if node is None:
+            continue
+        kind, payload = split_value(node.value)
+        if kind in CONTAINERS:
+            stack.extend(reversed(node.children))
+        elif kind == 'mission':
+            missions.append((payload, node.children))
+        else:
+            top.append(node)
+    return top, missions
+
+class Task(object):
+    __slots__ = ('name', 'body', 'priority', 'quota', 'order', 'steps', 'node')
+
+    # quota: seconds per turn, None for no limit but the deadline
+    def __init__(self, name, body, priority, quota, order):
+        self.name = name
+        self.body = body
+        self.priority = priority
+        self.quota = quota
+        self.order = order
+        self.steps = None             # statements() generator while suspended
+        self.node = None              # its next statement
+
+#
+# One mission's turn
+#
+#     state        DONE, DEADLINE, QUOTA, WAITING or ERROR
+#     used         seconds spent running its statements
+#     statements   statements it ran
+#     error        message when state is ERROR
+#
+class MissionReport(object):
+    __slots__ = ('name', 'state', 'used', 'statements', 'error')
+
+    def __init__(self, name):
+        self.name = name
+        self.state = WAITING
+        self.used = 0.0
+        self.statements = 0
+        self.error = None
+
+    def __repr__(self):
+        return '<MissionReport {!r} {} {:.6f}s {} statements>'.format(self.name, self.state, self.used,
+                                                                     self.statements)
+
+#
+# One turn
+#
+#     budget     the turn's budget in seconds
+#     used       seconds from the start of the turn to the end of its last statement
+#     missions   name -> MissionReport, in scheduling order
+#
+class TurnReport(object):
+    __slots__ = ('budget', 'used', 'missions')
+
+    def __init__(self, budget):
+        self.budget = budget
+        self.used = 0.0
+        self.missions = {}
+
+    # seconds over the budget, the last statement's overrun
+    def overrun(self):
+        return max(0.0, self.used - self.budget)
+
+    # names of the missions that will resume next turn
+    def suspended(self):
+        return [name for name, mission in self.missions.items() if mission.state in (DEADLINE, QUOTA)]
+
+class Scheduler(object):
+
+    # env, out and symbols as for Interpreter, budget in seconds per turn, clock returns monotonic
+    # seconds
+    def __init__(self, env=None, out=print, budget=0.1, clock=time.monotonic, symbols=None):
+        self.interpreter = Interpreter(env, out, symbols)
+        self.env = self.interpreter.env
+        self.symbols = self.interpreter.symbols
+        self.budget = budget
+        self.clock = clock
+        self.tasks = []
+
+    # body: list of statement nodes, higher priorities run first. name must be new.
+    def add(self, name, body, priority=0, quota=None):
+        if any(task.name == name for task in self.tasks):
+            raise SchedulerError("Mission {!r} added twice".format(name))
+        task = Task(name, body, priority, quota, len(self.tasks))
+        self.tasks.append(task)
+        self.tasks.sort(key=lambda task: (-task.priority, task.order))
+        return task
+
+    # add TOP (if there are top level statements) and each top level Mission block of a parse result,
+    # priorities and quotas map names to add()'s arguments
+    def load(self, tree, priorities=None, quotas=None):
+        priorities = {} if priorities is None else priorities
+        quotas = {} if quotas is None else quotas
+        top, missions = split_missions(tree)
+        if top:
+            self.add(TOP, top, priorities.get(TOP, TOP_PRIORITY), quotas.get(TOP))
+        used = set(task.name for task in self.tasks)
+        counts = {}
+        for id, body in missions:
+            name = key = self.symbols.text(id)
+            while key in used:
+                counts[name] = counts.get(name, 1) + 1
+                key = '{}#{}'.format(name, counts[name])
+            used.add(key)
+            self.add(key, body, priorities.get(name, 0), quotas.get(name))
+
+    def turn(self):
+        clock = self.clock
+        execute = self.interpreter.execute
+        now = start = clock()
+        deadline = start + self.budget
+        report = TurnReport(self.budget)
+        for task in self.tasks:
+            report.missions[task.name] = MissionReport(task.name)
+
+        # tasks are sorted by priority, each group of equal priority takes turns
+        tasks = self.tasks
+        n = 0
+        while n < len(tasks) and now < deadline:
+            group = [task for task in tasks[n:] if task.priority == tasks[n].priority]
+            n += len(group)
+            while group and now < deadline:
+                for task in list(group):
+                    mission = report.missions[task.name]
+                    if now >= deadline:
+                        break
+                    if task.quota is not None and mission.used >= task.quota:
+                        mission.state = QUOTA
+                        group.remove(task)
+                        continue
+                    if task.steps is None:
+                        task.steps = statements(task.body)
+                        task.node = next(task.steps, None)
+                        if task.node is None:
+                            task.steps = None
+                            mission.state = DONE
+                            group.remove(task)
+                            continue
+                    # the next statement is fetched right away, so a mission is done as soon as
+                    # its last statement has run
+                    try:
+                        execute(task.node)
+                        task.node = next(task.steps, None)
+                        if task.node is None:
+                            task.steps = None
+                            mission.state = DONE
+                            group.remove(task)
+                    except H2RuntimeError as e:
+                        task.steps = None
+                        mission.state = ERROR
+                        mission.error = str(e)
+                        group.remove(task)
+                    after = clock()
+                    mission.used += after - now
+                    mission.statements += 1
+                    now = after
+
+        for task in tasks:
+            mission = report.missions[task.name]
+            if mission.state == WAITING and mission.statements:
+                mission.state = DEADLINE
+        report.used = now - start
+        return report
+
+# end file
@@ -0,0 +1,223 @@
+#
+# server.py
+#
+# 'h2.py --serve': answer parse, check and tokenize requests from one warm lexer/parser, so
+# tools and editors don't pay for starting Python and building the grammar tables per script.
+#
+#     h2.py --serve                    requests on stdin, responses on stdout
+#     h2.py --serve --socket PATH      a Unix domain socket, any number of clients
+#
+# Newline delimited JSON, a request and its response per line:
+#
+#     {"id": 1, "op": "check", "text": "x = 1 +\n"}
+#     {"id": 1, "ok": true, "statements": 1, "errors": [[1, 8, "Syntax error ..."]], "ms": 0.21}
+#
+#     op        response
+#     check     statements, errors: [line, column, message] (line/column null when unknown)
+#     parse     the same and tree: [kind, payload, [children]], a list of them for a list result
+#     tokenize  tokens: [type, value, line, column], and errors
+#
+# Identifier and string payloads and token values are the text of their symbol ids (symbols.py).
+#     stats     requests, total_ms, slowest_ms (of the requests before this one)
+#
+# id is echoed back, anything JSON. A bad request gets "ok": false and an "error" message. A
+# request the server fails on (a bug, a tree too deep to encode) gets "ok": false, "internal":
+# true and the exception in "error", the traceback goes to the log, and the server carries on.
+# ms is the time spent on the request in the server, from decoding it to the response being ready.
+#
+# Requests are handled one at a time in the event loop: lexing and parsing hold the GIL, so a
+# second lexer/parser would not run in parallel, and between requests asyncio serves the other
+# clients. With -c DIR parse results come from the ast_cache.py cache as with file checks.
+#
+
+import asyncio
+import json
+import os
+import stat
+import sys
+import time
+import traceback
+
+from simple_node import split_value
+from statements import count_statements
+from symbols import SYMBOLS
+from test_lexer import TestLexer
+from test_parser import TestParser
+from traversal import postorder
+
+# longest request line, a whole script
+LINE_LIMIT = 64 * 1024 * 1024
+
+class RequestError(Exception):
+    pass
+
+# nested JSON of a parse result: [kind, payload, [children]] per node, symbol ids as their text
+# in names
+def tree_json(tree, names=SYMBOLS):
+    value_text = names.value_text
+    done = []                         # (depth, json) of nodes whose parent is still to come
+    for node, depth in postorder(tree):
+        children = []
+        while done and done[-1][0] > depth:
+            children.append(done.pop()[1])
+        children.reverse()
+        kind, payload = split_value(value_text(node.value))
+        done.append((depth, [kind, payload, children]))
+    roots = [json for depth, json in done]
+    if isinstance(tree, list):
+        return roots
+    return roots[0] if roots else None
+
+class Server(object):
+
+    # cache_directory: keep parse results in an ASTCache there, None for none
+    # log: file for a line per request (verbose), None for none
+    def __init__(self, cache_directory=None, log=None):
+        self.parser = TestParser()
+        self.lexer = TestLexer(names=self.parser.names)
+        self.cache = None
+        if cache_directory is not None:
+            from ast_cache import ASTCache
+            self.cache = ASTCache(cache_directory, names=self.parser.names)
+        self.log = log
+        self.requests = 0
+        self.seconds = 0.0
+        self.slowest = 0.0
+
+    # (tree, errors) of a text
+    def parse_text(self, text):
+        errors = []
+
+        def report(line, column, message):
+            errors.append((line, column, message))
+
+        tree = self.parser.context(report=report).parse(self.lexer.context(report=report).tokenize(text))
+        return tree, errors
+
+    def parse(self, text):
+        if self.cache is None:
+            return self.parse_text(text)
+        return self.cache.parse(text, self.parse_text)
+
+    def tokenize(self, text):
+        errors = []
+
+        def report(line, column, message):
+            errors.append((line, column, message))
+
+        stream = self.lexer.context(report=report).tokenize(text)
+        position = stream.lines.position
+        token_text = self.lexer.names.token_text
+        tokens = []
+        for token in stream:
+            line, column = position(token.index)
+            tokens.append((token.type, token_text(token), line, column))
+        return tokens, errors
+
+    # response dict of a request dict
+    def respond(self, request):
+        if not isinstance(request, dict):
+            raise RequestError("request is not a JSON object")
+        op = request.get('op')
+        if op == 'stats':
+            return {'requests': self.requests, 'total_ms': self.seconds * 1000, 'slowest_ms': self.slowest * 1000}
+        text = request.get('text')
+        if not isinstance(text, str):
+            raise RequestError("'text' missing or not a string")
+        if op == 'tokenize':
+            tokens, errors = self.tokenize(text)
+            return {'tokens': tokens, 'errors': errors}
+        if op in ('check', 'parse'):
+            tree, errors = self.parse(text)
+            response = {'statements': count_statements(tree), 'errors': errors}
+            if op == 'parse':
+                response['tree'] = tree_json(tree, self.parser.names)
+            return response
+        raise RequestError("unknown op {!r}".format(op))
+
+    # response line (no newline) of a request line
+    def handle(self, line):
+        start = time.perf_counter()
+        id = None
+        op = None
+        try:
+            request = json.loads(line)
+            if isinstance(request, dict):
+                id = request.get('id')
+                op = request.get('op')
+            response = self.respond(request)
+            response['ok'] = True
+        except (ValueError, RequestError) as e:
+            response = {'ok': False, 'error': str(e)}
+        except Exception as e:
+            response = self.internal_error(e)
+        response['id'] = id
+        seconds = time.perf_counter() - start
+        response['ms'] = seconds * 1000
+        try:
+            reply = json.dumps(response)
+        except Exception as e:
+            # e.g. a tree nested deeper than the encoder's recursion limit
+            response = self.internal_error(e)
+            response['id'] = id
+            response['ms'] = seconds * 1000
+            reply = json.dumps(response)
+        self.requests += 1
+        self.seconds += seconds
+        self.slowest = max(self.slowest, seconds)
+        if self.log is not None:
+            print("{} {} bytes {:.3f} ms".format(op, len(line), seconds * 1000), file=self.log)
+        return reply
+
+    # response dict of a request the server failed on. The lexer/parser ran on contexts of the
+    # shared pair (parse_context.py), so the next request starts clean.
+    def internal_error(self, e):
+        if self.log is not None:
+            traceback.print_exc(file=self.log)
+        return {'ok': False, 'internal': True, 'error': "{}: {}".format(type(e).__name__, e)}
+
+    # one client on stdin/stdout or any pair of text files
+    def serve_files(self, infile=sys.stdin, outfile=sys.stdout):
+        for line in infile:
+            if line.strip():
+                outfile.write(self.handle(line) + '\n')
+                outfile.flush()
+
+    async def client(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if line.strip():
+                    writer.write(self.handle(line.decode('utf-8', 'replace')).encode('utf-8') + b'\n')
+                    await writer.drain()
+        except (ConnectionError, ValueError) as e:
+            # ValueError: a line over LINE_LIMIT
+            if self.log is not None:
+                print("client dropped: {}".format(e), file=self.log)
+        finally:
+            writer.close()
+
+    # serve clients on a Unix domain socket at path until interrupted. A socket left at path by a
+    # server that was killed is replaced, anything else there is an error.
+    def serve_socket(self, path):
+        if os.path.exists(path):
+            if not stat.S_ISSOCK(os.stat(path).st_mode):
+                raise OSError("{} exists and is not a socket".format(path))
+            os.unlink(path)
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        server = loop.run_until_complete(asyncio.start_unix_server(self.client, path, limit=LINE_LIMIT))
+        try:
+            loop.run_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.close()
+            loop.run_until_complete(server.wait_closed())
+            loop.close()
+            if os.path.exists(path):
+                os.unlink(path)
+
+# end file
@@ -2,16 +2,24 @@
 # simple_node.py
 #
 
+from traversal import tree_string
+
 class SimpleNode(object):
-    def __init__(self, value, children = []):
+    def __init__(self, value, children = ()):
         self.value = value
         self.children = children
 
+    # a line per node, a tab per level; see traversal.write_tree() for writing it to a file
     def __str__(self, level=0):
-        ret = "\t" * level + repr(self.value) + "\n"
-        for child in self.children:
-            ret += child.__str__(level + 1)
-        return ret
+        return tree_string(self, level)
 
     def __repr__(self):
-        return '<tree node representation>'
\ No newline at end of file
+        return '<tree node representation>'
+
+#
+# Split a node value into (kind, payload): ('number', 1) -> ('number', 1), '+' -> ('+', None)
+#
+def split_value(value):
+    if isinstance(value, tuple):
+        return value[0], value[1]
+    return value, None
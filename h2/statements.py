@@ -0,0 +1,26 @@
+#
+# statements.py
+#
+# count_statements(), shared by h2.py and server.py. It lives in its own module so server.py
+# need not import h2.py: inside the h2 package 'import h2' finds the package, not the script.
+#
+
+from interpreter import CONTAINERS
+from simple_node import split_value
+
+# statements in a parse tree, mission bodies included
+def count_statements(tree):
+    count = 0
+    stack = [tree] if tree is not None else []
+    while stack:
+        node = stack.pop()
+        kind, payload = split_value(node.value)
+        if kind in CONTAINERS:
+            stack.extend(node.children)
+        else:
+            count += 1
+            if kind == 'mission':
+                stack.extend(node.children)
+    return count
+
+# end file
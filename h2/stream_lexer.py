@@ -0,0 +1,180 @@
+#
+# stream_lexer.py
+#
+# Input handling shared by the sly lexers (and the generated *_tab.py lexers). Mix it in
+# ahead of the Lexer base class:
+#
+#     class TestLexer(StreamingLexer, Lexer):
+#         ...
+#
+#     parser.parse(lexer.tokenize_stream(fileinput.input()))
+#
+# tokenize() and tokenize_stream() both return a TokenStream: the tokens, with .lines the
+# LineIndex that find_column() and the parsers' error reporting use to turn token.index into
+# (line, column). The parsers take it from there when they aren't given lines.
+#
+# tokenize_stream() lexes any iterable of text chunks, e.g. lines from fileinput. Tokens are
+# yielded as soon as they are complete. A match that runs into the end of the buffer (an ID, a
+# comment without its newline, '=' that could be '==') or no match at all (a STRING whose
+# closing quote hasn't arrived yet) pulls in the next chunk before the token is accepted.
+# Consumed lines are dropped from the buffer, so memory is bounded by the longest token plus
+# one chunk instead of the whole input. token.index/end are absolute offsets.
+#
+# Both run on a context (parse_context.py): text/index/lineno/lines of the call in progress are
+# kept there, not on the lexer, so one lexer can tokenize in several threads at once.
+#
+
+from line_index import LineIndex
+from lrparser import Token
+from parse_context import Reentrant
+
+#
+# Iterator over the tokens of one tokenize() call, with that call's LineIndex
+#
+class TokenStream(object):
+    __slots__ = ('tokens', 'lines')
+
+    def __init__(self, tokens, lines):
+        self.tokens = tokens
+        self.lines = lines
+
+    def __iter__(self):
+        return self.tokens
+
+    def __next__(self):
+        return next(self.tokens)
+
+    # stop the lexer early, as generator.close()
+    def close(self):
+        self.tokens.close()
+
+class StreamingLexer(Reentrant):
+
+    # how far to read ahead looking for the end of an unmatched token before reporting an error
+    max_lookahead = 1 << 20
+
+    lines = None
+
+    # characters of remaining input passed to error() in token.value. sly passes all of it,
+    # which makes every bad character cost O(n).
+    error_context = 80
+
+    # lines: an up to date LineIndex of text to reuse instead of building one
+    def tokenize(self, text, lineno=1, index=0, lines=None):
+        if lines is None:
+            lines = LineIndex(text)
+        lexer = self.call_context(lines=lines)
+        return TokenStream(lexer._tokenize_stream((), lineno, lines, text, index), lines)
+
+    def tokenize_stream(self, chunks, lineno=1):
+        lines = LineIndex()
+        lexer = self.call_context(lines=lines)
+        return TokenStream(lexer._tokenize_stream(chunks, lineno, lines), lines)
+
+    # column of a token, 1-based, on a context that tokenized (see parse_context.py)
+    def find_column(self, text, token):
+        return self.lines.column(token.index)
+
+    # text/index: input already buffered and where to start in it
+    def _tokenize_stream(self, chunks, lineno, lines, text='', index=0):
+        _ignored_tokens = self._ignored_tokens
+        _master_re = self._master_re
+        _ignore = self.ignore
+        _token_funcs = self._token_funcs
+        _literals = self.literals
+        _remapping = self._remapping
+
+        if isinstance(chunks, str):
+            chunks = [chunks]
+        chunks = iter(chunks)
+
+        base = 0            # absolute offset of text[0]
+        eof = False
+
+        self.text = text
+        try:
+            while True:
+                if index >= len(text):
+                    if eof:
+                        return
+                    m = None
+                    need_more = True
+                else:
+                    if text[index] in _ignore:
+                        index += 1
+                        continue
+                    m = _master_re.match(text, index)
+                    # the token may continue in the next chunk
+                    if m:
+                        need_more = not eof and m.end() == len(text)
+                    else:
+                        need_more = not eof and len(text) - index < self.max_lookahead
+
+                if need_more:
+                    # refill, dropping the lines already consumed
+                    chunk = next(chunks, None)
+                    if chunk is None:
+                        eof = True
+                        continue
+                    cut = text.rfind('\n', 0, index) + 1
+                    if cut:
+                        text = text[cut:]
+                        base += cut
+                        index -= cut
+                    text += chunk
+                    lines.feed(chunk)
+                    self.text = text
+                    continue
+
+                tok = Token()
+                tok.lineno = lineno
+                tok.index = base + index
+                if m:
+                    index = m.end()
+                    tok.end = base + index
+                    tok.value = m.group()
+                    tok.type = m.lastgroup
+
+                    if tok.type in _remapping:
+                        tok.type = _remapping[tok.type].get(tok.value, tok.type)
+
+                    if tok.type in _token_funcs:
+                        self.index = index
+                        self.lineno = lineno
+                        tok = _token_funcs[tok.type](self, tok)
+                        index = self.index
+                        lineno = self.lineno
+                        if not tok:
+                            continue
+
+                    if tok.type in _ignored_tokens:
+                        continue
+
+                    yield tok
+
+                else:
+                    if text[index] in _literals:
+                        tok.value = text[index]
+                        tok.end = base + index + 1
+                        tok.type = tok.value
+                        index += 1
+                        yield tok
+                    else:
+                        self.index = index
+                        self.lineno = lineno
+                        tok.type = 'ERROR'
+                        tok.value = text[index:index + self.error_context]
+                        tok = self.error(tok)
+                        if tok is not None:
+                            tok.end = base + self.index
+                            yield tok
+
+                        index = self.index
+                        lineno = self.lineno
+
+        finally:
+            self.text = text
+            self.index = base + index
+            self.lineno = lineno
+
+# end file
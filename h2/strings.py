@@ -0,0 +1,153 @@
+#
+# strings.py
+#
+# String literals: decoding the STRING token's text and compiling ${name} placeholders.
+#
+#     decode('"a\\tb"')                 -> 'a\tb'
+#     template('ships: ${count}')       -> (('string', 'ships: '), ('id', 'count'))
+#     template('no placeholders')       -> 'no placeholders'
+#     template_text(template('${ n }')) -> '${n}'
+#
+# decode() gives what ast.literal_eval() gives for a double quoted literal, Python's escapes
+# included, without running the Python parser: a literal without a backslash is just sliced,
+# others are split at the backslashes, the one character escapes looked up in a dict and only
+# numeric and named ones matched with a regex. Line breaks in a literal are kept, strings may span
+# lines. Escapes Python doesn't know (\$, \d ...) keep their backslash, as in Python.
+#
+# template() splits decoded text at ${name} placeholders into literal and identifier segments,
+# the values (interned to symbol ids by TestLexer) of the 'string' and 'id' nodes TestParser
+# builds a 'template' node from. At run time a template is one ''.join() of its segments'
+# values, str() of the identifiers', so the text is never scanned again. $${ is a literal ${.
+#
+
+import re
+import unicodedata
+
+ESCAPES = {
+    '\n': '',
+    '\\': '\\',
+    "'": "'",
+    '"': '"',
+    'a': '\a',
+    'b': '\b',
+    'f': '\f',
+    'n': '\n',
+    'r': '\r',
+    't': '\t',
+    'v': '\v',
+}
+
+ESCAPE = re.compile(r'\\(?:([0-7]{1,3})|x(.{0,2})|u(.{0,4})|U(.{0,8})|N\{([^}]*)\}|([\s\S])|$)')
+HEX = re.compile(r'[0-9a-fA-F]+\Z')
+
+# \x, \u and \U take this many hex digits
+HEX_DIGITS = {2: '\\xXX', 4: '\\uXXXX', 8: '\\UXXXXXXXX'}
+
+NAME = re.compile(r'[a-zA-Z_][a-zA-Z0-9_]*\Z')
+
+class StringError(Exception):
+
+    # offset: where the problem is in the text passed to decode()/template()
+    def __init__(self, message, offset=0):
+        super().__init__(message)
+        self.offset = offset
+
+def _escape(m):
+    octal, hex2, hex4, hex8, name, other = m.groups()
+    if octal is not None:
+        return chr(int(octal, 8))
+    for digits, size in ((hex2, 2), (hex4, 4), (hex8, 8)):
+        if digits is not None:
+            if len(digits) != size or not HEX.match(digits):
+                raise StringError("truncated {} escape".format(HEX_DIGITS[size]), m.start())
+            code = int(digits, 16)
+            if code > 0x10ffff:
+                raise StringError("illegal Unicode character", m.start())
+            return chr(code)
+    if name is not None:
+        try:
+            return unicodedata.lookup(name)
+        except KeyError:
+            raise StringError("unknown Unicode character name", m.start())
+    if other is None:
+        raise StringError("trailing backslash", m.start())
+    if other == 'N':
+        raise StringError("malformed \\N character escape", m.start())
+    return ESCAPES.get(other, m.group())
+
+# the text of a double quoted literal, quotes included
+def decode(literal):
+    body = literal[1:-1]
+    if '\\' not in body:
+        return body
+    parts = body.split('\\')
+    text = [parts[0]]
+    offset = len(parts[0]) + 1      # of the backslash before parts[n], in literal
+    n = 1
+    last = len(parts) - 1
+    while n <= last:
+        part = parts[n]
+        if not part:
+            # \\, the next part is plain text; an empty last part is a trailing backslash
+            if n == last:
+                raise StringError("trailing backslash", offset)
+            text.append('\\')
+            text.append(parts[n + 1])
+            offset += len(parts[n + 1]) + 2
+            n += 2
+            continue
+        simple = ESCAPES.get(part[0])
+        if simple is not None:
+            text.append(simple)
+            text.append(part[1:])
+        else:
+            m = ESCAPE.match('\\' + part)
+            try:
+                text.append(_escape(m))
+            except StringError as e:
+                e.offset += offset
+                raise
+            text.append(part[m.end() - 1:])
+        offset += len(part) + 1
+        n += 1
+    return ''.join(text)
+
+# text without placeholders as it is, else a tuple of ('string', text) and ('id', name) segments
+def template(text):
+    start = text.find('${')
+    if start < 0:
+        return text
+    segments = []
+    literal = []
+    position = 0
+    while start >= 0:
+        if start > 0 and text[start - 1] == '$':
+            literal.append(text[position:start - 1] + '${')
+            position = start + 2
+        else:
+            end = text.find('}', start + 2)
+            if end < 0:
+                raise StringError("unterminated placeholder", start)
+            name = text[start + 2:end].strip()
+            if not NAME.match(name):
+                raise StringError("bad placeholder '{}'".format(text[start:end + 1]), start)
+            literal.append(text[position:start])
+            if any(literal):
+                segments.append(('string', ''.join(literal)))
+            literal = []
+            segments.append(('id', name))
+            position = end + 1
+        start = text.find('${', position)
+    literal.append(text[position:])
+    if not segments:
+        return ''.join(literal)
+    if any(literal):
+        segments.append(('string', ''.join(literal)))
+    return tuple(segments)
+
+# text of template() segments with the placeholders written out, ${name}: a Mission name, which
+# isn't evaluated
+def template_text(segments):
+    return ''.join(text if kind == 'string' else '${' + text + '}' for kind, text in segments)
+
+# end file
@@ -0,0 +1,85 @@
+#
+# symbols.py
+#
+# Interned identifiers and string literals. TestLexer passes every ID and STRING value through
+# a SymbolTable, which gives each distinct text a small integer id. Tokens and nodes carry the
+# id, ('id', 3) rather than ('id', 'halite'), and the text is looked up in the table where it is
+# needed: error messages, printed and serialized trees, env keys and string values at run time.
+#
+#     parser = TestParser()
+#     lexer = TestLexer(names=parser.names)
+#     tree = parser.parse(lexer.tokenize(text))
+#     parser.names.text(id) -> name, parser.names.id(name) -> id
+#
+# Lexers and parsers intern in SYMBOLS unless given another table, and the stages after them
+# (interpreter.py, bytecode.py, resolver.py, optimizer.py, printing ...) look ids up in it unless
+# given another one, so the ids of every tree of a process agree. SYMBOLS keeps the text of
+# every name and literal it was given for the life of the process.
+#
+# A node holds the int object the table stores for the id, so a name used a thousand times is
+# one str in the table and one int, whatever the number of nodes. The resolver and compiler key
+# their slots and name pools by id, which hashes as itself.
+#
+# Ids are only meaningful in their table. ast_cache.py and h2c.py store the text and intern it
+# again when loading.
+#
+# intern() may be called from several threads (parse_context.ParserPool): a new text is added
+# under a lock, so two threads interning it at once get the same id. Lookups of known texts
+# don't take the lock.
+#
+
+import threading
+
+# node kinds whose payload is a symbol id
+SYMBOL_KINDS = {'id', 'assign', 'ID', 'string', 'mission'}
+
+# token types whose value is a symbol id, TEMPLATE values are (kind, id) segments
+SYMBOL_TOKENS = {'ID', 'STRING'}
+
+#
+# text -> id, and symbols[id] -> the text
+#
+class SymbolTable(dict):
+
+    def __init__(self):
+        super().__init__()
+        self.symbols = []
+        self.lock = threading.Lock()
+
+    # the id of text, added if new. symbols gets the text before the dict gets its id, a reader
+    # that finds the id also finds the text.
+    def intern(self, text):
+        id = self.get(text)
+        if id is None:
+            with self.lock:
+                id = self.get(text)
+                if id is None:
+                    id = len(self.symbols)
+                    self.symbols.append(text)
+                    self[text] = id
+        return id
+
+    def id(self, text):
+        return self[text]
+
+    def text(self, id):
+        return self.symbols[id]
+
+    # a node value with the text of its symbol, ('id', 3) -> ('id', 'halite')
+    def value_text(self, value):
+        if type(value) is tuple and value[0] in SYMBOL_KINDS:
+            return (value[0], self.symbols[value[1]])
+        return value
+
+    # a token's value with the text of its symbols
+    def token_text(self, token):
+        if token.type in SYMBOL_TOKENS:
+            return self.symbols[token.value]
+        if token.type == 'TEMPLATE':
+            return tuple((kind, self.symbols[id]) for kind, id in token.value)
+        return token.value
+
+# the table of this process, see above
+SYMBOLS = SymbolTable()
+
+# end file
@@ -9,7 +9,11 @@ import ast
 import sys
 from sly import Lexer
 from sly import Parser
+from parse_context import Reentrant
+from stream_lexer import StreamingLexer
+from strings import StringError, decode
 from simple_node import SimpleNode as Node
+from symbols import SYMBOLS
 
 # print a breadcrumb for each(most) productions
 Debug = False
@@ -30,10 +34,10 @@ Show_comments = True
 #
 ####################################
 
-class Lexer(Lexer):
+class Lexer(StreamingLexer, Lexer):
 
     def __init__(self):
-        self.lineno = 0
+        self.lineno = 1
 
     # String containing ignored characters (between tokens)
     ignore = ' \t'
@@ -103,13 +107,16 @@ class Lexer(Lexer):
         token.value = ast.literal_eval(token.value)   # Convert to a numeric value
         return token
 
-    @_(r'\"(\\.|[^"\\])*\"')
     def STRING(self, token):
+        # strings may span lines
+        newlines = token.value.count('\n')
         try:
-            token.value = ast.literal_eval(token.value) # safely eval a string(vs string within a string)
-        except Exception as e:
-            print("{}: {} on line {}, char {}. Context: {}".format(e.__class__.__name__, e.msg, self.lineno, e.offset, e.text))
+            token.value = decode(token.value)
+        except StringError as e:
+            line, column = self.lines.position(token.index)
+            print("StringError: {} on line {}, char {}. Context: {}".format(e, line, column, token.value))
 
+        self.lineno += newlines
         return token
 
     def ID(self, token):
@@ -132,19 +139,10 @@ class Lexer(Lexer):
         token.value = 'ENDLINE'
 #        return token
 
-    # Compute column.
-    #
-    #     text is the input text string
-    #     token is a token instance
-    def find_column(self, text, token):
-        last_cr = self.text.rfind('\n', 0, token.index)
-        if last_cr < 0:
-            last_cr = 0
-        column = (token.index - last_cr)
-        return column
-
+    # line/column come from the line index built by tokenize()/tokenize_stream(), see stream_lexer.py
     def error(self, token):
-        print("Line {}: Bad character '{}' at char {}".format(self.lineno, token.value[0], self.find_column(token.value[0], token)))
+        line, column = self.lines.position(token.index)
+        print("Line {}: Bad character '{}' at char {}".format(line, token.value[0], column))
         self.index += 1
 
 ####################################
@@ -159,7 +157,7 @@ class Lexer(Lexer):
     #
 
 
-class Parser(Parser):
+class Parser(Reentrant, Parser):
     debugfile = 'parser.out'
 
     tokens = Lexer.tokens
@@ -170,15 +168,34 @@ class Parser(Parser):
         ('right', 'UMINUS'),            # Unary minus operator
     )
 
-    def __init__(self):
-        self.names = { }
+    # node_factory builds the tree, e.g. compact_node.Node or compact_node.Arena().node
+    # names is the SymbolTable ID and STRING values are interned in for the nodes, see symbols.py
+    def __init__(self, node_factory=Node, names=None):
+        self.node = node_factory
+        self.names = SYMBOLS if names is None else names
         self.line_start = 0
         self.char_adj = 0
+        self.lines = None
+
+    # lines is the LineIndex used to report error positions, by default the one of tokens (a
+    # TokenStream). The parse runs on a context (parse_context.py) with its own sly position
+    # tables, the parser itself isn't changed.
+    def parse(self, tokens, lines=None):
+        if lines is None:
+            lines = getattr(tokens, 'lines', None)
+        context = self.call_context(lines=lines, line_start=0, char_adj=0, _line_positions={}, _index_positions={})
+        return super(__class__, context).parse(iter(tokens))
+
+    # (line, column) of a token. Without a line index fall back to the offset from the start
+    # of the last statement.
+    def position(self, token):
+        if self.lines is not None:
+            return self.lines.position(token.index)
+        return token.lineno, token.index - self.line_start
 
     def error(self, p):
         if p:
-            # the error char(p.index) will not likely be accurate here so just provide line number
-            print("Syntax error at line {}. Token {}({})".format(p.lineno, p.type, p.value))
+            print("Syntax error at line {}, char {}. Token {}({})".format(*self.position(p), p.type, p.value))
             #self.errok()
         else:
             print("Syntax error at EOF")
@@ -192,10 +209,7 @@ class Parser(Parser):
     #
     @_('statements')
     def code(self, p):
-        if p.statements is None:
-            return []
-        else:
-            return p.statements
+        return p.statements
 
     #
     # statements
@@ -204,23 +218,17 @@ class Parser(Parser):
     # empty statement
     @_('empty')
     def statements(self, p):
-        return None
+        return []
 
-    # left recursive statements
+    # left recursive statements, appended in place so n statements take O(n)
     @_('statements statement')
     def statements(self, p):
-        if p.statements is None and p.statement is None:
-            if Debug: print("statement(None) statement(None)")
-            return None
-        elif p.statement is None:
+        if p.statement is None:
             if Debug : print("statements statement(None)")
-            return [p.statements]
-        elif p.statements is None:
-            if Debug: print("statements(None) statement")
-            return [p.statement]
         else:
             if Debug: print("statements statement")
-            return p.statements + [p.statement]
+            p.statements.append(p.statement)
+        return p.statements
 
     #
     # statement
@@ -240,9 +248,9 @@ class Parser(Parser):
         if Debug: print("assignment")
         self.line_start = p.index
         if hasattr(p, 'expr'):
-            return Node(('='), [Node(('ID', p.ID)), p[2]])
+            return self.node(('='), [self.node(('ID', self.names.intern(p.ID))), p[2]])
         else:
-            return Node(('error', "There was an assignment error at line {}, char {}. Token {}({})".format(p.error.lineno, p.error.index - self.line_start, p.error.type, p.error.value)))
+            return self.node(('error', "There was an assignment error at line {}, char {}. Token {}({})".format(*self.position(p.error), p.error.type, p.error.value)))
 
     # print statement
     @_('PRINT LPAREN expr RPAREN',
@@ -251,9 +259,9 @@ class Parser(Parser):
         if Debug: print("print")
         self.line_start = p.index
         if hasattr(p, 'expr'):
-            return Node(('print'), [p[2]])
+            return self.node(('print'), [p[2]])
         else:
-            return Node(('error', "There was a print error at line {}, char {}. Token {}({})".format(p.error.lineno, p.error.index - self.line_start, p.error.type, p.error.value)))
+            return self.node(('error', "There was a print error at line {}, char {}. Token {}({})".format(*self.position(p.error), p.error.type, p.error.value)))
 
     #
     # expr
@@ -266,28 +274,28 @@ class Parser(Parser):
 
     @_('MINUS expr %prec UMINUS')
     def expr(self, p):
-        return Node('uminus', [p.expr])
+        return self.node('uminus', [p.expr])
 
     # expr
     @_('NUMBER')
     def expr(self, p):
         if Debug: print("NUMBER" , p.NUMBER)
-        return Node(('number', p.NUMBER))
+        return self.node(('number', p.NUMBER))
 
     @_('BOOL')
     def expr(self, p):
         if Debug: print("BOOL" , p.BOOL)
-        return Node(('bool', p.BOOL))
+        return self.node(('bool', p.BOOL))
 
     @_('ID')
     def expr(self, p):
         if Debug: print("ID" , p.ID)
-        return Node(('id', p.ID))
+        return self.node(('id', self.names.intern(p.ID)))
 
     @_('STRING')
     def expr(self, p):
         if Debug: print("STRING" , p.STRING)
-        return Node(('string', p.STRING))
+        return self.node(('string', self.names.intern(p.STRING)))
 
     @_('expr PLUS expr',
        'expr MINUS expr',
@@ -295,7 +303,7 @@ class Parser(Parser):
        'expr DIVIDE expr')  # 'expr error expr' cause 5 s/r conflicts
     def expr(self, p):
         if Debug: print("expr", p[1] , "expr")
-        return Node(p[1], [p.expr0, p.expr1])
+        return self.node(p[1], [p.expr0, p.expr1])
 
     #
     # empty
@@ -306,21 +314,21 @@ class Parser(Parser):
         pass
 
 #
-# Parse input text and print syntax tree
+# Parse input text (a string or an iterable of chunks/lines) and print syntax tree
 #
 def parse_input(results):
     lexer = Lexer()
     parser = Parser()
 
     if Tokenize_only:
-        for tok in lexer.tokenize(results):
+        for tok in lexer.tokenize_stream(results):
             if not Show_endlines and tok.type == 'ENDLINE':
                 continue
             if not Show_comments and tok.type == 'COMMENT':
                 continue
             print('type=%r, value=%r' % (tok.type, tok.value))
     else:
-        results = parser.parse(lexer.tokenize(results))
+        results = parser.parse(lexer.tokenize_stream(results))
         if (results is None) or (isinstance(results, list) and len(results) == 0):
             print('No statements')
         elif isinstance(results, list) and isinstance(results[0], Node):
@@ -340,11 +348,7 @@ def main():
 
     if len(sys.argv) > 1:
         with fileinput.input() as f:
-            lines = []
-            for line in f:
-                lines.append(line)
-            #parse_input(''.join(lines).strip())
-            parse_input(''.join(lines))
+            parse_input(f)
     else:
         print("Interactive mode. Ctrl-D to exit.")
         while True:
@@ -7,14 +7,22 @@ import sys
 import ast
 
 from sly import Lexer
+from stream_lexer import StreamingLexer
+from strings import StringError, decode, template
+from symbols import SYMBOLS
 
 Show_endlines = False
 Show_comments = False
 
-class TestLexer(Lexer):
+class TestLexer(StreamingLexer, Lexer):
 
-    def __init__(self):
-        self.lineno = 0
+    # report(line, column, message) receives error messages instead of them being printed
+    # names is the SymbolTable ID and STRING values are interned in, e.g. TestParser's names;
+    # their tokens carry the ids, see symbols.py
+    def __init__(self, report=None, names=None):
+        self.lineno = 1
+        self.report = report
+        self.names = SYMBOLS if names is None else names
 
     # String containing ignored characters (between tokens)
     ignore = ' \t'
@@ -30,6 +38,7 @@ class TestLexer(Lexer):
         'ID',
         'NUMBER',
         'STRING',
+        'TEMPLATE',                             # see STRING below
         'PLUS',
         'MINUS',
         'TIMES',
@@ -89,13 +98,25 @@ class TestLexer(Lexer):
         token.value = int(token.value)   # Convert to a numeric value
         return token
 
-    @_(r'\"(\\.|[^"\\])*\"')
+    # strings with ${name} placeholders become TEMPLATE tokens, their value a tuple of segments
     def STRING(self, token):
+        # strings may span lines
+        newlines = token.value.count('\n')
         try:
-            token.value = ast.literal_eval(token.value) # Convert to an actual string vs string-in-a-string
-        except Exception as e:
-            print("{}: {} on line {}, char {}. Context: {}".format(e.__class__.__name__, e.msg, self.lineno, e.offset, e.text))
+            value = template(decode(token.value))
+        except StringError as e:
+            line, column = self.lines.position(token.index)
+            self.report_error(line, column, "StringError: {} on line {}, char {}. Context: {}".format(e, line, column, token.value))
+            token.value = self.names.intern(token.value)
+        else:
+            intern = self.names.intern
+            if isinstance(value, tuple):
+                token.type = 'TEMPLATE'
+                token.value = tuple((kind, intern(text)) for kind, text in value)
+            else:
+                token.value = intern(value)
 
+        self.lineno += newlines
         return token
 
     def ID(self, token):
@@ -109,19 +130,10 @@ class TestLexer(Lexer):
                 token.type = 'BLOCK_END'
             else:
                 token.type = token.value.upper()
+        else:
+            token.value = self.names.intern(token.value)
         return token
 
-    # Compute column.
-    #
-    #     text is the input text string
-    #     token is a token instance
-    def find_column(self, text, token):
-        last_cr = self.text.rfind('\n', 0, token.index)
-        if last_cr < 0:
-            last_cr = 0
-        column = (token.index - last_cr)
-        return column
-
     # Define a rule so we can track line numbers
     @_(r'\n')
     def ENDLINE(self, token):
@@ -129,29 +141,33 @@ class TestLexer(Lexer):
         token.value = 'ENDLINE'
         return token
 
+    # line/column come from the line index built by tokenize()/tokenize_stream(), see stream_lexer.py
     def error(self, token):
-        print("Line {}: Bad character '{}' at char {}".format(self.lineno, token.value[0], self.find_column(token.value[0], token)))
+        line, column = self.lines.position(token.index)
+        self.report_error(line, column, "Line {}: Bad character '{}' at char {}".format(line, token.value[0], column))
         self.index += 1
 
+    def report_error(self, line, column, message):
+        if self.report is None:
+            print(message)
+        else:
+            self.report(line, column, message)
+
 def main():
     import fileinput
 
     lexer = TestLexer()
 
     if len(sys.argv) > 1:
-        lines = []
         with fileinput.input() as f:
-            for line in f:
-                lines.append(line)
-
-            for tok in lexer.tokenize(''.join(lines)):
+            for tok in lexer.tokenize_stream(f):
                 if not Show_endlines and tok.type == 'ENDLINE':
                     continue
 
                 if not Show_comments and tok.type == 'COMMENT':
                     continue
 
-                print('type=%r, value=%r' % (tok.type, tok.value))
+                print('type=%r, value=%r' % (tok.type, lexer.names.token_text(tok)))
     else:
         while True:
             try:
@@ -163,7 +179,7 @@ def main():
                     if not Show_comments and tok.type == 'COMMENT':
                         continue
 
-                    print('type=%r, value=%r' % (tok.type, tok.value))
+                    print('type=%r, value=%r' % (tok.type, lexer.names.token_text(tok)))
             except EOFError:
                 break
 
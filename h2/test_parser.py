@@ -6,8 +6,11 @@
 import sys
 
 from sly import Parser
+from parse_context import Reentrant
 from test_lexer import TestLexer
 from simple_node import SimpleNode as node
+from strings import template_text
+from symbols import SYMBOLS
 
 #class node(object):
 #    def __init__(self, value, children = []):
@@ -23,7 +26,7 @@ from simple_node import SimpleNode as node
 #    def __repr__(self):
 #        return '<tree node representation>'
 
-class TestParser(Parser):
+class TestParser(Reentrant, Parser):
     debugfile = 'parser.out'
 
     tokens = TestLexer.tokens
@@ -35,26 +38,53 @@ class TestParser(Parser):
         ('right', 'NOT'),
     )
 
-    def __init__(self):
-        self.names = { }
+    # node_factory builds the tree, e.g. compact_node.Node or compact_node.Arena().node
+    # report(line, column, message) receives error messages instead of them being printed
+    # names is the SymbolTable of the lexer's ID and STRING ids, see symbols.py
+    def __init__(self, node_factory=node, report=None, names=None):
+        self.node = node_factory
+        self.report = report
+        self.names = SYMBOLS if names is None else names
         self.line_start = 0
         self.char_adj = 0
+        self.lines = None
+
+    # lines is the LineIndex used to report error positions, by default the one of tokens (a
+    # TokenStream). The parse runs on a context (parse_context.py) with its own sly position
+    # tables, the parser itself isn't changed.
+    def parse(self, tokens, lines=None):
+        if lines is None:
+            lines = getattr(tokens, 'lines', None)
+        context = self.call_context(lines=lines, line_start=0, char_adj=0, _line_positions={}, _index_positions={})
+        return super(__class__, context).parse(iter(tokens))
+
+    # (line, column) of a token. Without a line index fall back to the offset from the start
+    # of the last statement.
+    def position(self, token):
+        if self.lines is not None:
+            return self.lines.position(token.index)
+        return token.lineno, token.index - self.line_start
 
     def error(self, p):
         if p:
-            # the error char(p.index) will not likely be accurate here so just provide line number
-            print("Syntax error at line {}. Token {}({})".format(p.lineno, p.type, p.value))
+            line, column = self.position(p)
+            self.report_error(line, column, "Syntax error at line {}, char {}. Token {}({})".format(line, column, p.type, self.names.token_text(p)))
             #self.errok()
         else:
-            print("Syntax error at EOF")
+            self.report_error(None, None, "Syntax error at EOF")
 
-    # code
+    # line and column are None for errors at the end of the input
+    def report_error(self, line, column, message):
+        if self.report is None:
+            print(message)
+        else:
+            self.report(line, column, message)
+
+    # code, a flat node with the top level statements as children
     @_('statements')
     def code(self, p):
-        if p.statements is None:
-            pass
-        else:
-            return node('code', [p.statements])
+        if p.statements:
+            return self.node('code', p.statements)
 
     # code
 #    @_('BLOCK_BEGIN statements BLOCK_END')
@@ -81,25 +111,20 @@ class TestParser(Parser):
 #        else:
 #            return node('statements', [p.statements, node('statement', [p.statement])])
 
-    # statements
+    # statements, a list appended to in place. Comments and blank lines (None) are dropped.
     @_('statement')
     def statements(self, p):
         if p.statement is None:
-            node('code')
+            return []
         else:
-            return node('code', [p.statement])
+            return [p.statement]
 
     # statements
     @_('statements statement')
     def statements(self, p):
-        if p.statements is None and p.statement is None:
-            return None
-        elif p.statement is None:
-            return node('statements', [p.statements])
-        elif p.statements is None:
-            return node('statements', [node('statement', [p.statement])])
-        else:
-            return node('statements', [p.statements, node('statement', [p.statement])])
+        if p.statement is not None:
+            p.statements.append(p.statement)
+        return p.statements
 
 #    @_('statement',
 #       'error')
@@ -116,7 +141,7 @@ class TestParser(Parser):
 #                return node('statement', [p.statement])
 #        else:
 #            self.line_start = p.error.index
-#            return node(('error', "There was statement error at line {}, char {}. Token {}({})".format(p.error.lineno, p.error.index - self.line_start, p.error.type, p.error.value)))
+#            return node(('error', "There was statement error at line {}, char {}. Token {}({})".format(*self.position(p.error), p.error.type, p.error.value)))
 
     # statement
     @_('ID ASSIGN expr',
@@ -126,11 +151,11 @@ class TestParser(Parser):
         self.line_start = p.index
         #return node(('assign', p.ID), [p[2]])
         if hasattr(p, 'expr'):
-            return node(('assign', p.ID), [p[2]])
+            return self.node(('assign', p.ID), [p[2]])
         elif hasattr(p, 'bexpr'):
-            return node(('assign', p.ID), [p[2]])
+            return self.node(('assign', p.ID), [p[2]])
         else:
-            return node(('error', "There was an assignment error at line {}, char {}. Token {}({})".format(p.error.lineno, p.error.index - self.line_start, p.error.type, p.error.value)))
+            return self.node(('error', "There was an assignment error at line {}, char {}. Token {}({})".format(*self.position(p.error), p.error.type, self.names.token_text(p.error))))
 
     @_('PRINT LPAREN expr RPAREN',
        'PRINT LPAREN error RPAREN',
@@ -139,11 +164,11 @@ class TestParser(Parser):
         self.line_start = p.index
         #return node('print', [p[2]])
         if hasattr(p, 'expr'):
-            return node(('print'), [p[2]])
+            return self.node(('print'), [p[2]])
         elif hasattr(p, 'bexpr'):
-            return node(('print'), [p[2]])
+            return self.node(('print'), [p[2]])
         else:
-            return node(('error', "There was a print error at line {}, char {}. Token {}({})".format(p.error.lineno, p.error.index - self.line_start, p.error.type, p.error.value)))
+            return self.node(('error', "There was a print error at line {}, char {}. Token {}({})".format(*self.position(p.error), p.error.type, self.names.token_text(p.error))))
 
     @_('COMMENT')
     def statement(self, p):
@@ -151,44 +176,55 @@ class TestParser(Parser):
         self.line_start = p.index
         return None
 
-    @_('MISSION LPAREN STRING RPAREN codeblock')
+    # a name with placeholders is its text as written, Mission("run ${n}") is named 'run ${n}'
+    @_('MISSION LPAREN STRING RPAREN codeblock',
+       'MISSION LPAREN TEMPLATE RPAREN codeblock')
     def statement(self, p):
         self.line_start = p.index
-        return node(('mission', p.STRING), [p.codeblock])
+        if hasattr(p, 'STRING'):
+            return self.node(('mission', p.STRING), [p.codeblock])
+        else:
+            text = template_text((kind, self.names.text(id)) for kind, id in p.TEMPLATE)
+            return self.node(('mission', self.names.intern(text)), [p.codeblock])
 
     # codeblock
     @_('BLOCK_BEGIN statements BLOCK_END')
     def codeblock(self, p):
-        return node('codeblock', [p.statements])
+        return self.node('codeblock', p.statements)
 
     # expr
     @_('NUMBER')
     def expr(self, p):
-        return node(('number', p.NUMBER))
+        return self.node(('number', p.NUMBER))
 
     @_('BOOL')
     def expr(self, p):
-        return node(('bool', p.BOOL))
+        return self.node(('bool', p.BOOL))
 
     @_('ID')
     def expr(self, p):
-        return node(('id', p.ID))
+        return self.node(('id', p.ID))
 
     @_('STRING')
     def expr(self, p):
-        return node(('string', p.STRING))
+        return self.node(('string', p.STRING))
+
+    # "... ${name} ...", literal and identifier segments compiled by the lexer, see strings.py
+    @_('TEMPLATE')
+    def expr(self, p):
+        return self.node('template', [self.node(segment) for segment in p.TEMPLATE])
 
     @_('expr PLUS expr',
        'expr MINUS expr',
        'expr TIMES expr',
        'expr DIVIDE expr')  # 'expr error expr' cause 5 s/r conflicts
     def expr(self, p):
-        return node(p[1], [p.expr0, p.expr1])
+        return self.node(p[1], [p.expr0, p.expr1])
 #        if hasattr(p, 'expr'):
 #            return node(p[1], [p.expr0, p.expr1])
 #        else:
 #            print("{}".format(list(self.tokens)[0:4]))
-#            return node(('error', "There was an operator error at line {}, char {}. Token {}({})".format(p.error.lineno, p.error.index - self.line_start, p.error.type, p.error.value)))
+#            return node(('error', "There was an operator error at line {}, char {}. Token {}({})".format(*self.position(p.error), p.error.type, p.error.value)))
 
     @_('LPAREN expr RPAREN',
        'LPAREN error RPAREN') # 'LPAREN error RPAREN'
@@ -197,12 +233,12 @@ class TestParser(Parser):
         if hasattr(p, 'expr'):
             return p[1]
         else:
-            return node(('error', "There was an operator error at line {}, char {}. Token {}({})".format(p.error.lineno, p.error.index - self.line_start - self.char_adj, p.error.type, p.error.value)))
+            return self.node(('error', "There was an operator error at line {}, char {}. Token {}({})".format(*self.position(p.error), p.error.type, self.names.token_text(p.error))))
 
 
     @_('MINUS expr %prec UMINUS')
     def expr(self, p):
-        return node('uminus', [p.expr])
+        return self.node('uminus', [p.expr])
 
     # bexpr
     @_('expr EQ expr',
@@ -211,12 +247,16 @@ class TestParser(Parser):
        'expr GE expr',
        'expr LE expr')
     def bexpr(self, p):
-        return node(p[1], [p.expr0, p.expr1])
+        return self.node(p[1], [p.expr0, p.expr1])
 
     @_('LPAREN bexpr RPAREN')
     def bexpr(self, p):
         return p[1]
 
+    @_('NOT bexpr')
+    def bexpr(self, p):
+        return self.node('not', [p.bexpr])
+
     @_('ENDLINE')
     def statement(self, p):
         self.char_adj += 1
@@ -231,13 +271,9 @@ def main():
 
     if len(sys.argv) > 1:
         with fileinput.input() as f:
-            lines = []
-            for line in f:
-                lines.append(line)
-
 #            while True:
 #                try:
-            result = parser.parse(lexer.tokenize(''.join(lines)))
+            result = parser.parse(lexer.tokenize_stream(f))
             print("{}".format(result))
 #                except EOFError:
 #                    break
@@ -0,0 +1,23 @@
+#
+# tests
+#
+# Unit tests of the lexer/parser tooling, run from the h2 directory:
+#
+#     python -m unittest discover -s tests -t .
+#
+# The modules import the h2 modules by their plain names as the benchmarks do, and are named so
+# as not to shadow the grammar modules (test_parser.py, test_lexer.py, ...).
+#
+
+built = False
+
+# (re)build the *_tab.py modules for the current grammar once per run, they aren't in git
+def build_tables():
+    global built
+    if not built:
+        import parser_compiler
+        for spec in parser_compiler.DEFAULT_SPECS:
+            parser_compiler.build(spec)
+        built = True
+
+# end file
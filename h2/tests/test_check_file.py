@@ -0,0 +1,59 @@
+#
+# tests/test_check_file.py
+#
+# h2.check_file() gives the same statements and errors whether a file is read as text or lexed
+# from an mmap of it (mmap_threshold None or 0): '\r\n' and '\r' line ends, non-ASCII strings and
+# bad characters, a byte order mark.
+#
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import h2
+from mmap_lexer import same_as_text
+
+TEXTS = [
+    'x = 1\r\nPrint(x)\r\n',
+    'x = 1\rPrint(x)\r',
+    'x = 1\r\ny = = 2\r\nPrint(x) @\r\n',
+    'x = "a\r\nb"\nPrint(x)\n',
+    'x = "é€😀"\ny = 1 é\nPrint(x)\n',
+    'Mission("ça") Do\r\n    Print("ü")\r\nDone\r\n',
+    '﻿x = 1\n',
+]
+
+class CheckFileTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.threshold = h2.mmap_threshold
+
+    def tearDown(self):
+        h2.mmap_threshold = self.threshold
+        shutil.rmtree(self.directory)
+
+    def test_text_and_mapped(self):
+        path = os.path.join(self.directory, 'script.h2')
+        for n, text in enumerate(TEXTS):
+            with open(path, 'wb') as f:
+                f.write(text.encode('utf-8'))
+            results = []
+            for threshold in (None, 0):
+                h2.mmap_threshold = threshold
+                result, = h2.check_file(path)
+                results.append((result.statements, result.errors))
+            with self.subTest(text=n):
+                self.assertEqual(results[1], results[0])
+
+    def test_same_as_text(self):
+        self.assertTrue(same_as_text(b''))
+        self.assertTrue(same_as_text('x = "é"\n'.encode('utf-8')))
+        self.assertFalse(same_as_text(b'x = 1\r\n'))
+        self.assertFalse(same_as_text(b'x = 1\rPrint(x)'))
+
+if __name__ == '__main__':
+    unittest.main()
+
+# end file
@@ -0,0 +1,90 @@
+#
+# tests/test_fast_lexer.py
+#
+# FastLexer against the lexers it is built from, sly and generated: the same (type, value,
+# lineno, index) tokens, printed errors and exceptions on the edge cases and generated corpora of
+# bench/fast_lexer.py, the same parse trees, and reserved words resolved as the ID callback does
+# (other identifiers interned to symbol ids).
+#
+
+import unittest
+
+from ast_cache import flatten
+from bench.corpus import generate
+from bench.fast_lexer import EDGE_CASES, tokens
+from fast_lexer import FastLexer
+from tests import build_tables
+
+def corpus():
+    texts = []
+    for seed in range(10):
+        text = generate(200, depth=4, strings=0.3, comments=0.2, missions=0.1, nesting=2, errors=0.05, seed=seed)
+        texts.append(text)
+        # random corruption: drop a quote, add stray characters
+        texts.append(text.replace('"', '', 1).replace('+', '@', 3))
+    return texts
+
+class FastLexerTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        build_tables()
+        import test_left_recursive
+        import test_lexer
+        import test_lexer_tab
+        import test_parser
+
+        # name, lexer class, FastLexer values
+        cls.engines = [
+            ('TestLexer', test_lexer.TestLexer, {'NUMBER': int}),
+            ('TestLexer tab', test_lexer_tab.TestLexer, {'NUMBER': int}),
+            ('Lexer', test_left_recursive.Lexer, {}),
+        ]
+        cls.Lexer = test_lexer.TestLexer
+        cls.Parser = test_parser.TestParser
+
+    def assertSameTokens(self, texts):
+        for name, Lexer, values in self.engines:
+            fast = FastLexer(Lexer(), values)
+            for n, text in enumerate(texts):
+                with self.subTest(engine=name, text=n):
+                    self.assertEqual(tokens(fast.tokenize, text), tokens(Lexer().tokenize, text))
+
+    def test_edge_cases(self):
+        self.assertSameTokens(EDGE_CASES)
+
+    def test_corpus(self):
+        self.assertSameTokens(corpus())
+
+    def test_reserved_words(self):
+        text = 'Done Doner Do Dot Print Prints Mission Missions True True_ False1 Not Nothing'
+        expected = [('BLOCK_END', 'Done'), ('ID', 'Doner'), ('BLOCK_BEGIN', 'Do'), ('ID', 'Dot'),
+                    ('PRINT', 'Print'), ('ID', 'Prints'), ('MISSION', 'Mission'), ('ID', 'Missions'),
+                    ('BOOL', True), ('ID', 'True_'), ('ID', 'False1'), ('NOT', 'Not'), ('ID', 'Nothing')]
+        for name, Lexer, values in self.engines[:2]:
+            with self.subTest(engine=name):
+                lexer = Lexer()
+                found = [(tok.type, lexer.names.token_text(tok)) for tok in FastLexer(lexer, values).tokenize(text)]
+                self.assertEqual(found, expected)
+
+    def test_parse(self):
+        for n, text in enumerate(corpus()):
+            with self.subTest(text=n):
+                results = []
+                for fast in (False, True):
+                    errors = []
+
+                    def report(line, column, message):
+                        errors.append((line, column, message))
+
+                    parser = self.Parser(report=report)
+                    lexer = self.Lexer(report=report, names=parser.names)
+                    if fast:
+                        lexer = FastLexer(lexer, {'NUMBER': int})
+                    results.append((flatten(parser.parse(lexer.tokenize(text))), errors))
+                self.assertEqual(results[1], results[0])
+
+if __name__ == '__main__':
+    unittest.main()
+
+# end file
@@ -0,0 +1,95 @@
+#
+# tests/test_h2c.py
+#
+# Compiled files with corrupt child and sibling links: walking a tree, lazily or with tree(),
+# raises H2CError instead of looping or leaving the tree.
+#
+
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+
+from ast_cache import flatten
+from h2c import NODE, H2CError, H2CFile, Writer
+from test_lexer import TestLexer
+from test_parser import TestParser
+from traversal import preorder
+
+SCRIPTS = {
+    'first': 'a = 1 + 2\nPrint(a)\nb = 3\n',
+    'second': 'c = 4\n',
+}
+
+def parse(text):
+    return TestParser().parse(TestLexer().tokenize(text))
+
+# every node of a LazyNode tree, through children()
+def walk(tree):
+    return [node.value for node, depth in preorder(tree)]
+
+class H2CTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'scripts.h2c')
+        writer = Writer()
+        for name, text in sorted(SCRIPTS.items()):
+            writer.add(name, parse(text))
+        self.data = bytearray(writer.to_bytes())
+        self.write(self.data)
+        with H2CFile(self.path) as h2c:
+            self.nodes_offset = h2c.nodes_offset
+            self.roots = dict(h2c.roots)
+            self.expected = flatten(h2c.tree('first'))
+            self.children = h2c.children(self.roots['first'])
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, data):
+        with open(self.path, 'wb') as f:
+            f.write(data)
+
+    # a copy of the file with node n's next sibling set to sibling
+    def corrupt(self, n, sibling):
+        data = bytearray(self.data)
+        offset = self.nodes_offset + n * NODE.size
+        kind, payload, child, next_sibling = NODE.unpack_from(data, offset)
+        NODE.pack_into(data, offset, kind, payload, child, sibling)
+        self.write(data)
+
+    def assertCorrupt(self):
+        with H2CFile(self.path) as h2c:
+            with self.assertRaises(H2CError):
+                walk(h2c.root('first'))
+            with self.assertRaises(H2CError):
+                h2c.tree('first')
+
+    def test_intact(self):
+        self.assertEqual(len(self.children), 3)
+        with H2CFile(self.path) as h2c:
+            self.assertEqual(flatten(h2c.root('first')), self.expected)
+            self.assertEqual(len(walk(h2c.root('second'))), len(flatten(h2c.tree('second'))) // 2)
+
+    def test_sibling_loop(self):
+        # the last statement's sibling is the first one again, and itself
+        for sibling in (self.children[0], self.children[-1]):
+            with self.subTest(sibling=sibling):
+                self.corrupt(self.children[-1], sibling)
+                self.assertCorrupt()
+
+    def test_sibling_outside_tree(self):
+        # into the next tree, past the last node
+        with H2CFile(self.path) as h2c:
+            count = len(h2c)
+        for sibling in (self.roots['second'], count + 10):
+            with self.subTest(sibling=sibling):
+                self.corrupt(self.children[0], sibling)
+                self.assertCorrupt()
+
+if __name__ == '__main__':
+    unittest.main()
+
+# end file
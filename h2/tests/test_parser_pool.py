@@ -0,0 +1,140 @@
+#
+# tests/test_parser_pool.py
+#
+# Parsing from many threads on one shared lexer/parser, through a ParserPool and by calling the
+# shared pair directly, gives what parsing each text serially on a new pair gives: trees, errors,
+# the tokens with their (line, column), and for the sly parser each node's line_position(),
+# index_position() and h2c line. The thread switch interval is made tiny so parses interleave
+# within productions.
+#
+
+import sys
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from ast_cache import flatten
+from bench.corpus import generate
+from h2c import parser_lines
+from parse_context import ParserPool
+from tests import build_tables
+from traversal import preorder
+
+TEXTS = 48
+THREADS = 8
+SIZE = 4
+
+# what a parse gives on a parser context: positions are those of its last parse
+def result(tree, errors, tokens, parser, lexer):
+    line = parser_lines(parser, parser.lines)
+    nodes = []
+    for node, depth in preorder(tree):
+        try:
+            positions = parser.line_position(node), parser.index_position(node)
+        except (AttributeError, KeyError):
+            positions = None
+        nodes.append((depth, positions, line(node)))
+    token_list = [(tok.type, tok.value, tok.lineno, tok.index) + lexer.lines.position(tok.index) for tok in tokens]
+    return flatten(tree), list(errors), token_list, nodes
+
+# result() of a text on a new pair
+def serial(text, Lexer, Parser):
+    errors = []
+
+    def report(line, column, message):
+        errors.append((line, column, message))
+
+    parser = Parser(report=report)
+    lexer = Lexer(report=report, names=parser.names)
+    tokens = list(lexer.context(report=lambda *error: None).tokenize(text))
+    lexer = lexer.context(report=report)
+    context = parser.context(report=report)
+    tree = context.parse(lexer.tokenize(text))
+    return result(tree, errors, tokens, context, lexer)
+
+class ParserPoolTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        build_tables()
+        import test_lexer
+        import test_lexer_tab
+        import test_parser
+        import test_parser_tab
+
+        cls.texts = [generate(20 + n % 7 * 30, depth=3, missions=0.1, errors=0.1, seed=n) for n in range(TEXTS)]
+        cls.grammars = [('sly', test_lexer.TestLexer, test_parser.TestParser),
+                        ('tab', test_lexer_tab.TestLexer, test_parser_tab.TestParser)]
+
+    def setUp(self):
+        self.interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+
+    def tearDown(self):
+        sys.setswitchinterval(self.interval)
+
+    # the shared instances hold no parse state
+    def assertUntouched(self, lexer, parser):
+        self.assertIsNone(parser.lines)
+        self.assertEqual((parser.line_start, parser.char_adj), (0, 0))
+        self.assertFalse(hasattr(parser, 'statestack'))
+        self.assertNotIn('_index_positions', vars(parser))
+        self.assertNotIn('_line_positions', vars(parser))
+        self.assertFalse(hasattr(lexer, 'text'))
+        self.assertIsNone(lexer.lines)
+
+    def test_pool(self):
+        for name, Lexer, Parser in self.grammars:
+            expected = [serial(text, Lexer, Parser) for text in self.texts]
+            self.assertTrue(any(errors for tree, errors, tokens, nodes in expected))
+            if name == 'sly':
+                self.assertTrue(all(positions and line for tree, errors, tokens, nodes in expected
+                                    for depth, positions, line in nodes))
+
+            parser = Parser()
+            pool = ParserPool(SIZE, Lexer(names=parser.names), parser)
+            busy = [0, 0]                     # contexts out now, most out at once
+            lock = threading.Lock()
+
+            def parse(text):
+                with pool.context() as context:
+                    with lock:
+                        busy[0] += 1
+                        busy[1] = max(busy)
+                    tokens, token_errors = context.tokenize(text)
+                    tree, errors = context.parse(text)
+                    found = result(tree, errors, tokens, context.parser, context.lexer)
+                    with lock:
+                        busy[0] -= 1
+                    return found
+
+            with ThreadPoolExecutor(THREADS) as executor:
+                results = list(executor.map(parse, self.texts))
+            for n, (found, serial_result) in enumerate(zip(results, expected)):
+                with self.subTest(grammar=name, text=n):
+                    self.assertEqual(found, serial_result)
+            self.assertTrue(1 <= busy[1] <= SIZE, busy)
+            self.assertEqual(pool.free.qsize(), SIZE)
+            self.assertUntouched(pool.lexer, pool.parser)
+
+    def test_shared(self):
+        for name, Lexer, Parser in self.grammars:
+            expected = [serial(text, Lexer, Parser)[0] for text in self.texts]
+            parser = Parser(report=lambda *error: None)
+            lexer = Lexer(report=lambda *error: None, names=parser.names)
+
+            # parse() and tokenize() called on the instances run on new contexts of them
+            def parse(text):
+                return flatten(parser.parse(lexer.tokenize(text)))
+
+            with ThreadPoolExecutor(THREADS) as executor:
+                trees = list(executor.map(parse, self.texts))
+            for n, (tree, serial_tree) in enumerate(zip(trees, expected)):
+                with self.subTest(grammar=name, text=n):
+                    self.assertEqual(tree, serial_tree)
+            self.assertUntouched(lexer, parser)
+
+if __name__ == '__main__':
+    unittest.main()
+
+# end file
@@ -0,0 +1,164 @@
+#
+# tests/test_scheduler.py
+#
+# Scheduler on a FakeClock: the order tasks run in, the deadline and quotas, resuming next turn,
+# errors, missions of the same name, and the time reported per mission and per turn.
+#
+
+import unittest
+
+from scheduler import DEADLINE, DONE, ERROR, QUOTA, TOP, WAITING, FakeClock, Scheduler, SchedulerError
+from test_lexer import TestLexer
+from test_parser import TestParser
+
+SCRIPT = '''
+a = 1
+Mission("slow") Do
+    s1 = 1
+    s2 = 2
+    s3 = 3
+    Print("slow done")
+Done
+Mission("fast") Do
+    Print("fast")
+Done
+Mission("bad") Do
+    Print(nothing)
+Done
+'''
+
+PAIR_SCRIPT = '''
+Mission("a") Do
+    Print("a1")
+    Print("a2")
+Done
+Mission("b") Do
+    Print("b1")
+    Print("b2")
+Done
+'''
+
+TWIN_SCRIPT = '''
+Mission("a") Do
+    Print("a1")
+Done
+Mission("b") Do
+    Print("b1")
+Done
+Mission("a") Do
+    Print("a2")
+    Print("a2 again")
+    Print("a2 done")
+Done
+'''
+
+def parse(text):
+    return TestParser().parse(TestLexer().tokenize(text))
+
+def states(report):
+    return dict((name, mission.state) for name, mission in report.missions.items())
+
+class SchedulerTest(unittest.TestCase):
+
+    # a scheduler of text where every statement takes step seconds, and what it printed
+    def scheduler(self, text, budget, step=1.0, **options):
+        output = []
+        scheduler = Scheduler({}, output.append, budget=budget, clock=FakeClock(step=step))
+        scheduler.load(parse(text), **options)
+        return scheduler, output
+
+    def test_order(self):
+        scheduler, output = self.scheduler(SCRIPT, 4, priorities={'fast': 1})
+        report = scheduler.turn()
+        # TOP first, then fast, then slow and bad in script order
+        self.assertEqual(list(report.missions), [TOP, 'fast', 'slow', 'bad'])
+        self.assertEqual(states(report), {TOP: DONE, 'fast': DONE, 'slow': DEADLINE, 'bad': ERROR})
+        self.assertEqual(output, ['fast'])
+
+    def test_equal_priorities_take_turns(self):
+        scheduler, output = self.scheduler(PAIR_SCRIPT, 100)
+        scheduler.turn()
+        self.assertEqual(output, ['a1', 'b1', 'a2', 'b2'])
+
+    def test_resume(self):
+        scheduler, output = self.scheduler(SCRIPT, 4, priorities={'fast': 1})
+        report = scheduler.turn()
+        self.assertEqual(report.suspended(), ['slow'])
+        self.assertEqual(scheduler.env, {'a': 1, 's1': 1})
+
+        # a statement of slow a turn: it finishes on the fourth and starts over on the fifth
+        scheduler.turn()
+        self.assertEqual(scheduler.env, {'a': 1, 's1': 1, 's2': 2})
+        scheduler.turn()
+        report = scheduler.turn()
+        self.assertEqual(states(report)['slow'], DONE)
+        self.assertEqual(output, ['fast'] * 4 + ['slow done'])
+        scheduler.env.clear()
+        scheduler.turn()
+        self.assertEqual(scheduler.env, {'a': 1, 's1': 1})
+
+    def test_quota(self):
+        scheduler, output = self.scheduler(SCRIPT, 100, quotas={'slow': 1.5})
+        report = scheduler.turn()
+        self.assertEqual(states(report)['slow'], QUOTA)
+        self.assertEqual(report.missions['slow'].statements, 2)
+        self.assertEqual(report.missions['slow'].used, 2.0)
+        self.assertEqual(report.suspended(), ['slow'])
+
+        # the quota is per turn
+        report = scheduler.turn()
+        self.assertEqual(report.missions['slow'].statements, 2)
+        self.assertEqual(states(report)['slow'], DONE)
+
+    def test_deadline_before_running(self):
+        scheduler, output = self.scheduler(SCRIPT, 0)
+        report = scheduler.turn()
+        self.assertEqual(set(states(report).values()), {WAITING})
+        self.assertEqual(report.suspended(), [])
+        self.assertEqual(report.used, 0.0)
+
+    def test_error(self):
+        scheduler, output = self.scheduler(SCRIPT, 100)
+        for turn in range(2):
+            report = scheduler.turn()
+            self.assertEqual(states(report)['bad'], ERROR)
+            self.assertEqual(report.missions['bad'].error, "Undefined variable 'nothing'")
+            self.assertEqual(states(report)['slow'], DONE)
+
+    def test_budget_used(self):
+        scheduler, output = self.scheduler(SCRIPT, 4, step=0.25, priorities={'fast': 1})
+        report = scheduler.turn()
+        # all 7 statements fit in 1.75 s
+        self.assertEqual(report.used, 1.75)
+        self.assertEqual(dict((name, mission.used) for name, mission in report.missions.items()),
+                         {TOP: 0.25, 'fast': 0.25, 'slow': 1.0, 'bad': 0.25})
+        self.assertEqual(report.overrun(), 0.0)
+
+        # a statement started before the deadline runs to its end
+        scheduler, output = self.scheduler(SCRIPT, 4, step=3.0)
+        report = scheduler.turn()
+        self.assertEqual(report.used, 6.0)
+        self.assertEqual(report.overrun(), 2.0)
+        self.assertEqual(sum(mission.statements for mission in report.missions.values()), 2)
+
+    def test_same_name(self):
+        scheduler, output = self.scheduler(TWIN_SCRIPT, 100, quotas={'a': 1.5})
+        report = scheduler.turn()
+        self.assertEqual(list(report.missions), ['a', 'b', 'a#2'])
+        self.assertEqual(output, ['a1', 'b1', 'a2', 'a2 again'])
+        self.assertEqual(states(report), {'a': DONE, 'b': DONE, 'a#2': QUOTA})
+        self.assertEqual(report.missions['a#2'].statements, 2)
+
+        # loading another script with the same missions goes on numbering them
+        scheduler.load(parse(TWIN_SCRIPT))
+        self.assertEqual([task.name for task in scheduler.tasks], ['a', 'b', 'a#2', 'a#3', 'b#2', 'a#4'])
+
+    def test_add_twice(self):
+        scheduler, output = self.scheduler(SCRIPT, 1)
+        with self.assertRaises(SchedulerError):
+            scheduler.add('slow', [])
+
+if __name__ == '__main__':
+    unittest.main()
+
+# end file
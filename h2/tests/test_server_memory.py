@@ -0,0 +1,58 @@
+#
+# tests/test_server_memory.py
+#
+# A Server answering many requests, failed ones included, keeps no memory per request: the
+# lexer/parser state of each request lives on contexts that are dropped with it.
+#
+
+import gc
+import json
+import tracemalloc
+import unittest
+
+from bench.corpus import generate
+from server import Server
+
+# requests measured, after a warm up round
+REQUESTS = 200
+
+# bytes the measured requests may leave allocated
+LIMIT = 64 * 1024
+
+OPS = ('parse', 'check', 'tokenize', 'stats')
+
+class ServerMemoryTest(unittest.TestCase):
+
+    def test_bounded(self):
+        # the same texts over and over: their names are interned in the warm up round
+        texts = [generate(20 + n * 10, depth=3, missions=0.1, errors=0.1, seed=n) for n in range(8)]
+        deep = 'x = ' + '-' * 5000 + '1\n'
+        server = Server()
+
+        def run(count):
+            for n in range(count):
+                if n % 50 == 49:
+                    response = json.loads(server.handle(json.dumps({'id': n, 'op': 'parse', 'text': deep})))
+                    self.assertTrue(response['internal'], response)
+                    continue
+                response = json.loads(server.handle(json.dumps({'id': n, 'op': OPS[n % 4], 'text': texts[n % 8]})))
+                self.assertTrue(response['ok'], response)
+
+        run(len(texts) * len(OPS))
+        gc.collect()
+        tracemalloc.start()
+        try:
+            run(REQUESTS)
+            gc.collect()
+            size, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        self.assertLess(size, LIMIT)
+        self.assertEqual(server.requests, len(texts) * len(OPS) + REQUESTS)
+        self.assertIsNone(server.parser.lines)
+        self.assertNotIn('_index_positions', vars(server.parser))
+
+if __name__ == '__main__':
+    unittest.main()
+
+# end file
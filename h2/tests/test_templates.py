@@ -0,0 +1,70 @@
+#
+# tests/test_templates.py
+#
+# String templates where a plain string is expected: a Mission name with ${name} placeholders is
+# its text as written, on the sly and the generated parser, and the mission runs by that name.
+#
+
+import unittest
+
+from bytecode import VM, compile_tree
+from scheduler import DONE, FakeClock, Scheduler
+from tests import build_tables
+
+SCRIPT = '''
+n = 2
+Mission("run ${n}") Do
+    Print("running ${ n }")
+Done
+Mission("cost $${n}") Do
+    Print("cost")
+Done
+'''
+
+class TemplateTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        build_tables()
+        import test_lexer
+        import test_lexer_tab
+        import test_parser
+        import test_parser_tab
+
+        cls.grammars = [('sly', test_lexer.TestLexer, test_parser.TestParser),
+                        ('tab', test_lexer_tab.TestLexer, test_parser_tab.TestParser)]
+
+    def parse(self, Lexer, Parser):
+        errors = []
+
+        def report(line, column, message):
+            errors.append((line, column, message))
+
+        parser = Parser(report=report)
+        tree = parser.parse(Lexer(report=report, names=parser.names).tokenize(SCRIPT))
+        self.assertEqual(errors, [])
+        return tree
+
+    def test_mission_name(self):
+        for name, Lexer, Parser in self.grammars:
+            with self.subTest(grammar=name):
+                tree = self.parse(Lexer, Parser)
+                program = compile_tree(tree)
+                self.assertEqual([mission for mission, pc in program.missions], ['run ${n}', 'cost ${n}'])
+
+                output = []
+                VM({'n': 3}, output.append).run(program, 'run ${n}')
+                self.assertEqual(output, ['running 3'])
+
+    def test_scheduler(self):
+        output = []
+        scheduler = Scheduler({}, output.append, budget=100, clock=FakeClock(step=1.0))
+        scheduler.load(self.parse(*self.grammars[0][1:]))
+        report = scheduler.turn()
+        self.assertEqual(report.missions['run ${n}'].state, DONE)
+        self.assertEqual(output, ['running 2', 'cost'])
+
+if __name__ == '__main__':
+    unittest.main()
+
+# end file
@@ -0,0 +1,65 @@
+#
+# tests/test_vector_eval.py
+#
+# vector_eval.py with NumPy hidden, as on a bot without it: the evaluator and columns() raise
+# H2RuntimeError, element() and row() pass plain values through. With NumPy, a run gives each
+# ship what the Interpreter gives it.
+#
+
+import importlib
+import sys
+import unittest
+from unittest import mock
+
+from interpreter import H2RuntimeError, Interpreter
+from test_lexer import TestLexer
+from test_parser import TestParser
+
+SCRIPT = '''
+cost = halite / 10 + 1
+go = cost < 50
+Print("cost ${cost}")
+'''
+
+def parse(text):
+    return TestParser().parse(TestLexer().tokenize(text))
+
+class VectorEvalTest(unittest.TestCase):
+
+    def test_without_numpy(self):
+        # an import of numpy fails while sys.modules maps it to None; both are restored after
+        with mock.patch.dict(sys.modules, {'numpy': None}):
+            sys.modules.pop('vector_eval', None)
+            vector_eval = importlib.import_module('vector_eval')
+            self.assertIsNone(vector_eval.numpy)
+
+            with self.assertRaises(H2RuntimeError):
+                vector_eval.VectorEvaluator({'halite': 100}).run(parse(SCRIPT))
+            with self.assertRaises(H2RuntimeError):
+                vector_eval.columns([{'halite': 100}])
+            self.assertEqual(vector_eval.element(7, 0), 7)
+            self.assertEqual(vector_eval.row({'halite': 100, 'go': True}, 3), {'halite': 100, 'go': True})
+
+    def test_ships(self):
+        try:
+            import numpy
+        except ImportError:
+            self.skipTest("NumPy not installed")
+        from vector_eval import VectorEvaluator, columns, row
+
+        states = [{'halite': halite} for halite in (0, 250, 700, 1000)]
+        tree = parse(SCRIPT)
+        env = columns(states)
+        output = []
+        VectorEvaluator(env, output.append).run(tree)
+        self.assertIsInstance(env['go'], numpy.ndarray)
+        for n, state in enumerate(states):
+            expected = []
+            Interpreter(state, expected.append).run(tree)
+            self.assertEqual(row(env, n), state)
+            self.assertEqual(output[0][n], expected[0])
+
+if __name__ == '__main__':
+    unittest.main()
+
+# end file
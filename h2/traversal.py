@@ -0,0 +1,154 @@
+#
+# traversal.py
+#
+# Walks and printing of parse trees with an explicit stack, no recursion: deep trees (long
+# left-deep operator chains, nested Mission blocks) don't hit the recursion limit.
+#
+#     for node, depth in preorder(tree): ...
+#     for node, depth in postorder(tree): ...
+#     write_tree(tree, sys.stdout)              # the same text as print(tree)
+#
+#     class Names(Visitor):
+#         def enter_id(self, node, depth): ...
+#         def leave_plus(self, node, depth): ...
+#     Names().visit(tree)
+#
+# tree is a parse result: a node, a list of statement nodes or None; None children are skipped.
+# Works on any node with .value and .children (SimpleNode, compact_node.Node, HashNode).
+#
+# The stack holds one iterator over a node's children per level, so a walk takes memory for the
+# depth of the tree, not its size, and write_tree() writes the text in chunks of lines as it
+# goes: printing is linear in the size of the tree where SimpleNode.__str__ used to concatenate
+# each subtree's text into its parent's. Symbol ids are printed as their text in names
+# (symbols.SYMBOLS by default).
+#
+
+import io
+
+from symbols import SYMBOLS
+
+# method name part of node kinds that are not identifiers, e.g. Visitor.enter_plus for '+'
+KIND_NAMES = {
+    '+': 'plus',
+    '-': 'minus',
+    '*': 'times',
+    '/': 'divide',
+    '==': 'eq',
+    '>': 'gt',
+    '<': 'lt',
+    '>=': 'ge',
+    '<=': 'le',
+    '=': 'equals',
+}
+
+# lines written at a time
+CHUNK = 1024
+
+def roots(tree):
+    if tree is None:
+        return []
+    if isinstance(tree, list):
+        return tree
+    return [tree]
+
+# (node, depth) parents first
+def preorder(tree):
+    stack = [iter(roots(tree))]
+    while stack:
+        for node in stack[-1]:
+            if node is None:
+                continue
+            yield node, len(stack) - 1
+            if node.children:
+                stack.append(iter(node.children))
+            break
+        else:
+            stack.pop()
+
+# (node, depth) children first
+def postorder(tree):
+    stack = [(None, iter(roots(tree)))]
+    while stack:
+        for node in stack[-1][1]:
+            if node is None:
+                continue
+            if node.children:
+                stack.append((node, iter(node.children)))
+                break
+            yield node, len(stack) - 1
+        else:
+            parent, children = stack.pop()
+            if parent is not None:
+                yield parent, len(stack) - 1
+
+# the SimpleNode text of a tree, a line per node: a tab per level and repr() of its value. The
+# walk of preorder(), inline
+def write_tree(tree, file, level=0, names=SYMBOLS):
+    lines = []
+    append = lines.append
+    value_text = names.value_text
+    indents = ['\t' * level]
+    stack = [iter(roots(tree))]
+    while stack:
+        for node in stack[-1]:
+            if node is None:
+                continue
+            append(indents[len(stack) - 1] + repr(value_text(node.value)) + '\n')
+            if len(lines) >= CHUNK:
+                file.write(''.join(lines))
+                del lines[:]
+            if node.children:
+                if len(stack) == len(indents):
+                    indents.append(indents[-1] + '\t')
+                stack.append(iter(node.children))
+                break
+        else:
+            stack.pop()
+    if lines:
+        file.write(''.join(lines))
+
+def tree_string(tree, level=0, names=SYMBOLS):
+    out = io.StringIO()
+    write_tree(tree, out, level, names)
+    return out.getvalue()
+
+#
+# Base class calling enter_<kind>(node, depth) before a node's children and leave_<kind>(node,
+# depth) after them, enter()/leave() for kinds without a method. An enter method returning False
+# skips the node's children and its leave.
+#
+class Visitor(object):
+
+    def visit(self, tree):
+        handlers = {}
+        stack = [(None, None, iter(roots(tree)))]
+        while stack:
+            for node in stack[-1][2]:
+                if node is None:
+                    continue
+                value = node.value
+                kind = value[0] if isinstance(value, tuple) else value
+                handler = handlers.get(kind)
+                if handler is None:
+                    name = KIND_NAMES.get(kind, kind)
+                    handler = handlers[kind] = (getattr(self, 'enter_' + name, self.enter),
+                                                getattr(self, 'leave_' + name, self.leave))
+                depth = len(stack) - 1
+                if handler[0](node, depth) is False:
+                    continue
+                if node.children:
+                    stack.append((node, handler[1], iter(node.children)))
+                    break
+                handler[1](node, depth)
+            else:
+                node, leave, children = stack.pop()
+                if node is not None:
+                    leave(node, len(stack) - 1)
+
+    def enter(self, node, depth):
+        pass
+
+    def leave(self, node, depth):
+        pass
+
+# end file
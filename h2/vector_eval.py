@@ -0,0 +1,164 @@
+#
+# vector_eval.py
+#
+# Batch evaluation of parse trees over NumPy arrays: one element per ship (or cell), so a turn is
+# one pass over the tree instead of one pass per ship.
+#
+#     env = columns(states)            # {'halite': array([...]), 'cost': array([...])}
+#     env['cap'] = 1000                # plain scalars are fine too
+#     mask = VectorEvaluator(env).evaluate(bexpr_node)
+#
+# + - * / uminus, the comparisons, Not and string templates are whole-array operations;
+# comparisons and Not give bool mask arrays, templates arrays of str. Where every operand is a
+# plain scalar the operation is the Interpreter's own, so scalar results are the same as
+# interpreter.py's. Python semantics are kept where NumPy differs: bool arrays are counted as
+# 0/1 by arithmetic (NumPy's True + True is True) and division by zero in any element raises
+# instead of giving inf. Integers are NumPy's int64, they wrap on overflow where Python ints
+# don't.
+#
+# run() executes statements like Interpreter.run(), assignments store arrays in env and Print
+# passes out() the whole array. Missions run inline. Symbol ids are looked up as by the
+# Interpreter.
+#
+# NumPy is optional for the rest of h2; without it VectorEvaluator raises H2RuntimeError.
+#
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from interpreter import BINARY_OPS, CONTAINERS, H2RuntimeError
+from simple_node import split_value
+from symbols import SYMBOLS
+
+ARITHMETIC = {'+', '-', '*', '/'}
+
+# list of per ship dicts -> dict of arrays, names missing from a state are an error
+def columns(states):
+    if numpy is None:
+        raise H2RuntimeError("vector_eval needs NumPy")
+    names = set()
+    for state in states:
+        names.update(state)
+    try:
+        return dict((name, numpy.array([state[name] for state in states])) for name in names)
+    except KeyError as e:
+        raise H2RuntimeError("Variable '{}' missing from some states".format(e.args[0]))
+
+# element n of an array as a Python value, scalars as they are (all values without NumPy)
+def element(value, n):
+    if numpy is not None and isinstance(value, numpy.ndarray):
+        return value[n].item()
+    return value
+
+# the variables of element n, e.g. one ship's env after run()
+def row(env, n):
+    return dict((name, element(value, n)) for name, value in env.items())
+
+def _numeric(value):
+    if isinstance(value, numpy.ndarray) and value.dtype == numpy.bool_:
+        return value.astype(numpy.int64)
+    return value
+
+class VectorEvaluator(object):
+
+    # env maps variable names to arrays or scalars and is updated in place, out is called for Print
+    # symbols: the SymbolTable of the trees' ids
+    def __init__(self, env=None, out=print, symbols=None):
+        if numpy is None:
+            raise H2RuntimeError("vector_eval needs NumPy")
+        self.env = {} if env is None else env
+        self.out = out
+        self.symbols = SYMBOLS if symbols is None else symbols
+
+    # run a parse result: a node or a list of statement nodes
+    def run(self, tree):
+        if tree is None:
+            return
+        stack = list(reversed(tree)) if isinstance(tree, list) else [tree]
+        while stack:
+            node = stack.pop()
+            if node is None:
+                continue
+            kind, payload = split_value(node.value)
+            if kind in CONTAINERS or kind == 'mission':
+                stack.extend(reversed(node.children))
+            elif kind == 'assign':
+                self.env[self.symbols.text(payload)] = self.evaluate(node.children[0])
+            elif kind == '=':
+                self.env[self.symbols.text(node.children[0].value[1])] = self.evaluate(node.children[1])
+            elif kind == 'print':
+                self.out(self.evaluate(node.children[0]))
+            elif kind == 'error':
+                raise H2RuntimeError(payload)
+            else:
+                raise H2RuntimeError("Unknown statement {!r}".format(node.value))
+
+    # value of an expr/bexpr node, an array if any identifier it reads is bound to one
+    def evaluate(self, root):
+        env = self.env
+        text = self.symbols.text
+        done = []
+        stack = [(root, False)]
+        while stack:
+            node, visited = stack.pop()
+            kind, payload = split_value(node.value)
+            if not visited:
+                if kind in ('number', 'bool'):
+                    done.append(payload)
+                elif kind == 'string':
+                    done.append(text(payload))
+                elif kind == 'id':
+                    try:
+                        done.append(env[text(payload)])
+                    except KeyError:
+                        raise H2RuntimeError("Undefined variable '{}'".format(text(payload)))
+                elif kind in BINARY_OPS or kind == 'uminus' or kind == 'not' or kind == 'template':
+                    stack.append((node, True))
+                    stack.extend((child, False) for child in reversed(node.children))
+                elif kind == 'error':
+                    raise H2RuntimeError(payload)
+                else:
+                    raise H2RuntimeError("Unknown expression {!r}".format(node.value))
+                continue
+
+            try:
+                if kind == 'uminus':
+                    done[-1] = -_numeric(done[-1])
+                elif kind == 'template':
+                    n = len(node.children)
+                    values = done[len(done) - n:]
+                    del done[len(done) - n:]
+                    done.append(self.template(values))
+                elif kind == 'not':
+                    a = done[-1]
+                    done[-1] = numpy.logical_not(a) if isinstance(a, numpy.ndarray) else not a
+                else:
+                    b = done.pop()
+                    a = done[-1]
+                    done[-1] = self.binary(kind, a, b)
+            except (TypeError, ZeroDivisionError) as e:
+                raise H2RuntimeError("{}: {}".format(e.__class__.__name__, e))
+        return done[0]
+
+    # one str per element where a segment is an array
+    def template(self, values):
+        if not any(isinstance(value, numpy.ndarray) for value in values):
+            return ''.join(map(str, values))
+        result = ''
+        for value in values:
+            result = numpy.char.add(result, value.astype(str) if isinstance(value, numpy.ndarray) else str(value))
+        return result
+
+    def binary(self, kind, a, b):
+        if not isinstance(a, numpy.ndarray) and not isinstance(b, numpy.ndarray):
+            return BINARY_OPS[kind](a, b)
+        if kind in ARITHMETIC:
+            a = _numeric(a)
+            b = _numeric(b)
+            if kind == '/' and not numpy.all(b):
+                raise ZeroDivisionError("division by zero")
+        return BINARY_OPS[kind](a, b)
+
+# end file